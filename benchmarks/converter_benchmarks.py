@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Converter and MARC21 benchmarks.
+
+Usage:
+    converter_benchmarks.py run         [--output=<file>] [--rounds=<n>] [--filter=<text>]
+    converter_benchmarks.py compare     <results> [<baseline>] [--threshold=<percent>]
+    converter_benchmarks.py (-h | --help)
+
+Options:
+    --output=<file>         Results file [default: benchmarks/results.json].
+    --rounds=<n>            Timed rounds of each benchmark [default: 7].
+    --filter=<text>         Only run the benchmarks whose name contains the text.
+    --threshold=<percent>   Slowdown flagged as a regression [default: 20].
+    -h --help               Show this screen.
+
+Each benchmark runs on a small, a typical (tests/data/pure_record_fake.json)
+and a pathological record (hundreds of persons, keywords and organisational
+units). The results are stored as JSON, the median seconds per call of each
+benchmark are compared with the baseline (benchmarks/baseline.json), compare
+exits with 1 if a benchmark is slower than the threshold.
+Run from the repository root, with invenio-rdm-pure installed. To update
+the baseline (on the machine the results are compared on):
+    python benchmarks/converter_benchmarks.py run --output=benchmarks/baseline.json
+"""
+
+import copy
+import datetime
+import json
+import platform
+import statistics
+import sys
+import timeit
+from functools import partial
+from os.path import dirname, join
+
+from docopt import docopt
+
+from invenio_rdm_pure.source.rdm.converter import Converter, Marc21Record
+
+benchmarks_path = dirname(__file__)
+baseline_file = join(benchmarks_path, "baseline.json")
+fake_record_file = join(benchmarks_path, "..", "tests", "data", "pure_record_fake.json")
+
+# Size of the pathological record
+pathological_count = 300
+
+
+def get_records():
+    """Gets the small, typical and pathological Pure records."""
+    with open(fake_record_file, "rb") as fp:
+        typical = json.load(fp)
+
+    small = {
+        key: typical[key]
+        for key in ("uuid", "title", "language", "organisationalUnits")
+    }
+
+    pathological = copy.deepcopy(typical)
+    person = typical["personAssociations"][0]
+    keyword_group = typical["keywordGroups"][0]
+    o_unit = typical["organisationalUnits"][0]
+    pathological["personAssociations"] = []
+    pathological["keywordGroups"] = []
+    pathological["organisationalUnits"] = []
+    for index in range(pathological_count):
+        person = copy.deepcopy(person)
+        person["name"]["lastName"] = f"Last name {index}"
+        pathological["personAssociations"].append(person)
+
+        keyword_group = copy.deepcopy(keyword_group)
+        for container in keyword_group["keywordContainers"]:
+            for free_keyword in container.get("freeKeywords", []):
+                free_keyword["freeKeywords"] = [f"Keyword {index}", "Shared keyword"]
+        pathological["keywordGroups"].append(keyword_group)
+
+        o_unit = copy.deepcopy(o_unit)
+        for locale in o_unit["name"]["text"]:
+            # A unit out of two is a duplicate, as in records with many authors
+            locale["value"] = f"Organisational unit {index // 2}"
+        pathological["organisationalUnits"].append(o_unit)
+
+    return {"small": small, "typical": typical, "pathological": pathological}
+
+
+def get_marc21_record(converter: Converter, pure_record: dict):
+    """Converts a Pure record to a Marc21Record (without the XML string)."""
+    record = Marc21Record()
+    for attribute, value in pure_record.items():
+        converter.convert_attribute(attribute, value, record)
+    return record
+
+
+def get_unique_values(pure_record: dict):
+    """Gets the organisational unit names given to add_unique_value."""
+    return [
+        locale["value"]
+        for o_unit in pure_record.get("organisationalUnits", [])
+        for locale in o_unit["name"]["text"]
+    ]
+
+
+def add_unique_values(values: list):
+    """Adds the values as the organisationalUnits conversion does."""
+    record = Marc21Record()
+    for value in values:
+        record.add_unique_value(tag="100", ind1="1", code="u", value=value)
+        record.add_unique_value(tag="700", ind1="1", code="u", value=value)
+    return record
+
+
+def get_benchmarks():
+    """Gets the benchmark functions by name."""
+    converter = Converter()
+    benchmarks = {}
+    for size, pure_record in get_records().items():
+        marc21_record = get_marc21_record(converter, pure_record)
+        xml_string = marc21_record.to_xml_string()
+        values = get_unique_values(pure_record)
+
+        benchmarks[f"convert_pure_json_to_marc21_xml[{size}]"] = partial(
+            converter.convert_pure_json_to_marc21_xml, pure_record
+        )
+        benchmarks[f"to_xml_string[{size}]"] = marc21_record.to_xml_string
+        benchmarks[f"add_unique_value[{size}]"] = partial(add_unique_values, values)
+        benchmarks[f"is_valid_marc21_xml_string[{size}]"] = partial(
+            Marc21Record.is_valid_marc21_xml_string, xml_string
+        )
+    return benchmarks
+
+
+def run_benchmark(function, rounds: int):
+    """Times the function, returns the seconds per call of each round."""
+    timer = timeit.Timer(function)
+    # Number of calls lasting at least 0.2 seconds
+    number, _ = timer.autorange()
+    return [seconds / number for seconds in timer.repeat(rounds, number)]
+
+
+def run(output: str, rounds: int, name_filter: str = None):
+    """Runs the benchmarks and stores their results."""
+    results = {}
+    for name, function in get_benchmarks().items():
+        if name_filter and name_filter not in name:
+            continue
+        times = run_benchmark(function, rounds)
+        median = statistics.median(times)
+        results[name] = {
+            "median": median,
+            "min": min(times),
+            "max": max(times),
+            "rounds": rounds,
+            "ops": 1 / median,
+        }
+        print(f"{name:50} {median * 1000:10.3f} ms {1 / median:12.1f} ops/s")
+
+    with open(output, "w") as fp:
+        json.dump(
+            {
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            },
+            fp,
+            indent=2,
+        )
+    print(f"\nResults stored in {output}")
+
+
+def compare(results_file: str, baseline_file: str, threshold: float):
+    """Compares the results with the baseline, returns the number of slowdowns."""
+    with open(results_file) as fp:
+        results = json.load(fp)["results"]
+    with open(baseline_file) as fp:
+        baseline = json.load(fp)["results"]
+
+    slowdowns = 0
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:50} {'':>10} {'new':>8}")
+            continue
+        change = result["median"] / baseline[name]["median"] - 1
+        flag = ""
+        if change * 100 > threshold:
+            slowdowns += 1
+            flag = "SLOWER"
+        print(f"{name:50} {result['median'] * 1000:10.3f} ms {change:+8.1%} {flag}")
+
+    print(f"\nSlowdowns over {threshold}%: {slowdowns}")
+    return slowdowns
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+
+    if arguments["run"]:
+        run(arguments["--output"], int(arguments["--rounds"]), arguments["--filter"])
+    elif arguments["compare"]:
+        slowdowns = compare(
+            arguments["<results>"],
+            arguments["<baseline>"] or baseline_file,
+            float(arguments["--threshold"]),
+        )
+        sys.exit(1 if slowdowns else 0)
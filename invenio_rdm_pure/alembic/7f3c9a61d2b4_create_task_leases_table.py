@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Create task leases table."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7f3c9a61d2b4"
+down_revision = "2d1b5e4c8a0f"
+branch_labels = ()
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        "pure_task_leases",
+        sa.Column("lease_key", sa.String(length=255), nullable=False),
+        sa.Column("expires", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("lease_key", name=op.f("pk_pure_task_leases")),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_table("pure_task_leases")
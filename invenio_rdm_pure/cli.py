@@ -1,16 +1,18 @@
 """Pure synchronizer.
 
 Usage:
-    shell_interface.py get_pure_changes
-    shell_interface.py get_pure_pages       [--pageStart=<page>, --pageEnd=<page>, --pageSize=<page>]
-    shell_interface.py delete_old_logs
-    shell_interface.py delete_by_recid
-    shell_interface.py add_by_uuid
-    shell_interface.py get_owner_records    [--identifier=<value>, --identifierValue=<value>]
-    shell_interface.py group_split          [--oldGroup=<recid>, --newGroups=<recid>]
-    shell_interface.py group_merge          [--oldGroups=<recid>, --newGroup=<recid>]
-    shell_interface.py pure_import_xml
-    shell_interface.py rdm_testing
+    shell_interface.py get_pure_changes     [options]
+    shell_interface.py watch_pure_changes   [--interval=<sec>] [options]
+    shell_interface.py get_pure_pages       [--pageStart=<page>, --pageEnd=<page>, --pageSize=<page>] [options]
+    shell_interface.py delete_old_logs      [options]
+    shell_interface.py delete_by_recid      [options]
+    shell_interface.py add_by_uuid          [options]
+    shell_interface.py get_pure_persons     [options]
+    shell_interface.py get_owner_records    [--identifier=<value>, --identifierValue=<value>, --identifierFile=<path>] [options]
+    shell_interface.py group_split          [--oldGroup=<recid>, --newGroups=<recid>] [options]
+    shell_interface.py group_merge          [--oldGroups=<recid>, --newGroup=<recid>] [options]
+    shell_interface.py pure_import_xml      [--full] [options]
+    shell_interface.py rdm_testing          [options]
 
 Options:
     --pageStart=<page>      Initial page [default:  1].
@@ -21,7 +23,14 @@ Options:
     --oldGroups=<recid>     List of old groups externalIds separated by a space.
     --newGroup=<recid>      New group externalId.
     --identifier=<value>    Run process identifying the user with externalId or orcid
-    --identifierValue=<value>    User externalId or orcid
+    --identifierValue=<value>    User externalId or orcid (many separated by a space)
+    --identifierFile=<path>      File with a user externalId or orcid per line
+    --full                  Rebuild the whole Pure import file.
+    --interval=<sec>        Seconds between two polls of Pure changes.
+    --profile               Run the command under cProfile (.prof and summary in reports/).
+    --profileRuns=<rate>    Fraction of the runs profiled as a whole (e.g. 0.1).
+    --profileTop=<n>        Number of functions in the profile summary.
+    --tracemalloc           Also trace memory allocations while profiling.
     -h --help               Show this screen.
     --version               Show version.
 """
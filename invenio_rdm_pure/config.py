@@ -12,6 +12,8 @@
 
 from datetime import timedelta
 
+from .setup import celery_state_queue
+
 INVENIO_RDM_PURE_DEFAULT_VALUE = "foobar"
 """Default value for the application."""
 
@@ -22,7 +24,13 @@ CELERYBEAT_SCHEDULE = {
     "indexer": {
         "task": "invenio_indexer.tasks.process_bulk_queue",
         "schedule": timedelta(minutes=0.1),
-    }
+    },
+    # Plans and applies the Pure changes (see invenio_rdm_pure.tasks)
+    "invenio_rdm_pure_changes": {
+        "task": "invenio_rdm_pure.tasks.get_pure_changes",
+        "schedule": timedelta(hours=1),
+        "options": {"queue": celery_state_queue},
+    },
 }
 
 
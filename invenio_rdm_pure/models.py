@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Database models of invenio-rdm-pure."""
+
+from invenio_db import db
+
+
+class TaskLease(db.Model):
+    """Lease of a celery task (or of a record), shared by all the worker nodes.
+
+    A lease is held until it is released or its expiration time (epoch
+    seconds) is reached.
+    """
+
+    __tablename__ = "pure_task_leases"
+
+    lease_key = db.Column(db.String(255), primary_key=True)
+    expires = db.Column(db.Float, nullable=False)
@@ -19,15 +19,47 @@ data_setup_path = f"{dirpath}/data_setup"
 # Deletes log files (reports/ directory) after x days
 days_keep_log = 30
 
-# Reduce the number of lines in data/successful_changes.txt
-lines_successful_changes = 90
-
 # Time gap between RDM post requests
 push_dist_sec = 0.8
 # Too many requests sent to RDM server (waits 15 minutes (900/60 = 15))
 # 429 is the HTTP response code
 wait_429 = 900
 
+# RECORD PIPELINE (fetch -> enrich -> convert -> write -> upload)
+# Number of threads of each stage (pages, changes, add_by_uuid)
+pipeline_workers = {
+    "fetch": 2,
+    "enrich": 4,
+    "convert": 1,
+    "write": 4,
+    "upload": 2,
+}
+# Maximum number of records waiting between two stages
+pipeline_queue_size = 50
+
+# Number of threads deleting RDM records (delete_by_recid)
+delete_workers = 4
+# Reports deletion throughput and ETA every x records
+delete_progress_every = 100
+# Removes the deleted recids from the data files every x deletions (changes, duplicates)
+delete_compact_every = 100
+
+# Page size used to index all Pure persons (get_pure_persons)
+persons_index_page_size = 1000
+
+# Number of uuids queried in a single RDM request (get_owner_records, many users)
+owners_query_size = 50
+# Seconds between two checks of user_ids_match.txt for changes of other processes
+owner_map_check_interval_sec = 5
+
+# Number of threads updating RDM records (group split / merge)
+rewrite_workers = 4
+# Reindexes the records after a bulk rewrite
+rewrite_reindex_command = "pipenv run invenio index run"
+
+# Seconds between two polls of Pure changes, once up to date (watch_pure_changes)
+watch_poll_interval_sec = 60
+
 # OTHER
 iso6393_file_name = f"{dirpath}/source/iso6393.json"
 pure_uuid_length = 36
@@ -35,6 +67,12 @@ pure_uuid_length = 36
 # Pure import
 pure_import_path = "templates/invenio_rdm_pure/temporary_files"
 pure_import_file = f"{dirpath}/{pure_import_path}/pure_import.xml"
+# Writes the Pure import file gzip compressed (pure_import.xml.gz)
+pure_import_gzip = False
+# Seconds after which /pure_import_xml regenerates the file in background
+pure_import_max_age_sec = 86400
+# A regeneration running for longer is considered failed and started again
+pure_import_timeout_sec = 3600
 
 # EMAIL     -------- TO REVIEW ------------------
 email_smtp_server = "smtp.gmail.com"
@@ -82,6 +120,19 @@ database_uri = {
     "db_user": f"{data_setup_path}/db_user.txt",
     "db_password": f"{data_setup_path}/db_password.txt",
 }
+# Seconds the group and user lookups are cached
+database_cache_ttl_sec = 60
+
+# CELERY
+# Queue of the tasks using data/state.db (changes plan, sync chunks), to be
+# consumed by a single node (celery worker -Q invenio_rdm_pure_state)
+celery_state_queue = "invenio_rdm_pure_state"
+# Queue of the record tasks (push_record, apply_change, research output chunks).
+# They also write data/ (retry queue, record hashes, data files): None routes
+# them like the state tasks, set a queue only if data/ is shared by the nodes
+celery_record_queue = None
+# A task holding the lease of a record for longer is considered lost
+task_lease_sec = 3600
 
 
 # REPORT LOGS
@@ -93,19 +144,50 @@ log_files_name = {
     "pages": f"{base_path}_pages.log",
     "console": f"{base_path}_console.log",
     "changes": f"{base_path}_changes.log",
+    "events": f"{base_path}_events.jsonl",
 }
+# PROFILING (--profile option)
+# Fraction of the runs that are profiled (0 to 1): each run is either
+# profiled entirely or not at all, it is not a sampling profiler
+profile_run_rate = 1
+# Number of functions listed in the profile text summary
+profile_top = 30
+
+# Stage timings, written at the end of each run
+metrics_files_name = {
+    "prometheus": f"{base_path}_metrics.prom",
+    "json": f"{base_path}_metrics.json",
+}
+# Durations kept per stage to compute the quantiles (random sample of the run)
+metrics_max_samples = 10000
+
+# REPORT LEVEL
+# Events below this level are discarded before being formatted
+# Possible values: DEBUG, INFO, WARNING, ERROR
+report_level = "INFO"
+# Writes events to the console and to the reports/*.log files
+report_human_output = True
+# Writes events to reports/<date>_events.jsonl (one json object per line)
+report_json_output = True
 
 # DATA FILES NAME
 base_path = f"{dirpath}/data"
 data_files_name = {
+    # Only read to import the dates into the changes checkpoints (state.db)
     "successful_changes": f"{base_path}/successful_changes.txt",
     "user_ids_match": f"{base_path}/user_ids_match.txt",
     "all_rdm_records": f"{base_path}/all_rdm_records.txt",
     "rdm_record_owners": f"{base_path}/rdm_record_owners.txt",
     "transfer_uuid_list": f"{base_path}/to_transmit.txt",
     "delete_recid_list": f"{base_path}/to_delete.txt",
+    "state_db": f"{base_path}/state.db",
+    # Dates whose Pure changes were synchronized (scheduled synchronization)
+    "synchronization_history": f"{base_path}/synchronization_history.txt",
 }
 
+# MARC21 records converted by the synchronization, one <uuid>.xml file each
+marc21_records_path = f"{dirpath}/data/marc21"
+
 # TEMPORARY FILES (used to keep truck of the data received and transmitted)
 base_path = f"{dirpath}/data/temporary_files"
 temporary_files_name = {
@@ -116,6 +198,34 @@ temporary_files_name = {
     "post_rdm_metadata": f"{base_path}/post_rdm_metadata.json",
 }
 
+# RETRY QUEUE (records whose transfer failed)
+# Delay before the first retry, doubled after each failed attempt
+retry_backoff_sec = 300
+# Maximum delay between two attempts
+retry_backoff_max_sec = 86400
+# Number of uuids taken from the queue at once
+retry_batch_size = 100
+# Attempts of a planned Pure change (same backoff) before it is given up
+change_plan_max_attempts = 10
+
+# INITIAL SYNCHRONIZATION (research outputs fetched by offset windows)
+# Number of research outputs of each chunk
+sync_chunk_size = 100
+# Number of threads fetching and converting the chunks
+sync_workers = 4
+# Attempts of a chunk before it is marked as failed
+sync_chunk_max_attempts = 5
+# Delay before retrying a chunk, doubled after each failed attempt
+sync_chunk_backoff_sec = 10
+# Maximum delay between two attempts of a chunk
+sync_chunk_backoff_max_sec = 600
+
+# SCHEDULED AND USER SYNCHRONIZATION (only the changed research outputs)
+# Days of Pure changes checked against the synchronization history
+sync_days_span = 7
+# Number of research outputs of each page of a user
+sync_page_size = 100
+
 # Percentage of updated items to considere the upload task successful
 upload_percent_accept = 90
 
@@ -7,13 +7,18 @@
 
 """File description."""
 
+from .setup import profile_run_rate, profile_top, watch_poll_interval_sec
+from .source.metrics import metrics
+from .source.profiling import Profiler
 from .source.pure.import_records import ImportRecords
+from .source.pure.person_index import PersonIndex
 from .source.rdm.delete_record import Delete
 from .source.rdm.run.changes import PureChanges
 from .source.rdm.run.groups import RdmGroups
 from .source.rdm.run.owners import RdmOwners
 from .source.rdm.run.pages import RunPages
 from .source.rdm.run.uuid_run import AddFromUuidList
+from .source.rdm.run.watch import PureChangesWatch
 
 # from .source.rdm.testing.run_test import Testing
 from .source.reports import Reports
@@ -27,10 +32,13 @@ class ShellInterface:
         testing = Testing()
         testing.run()
 
-    def pure_import(self):
-        """Pure import."""
+    def pure_import(self, full):
+        """Pure import.
+
+        Adds the new RDM records to the import file, or rebuilds it (full).
+        """
         pure_import_records = ImportRecords()
-        pure_import_records.run_import()
+        pure_import_records.run_import(full)
 
     def changes(self):
         """Gets changes from Pure API endpoint.
@@ -42,6 +50,14 @@ class ShellInterface:
         pure_changes_by_date = PureChanges()
         pure_changes_by_date.get_pure_changes()
 
+    def watch(self, poll_interval):
+        """Applies Pure changes continuously, from the last stored resume token.
+
+        Runs until SIGTERM is received.
+        """
+        pure_changes_watch = PureChangesWatch(poll_interval)
+        pure_changes_watch.watch_pure_changes()
+
     def pages(self, page_start, page_end, page_size):
         """Push to RDM records from Pure by page."""
         run_pages = RunPages()
@@ -57,7 +73,7 @@ class ShellInterface:
         delete.from_list()
 
     def uuid(self):
-        """Push to RDM all uuids that are in to_transfer.log."""
+        """Push to RDM all uuids of the retry queue (and of to_transmit.txt)."""
         add_uuids = AddFromUuidList()
         add_uuids.add_from_uuid_list()
 
@@ -69,6 +85,19 @@ class ShellInterface:
         rdm_owners = RdmOwners()
         rdm_owners.run_owners(identifier, identifier_value)
 
+    def owners(self, identifier, identifier_values):
+        """Gets from pure all the records related to many users.
+
+        each RDM record is updated once with all its new owners.
+        """
+        rdm_owners = RdmOwners()
+        rdm_owners.run_owners_bulk(identifier, identifier_values)
+
+    def persons(self):
+        """Indexes the uuid, externalId and orcid of all Pure persons."""
+        person_index = PersonIndex()
+        person_index.get_pure_persons()
+
     def rdm_group_split(self, old_id, new_ids):
         """Split a single group into moltiple ones."""
         rdm_groups = RdmGroups()
@@ -82,12 +111,40 @@ class ShellInterface:
 
 def method_call(docopt_instance: object, arguments: dict):
     """Call method."""
+    try:
+        if arguments.get("--profile"):
+            _profiled_dispatch(docopt_instance, arguments)
+        else:
+            _dispatch(docopt_instance, arguments)
+    finally:
+        # Stage timings of the run (reports/<date>_metrics.prom and .json)
+        metrics.export()
+
+
+def _profiled_dispatch(docopt_instance: object, arguments: dict):
+    """Runs the command given in the arguments under the profiler."""
+    run_rate = arguments.get("--profileRuns") or profile_run_rate
+    top = arguments.get("--profileTop") or profile_top
+    profiler = Profiler(float(run_rate), int(top), bool(arguments.get("--tracemalloc")))
+    # Name of the command, used for the profile file names
+    command = next(
+        key for key, value in arguments.items() if value is True and key[0] != "-"
+    )
+    profiler.run(command, _dispatch, docopt_instance, arguments)
+
+
+def _dispatch(docopt_instance: object, arguments: dict):
+    """Calls the method given in the arguments."""
     if arguments["pure_import_xml"]:
-        docopt_instance.pure_import()
+        docopt_instance.pure_import(bool(arguments.get("--full")))
 
     elif arguments["get_pure_changes"]:
         docopt_instance.changes()
 
+    elif arguments["watch_pure_changes"]:
+        poll_interval = arguments["--interval"] or watch_poll_interval_sec
+        docopt_instance.watch(float(poll_interval))
+
     elif arguments["rdm_testing"]:
         docopt_instance.testing()
 
@@ -106,10 +163,16 @@ def method_call(docopt_instance: object, arguments: dict):
     elif arguments["add_by_uuid"]:
         docopt_instance.uuid()
 
+    elif arguments["get_pure_persons"]:
+        docopt_instance.persons()
+
     elif arguments["get_owner_records"]:
         identifier = arguments["--identifier"]
-        identifier_value = arguments["--identifierValue"]
-        docopt_instance.owner(identifier, identifier_value)
+        identifier_values = _identifier_values(arguments)
+        if len(identifier_values) == 1:
+            docopt_instance.owner(identifier, identifier_values[0])
+        else:
+            docopt_instance.owners(identifier, identifier_values)
 
     elif arguments["group_split"]:
         old_id = arguments["--oldGroup"]
@@ -120,3 +183,15 @@ def method_call(docopt_instance: object, arguments: dict):
         old_ids = arguments["--oldGroups"].split(" ")
         new_id = arguments["--newGroup"]
         docopt_instance.rdm_group_merge(old_ids, new_id)
+
+
+def _identifier_values(arguments: dict):
+    """Gets the identifier values given as option or listed in a file."""
+    identifier_values = (arguments["--identifierValue"] or "").split(" ")
+    if arguments.get("--identifierFile"):
+        with open(arguments["--identifierFile"]) as fp:
+            identifier_values += fp.read().split("\n")
+    # Removes empty and repeated values
+    return list(
+        dict.fromkeys(value.strip() for value in identifier_values if value.strip())
+    )
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Module responsible for timing the stages of a synchronization run."""
+
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from ..setup import dirpath, metrics_files_name, metrics_max_samples
+from .utils import check_if_directory_exists
+
+quantiles = [0.5, 0.95, 0.99]
+
+
+class Histogram:
+    """Collects the durations (in seconds) of a single stage.
+
+    Count and sum are exact, the quantiles are computed on a uniform random
+    sample of at most max_samples durations (reservoir sampling).
+    """
+
+    def __init__(self, max_samples: int = metrics_max_samples):
+        """Description."""
+        self.max_samples = max_samples
+        self.samples = []
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Adds a duration to the histogram."""
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < self.max_samples:
+            self.samples.append(value)
+            return
+        # Replaces a sample with probability max_samples / count
+        index = random.randrange(self.count)
+        if index < self.max_samples:
+            self.samples[index] = value
+
+    def quantile(self, q: float, sorted_samples: list = None):
+        """Gets the duration below which falls the given fraction of samples."""
+        if sorted_samples is None:
+            sorted_samples = sorted(self.samples)
+        if not sorted_samples:
+            return 0.0
+        index = min(int(q * len(sorted_samples)), len(sorted_samples) - 1)
+        return sorted_samples[index]
+
+    def summary(self):
+        """Count, sum and quantiles of the stage."""
+        sorted_samples = sorted(self.samples)
+        summary = {"count": self.count, "sum": self.sum}
+        for q in quantiles:
+            summary[f"p{int(q * 100)}"] = self.quantile(q, sorted_samples)
+        return summary
+
+
+class Metrics:
+    """Registry of the stage histograms of the current process."""
+
+    def __init__(self):
+        """Description."""
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """Adds the duration of a stage."""
+        with self._lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram()
+            self.histograms[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Measures the time spent in the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str):
+        """Decorator measuring the time spent in the decorated function."""
+
+        def _decorator(func):
+            @wraps(func)
+            def _wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+
+            return _wrapper
+
+        return _decorator
+
+    def summary(self):
+        """Gets count, sum and quantiles of every stage."""
+        with self._lock:
+            histograms = dict(self.histograms)
+        return {stage: histograms[stage].summary() for stage in sorted(histograms)}
+
+    def to_prometheus(self):
+        """Gets the stage timings in Prometheus text format."""
+        name = "invenio_rdm_pure_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each synchronization stage.",
+            f"# TYPE {name} summary",
+        ]
+        for stage, summary in self.summary().items():
+            for q in quantiles:
+                value = summary[f"p{int(q * 100)}"]
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {value}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {summary["sum"]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {summary["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Writes the stage timings to the reports/ directory, then resets them.
+
+        Both a Prometheus text file and a json summary are written. Each
+        export covers the timings since the previous one (a run, or a poll
+        of the watch).
+        """
+        with self._lock:
+            histograms, self.histograms = self.histograms, {}
+        if not histograms:
+            return
+
+        exported = Metrics()
+        exported.histograms = histograms
+        check_if_directory_exists(f"{dirpath}/reports")
+        with open(metrics_files_name["prometheus"], "w") as fp:
+            fp.write(exported.to_prometheus())
+        with open(metrics_files_name["json"], "w") as fp:
+            fp.write(json.dumps(exported.summary(), indent=2))
+
+    def reset(self):
+        """Removes all collected timings."""
+        with self._lock:
+            self.histograms = {}
+
+
+# Shared by all the modules of the process
+metrics = Metrics()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Stages running on their own threads, connected by bounded queues."""
+
+import queue
+import threading
+import traceback
+
+from flask import current_app, has_app_context
+
+from ..setup import pipeline_queue_size
+from .metrics import metrics
+from .reports import ERROR, Reports
+
+
+class Stage:
+    """A step of the pipeline.
+
+    func gets an item and returns the item for the next stage, or None to
+    drop it. A fan_out stage returns a list of items instead.
+    """
+
+    def __init__(self, name: str, func, workers: int = 1, fan_out: bool = False):
+        """Description."""
+        self.name = name
+        self.func = func
+        self.workers = max(workers, 1)
+        self.fan_out = fan_out
+
+
+class Pipeline:
+    """Runs each stage on its own threads, the stages exchange items through queues.
+
+    The queues are bounded (pipeline_queue_size): a stage that is ahead
+    waits for the next one (backpressure), so the number of items in memory
+    does not depend on the number of items processed. on_exit(item, error)
+    is called for each item leaving the pipeline, completed, dropped or
+    failed (error is then the traceback).
+    """
+
+    def __init__(
+        self, stages: list, on_exit=None, queue_size: int = pipeline_queue_size
+    ):
+        """Description."""
+        self.stages = stages
+        self.on_exit = on_exit
+        self.report = Reports()
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+
+        # Items inside the pipeline, join waits for zero
+        self._pending = 0
+        self._condition = threading.Condition()
+
+        app = current_app._get_current_object() if has_app_context() else None
+        self.threads = [
+            [
+                threading.Thread(target=self._run, args=(app, index), daemon=True)
+                for _ in range(stage.workers)
+            ]
+            for index, stage in enumerate(stages)
+        ]
+        for stage_threads in self.threads:
+            for thread in stage_threads:
+                thread.start()
+
+    def put(self, item):
+        """Adds an item to the first stage, waits while its queue is full."""
+        with self._condition:
+            self._pending += 1
+        self.queues[0].put(item)
+
+    def join(self):
+        """Waits until all the added items left the pipeline."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+
+    def close(self):
+        """Stops the threads once the added items are processed."""
+        for index, stage_threads in enumerate(self.threads):
+            for _ in stage_threads:
+                self.queues[index].put(None)
+            for thread in stage_threads:
+                thread.join()
+
+    def run(self, items):
+        """Processes all the items, then stops the threads."""
+        try:
+            for item in items:
+                self.put(item)
+        finally:
+            self.close()
+
+    def _run(self, app, index: int):
+        """Processes the items of a stage until it gets None."""
+        if app is not None:
+            app.app_context().push()
+
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while True:
+            item = self.queues[index].get()
+            if item is None:
+                return
+
+            try:
+                with metrics.timer(f"pipeline.{stage.name}"):
+                    result = stage.func(item)
+            except Exception:
+                self._exit(item, f"{stage.name}: {traceback.format_exc()}")
+                continue
+
+            if stage.fan_out:
+                outputs = list(result or [])
+                if not outputs:
+                    self._exit(item)
+                    continue
+                with self._condition:
+                    # The input is replaced by its outputs
+                    self._pending += len(outputs) - 1
+            elif result is None:
+                self._exit(item)
+                continue
+            else:
+                outputs = [result]
+
+            for output in outputs:
+                if is_last:
+                    self._exit(output)
+                else:
+                    self.queues[index + 1].put(output)
+
+    def _exit(self, item, error: str = None):
+        """Description."""
+        try:
+            if self.on_exit:
+                self.on_exit(item, error)
+            elif error:
+                self.report.event("pipeline_failed", ERROR, error=error)
+        finally:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Module responsible for profiling the shell_interface commands."""
+
+import cProfile
+import io
+import pstats
+import random
+import tracemalloc
+from datetime import date, datetime
+
+from ..setup import dirpath, reports_full_path
+from .reports import Reports
+from .utils import check_if_directory_exists
+
+
+class Profiler:
+    """Runs a command under cProfile and writes the results to reports/.
+
+    Only a fraction of the runs (run_rate) is profiled, so the option can
+    stay enabled in production. A run is either profiled entirely, with
+    cProfile tracing every call, or not profiled at all.
+    """
+
+    def __init__(self, run_rate: float = 1, top: int = 30, memory: bool = False):
+        """Description."""
+        self.run_rate = run_rate
+        self.top = top
+        self.memory = memory
+        self.report = Reports()
+
+    def run(self, command: str, func, *args, **kwargs):
+        """Calls func, profiling it if the run is picked."""
+        if random.random() >= self.run_rate:
+            return func(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        if self.memory:
+            tracemalloc.start()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            snapshot = None
+            peak_memory = 0
+            if self.memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self._write_results(command, profiler, snapshot, peak_memory)
+
+    def _write_results(self, command, profiler, snapshot, peak_memory):
+        """Writes the .prof file and the top-N text summary."""
+        check_if_directory_exists(f"{dirpath}/reports")
+        run_time = datetime.now().strftime("%H%M%S")
+        base_name = f"{reports_full_path}{date.today()}_profile_{command}_{run_time}"
+
+        # Binary profile, readable with pstats / snakeviz
+        profiler.dump_stats(f"{base_name}.prof")
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+
+        if snapshot:
+            stream.write(f"\nPeak traced memory: {peak_memory / 1024:.1f} KiB\n")
+            stream.write(f"Top {self.top} allocations by line:\n")
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                stream.write(f"{stat}\n")
+
+        open(f"{base_name}.txt", "w").write(stream.getvalue())
+
+        self.report.add(f"\nProfile @ {base_name}.prof @ Summary: {base_name}.txt\n")
@@ -7,55 +7,135 @@
 
 """File description."""
 
+import gzip
 import json
 import os
-from xml.dom import minidom
-from xml.etree import ElementTree as ET
 
-from ...setup import dirpath, pure_import_file, pure_import_path
+from lxml import etree
+
+from ...setup import dirpath, pure_import_file, pure_import_gzip, pure_import_path
 from ..rdm.requests_rdm import Requests
 from ..reports import Reports
+from ..state_db import StateDatabase
 from ..utils import add_spaces, check_if_directory_exists, current_date, get_value
 
 
+def export_file_name():
+    """Gets the name of the Pure import file (pure_import.xml[.gz])."""
+    if pure_import_gzip:
+        return f"{pure_import_file}.gz"
+    return pure_import_file
+
+
+def _open_file(file_name: str, mode: str):
+    """Opens the file of the export, gzip compressed if pure_import_gzip is set."""
+    if pure_import_gzip:
+        return gzip.open(file_name, mode)
+    return open(file_name, mode)
+
+
 class ImportRecords:
-    """Description."""
+    """Exports to pure_import.xml the datasets created in RDM.
+
+    The creation date and recid of the newest exported record (watermark)
+    are kept in the state database: each run adds to the existing file only
+    the records created afterwards. Without a watermark only the records
+    created today are exported, the full mode rebuilds the whole file.
+    """
+
+    watermark_key = "pure_import_watermark"
 
     def __init__(self):
         """Description."""
         self.rdm_requests = Requests()
         self.report = Reports()
+        self.state_db = StateDatabase()
 
-    def run_import(self):
+    def run_import(self, full: bool = False):
         """Description."""
         # Report title
         self.report.add_template(["console"], ["general", "title"], ["PURE IMPORT"])
 
+        self.full = full
+        self.watermark = None if full else self._get_watermark()
+        # The file is replaced at the end, once the new one is complete
+        if self.watermark:
+            report = f"\nWatermark @ Created: {self.watermark['created']} @ Recid: {self.watermark['recid']}"
+            self.report.add(report)
+        elif full:
+            self.report.add("\nFull export")
+        else:
+            self.report.add(f"\nNo watermark @ Created from: {current_date()}")
+
         page = 1
         self.next_page = True
-        self._delete_old_xml()
+        self.newest_item = None
+        self.added = 0
         name_space = self._create_xml()
 
-        # Get RDM records by page
-        while self.next_page:
-            data = self._get_rdm_records_metadata(page)
-            if not data:
-                if self._check_if_file_exists(pure_import_file):
-                    self.report.add("\nTask correctly finished\n")
-                else:
-                    self.report.add("\nTask ended - No xml file created\n")
-                return
-            self._process_data(data, name_space)
-            page += 1
-        self._parse_xml()
+        file_name = export_file_name()
+        temporary_file_name = f"{file_name}.tmp"
+        check_if_directory_exists(f"{dirpath}/{pure_import_path}")
+
+        # Datasets are written one by one as they are created
+        with _open_file(temporary_file_name, "wb") as output:
+            with etree.xmlfile(output, encoding="utf-8") as self.xml_file:
+                self.xml_file.write_declaration()
+                root = "{%s}datasets" % name_space["dataset"]
+                with self.xml_file.element(root, nsmap=self.nsmap):
+                    self.xml_file.write("\n")
+
+                    # Datasets of the previous exports
+                    if self.watermark:
+                        self._copy_exported_datasets(file_name, name_space)
+
+                    # Get RDM records by page
+                    failed = False
+                    while self.next_page:
+                        data = self._get_rdm_records_metadata(page)
+                        if data is None:
+                            failed = True
+                            break
+                        if not data:
+                            break
+                        self._process_data(data, name_space)
+                        page += 1
+
+        if failed:
+            # The records of the pages not fetched are exported next time
+            os.remove(temporary_file_name)
+            self.report.add(f"\nTask ended - RDM request failed @ Page: {page}\n")
+            return
+
+        if self.added or full:
+            os.replace(temporary_file_name, file_name)
+        else:
+            # Nothing new, the current export is kept
+            os.remove(temporary_file_name)
+
+        # Records already checked are not requested again (the walk reached
+        # the previous watermark or the last record)
+        if self.newest_item:
+            self._set_watermark(self.newest_item)
+
+        if self._check_if_file_exists(file_name):
+            self.report.add(
+                f"\nTask correctly finished @ Added datasets: {self.added}\n"
+            )
+        else:
+            self.report.add("\nTask ended - No xml file created\n")
+
+    def _get_watermark(self):
+        """Gets created date and recid of the newest exported record (None if missing)."""
+        if not self._check_if_file_exists(export_file_name()):
+            return None
+        watermark = self.state_db.get_value(self.watermark_key)
+        return json.loads(watermark) if watermark else None
 
-    def _delete_old_xml(self):
+    def _set_watermark(self, item: dict):
         """Description."""
-        # Check if file exists
-        if self._check_if_file_exists(pure_import_file):
-            self.report.add("\nDelete old xml file")
-            # Delete old file
-            os.remove(pure_import_file)
+        watermark = {"created": item["created"], "recid": item["id"]}
+        self.state_db.set_value(self.watermark_key, json.dumps(watermark))
 
     def _check_if_file_exists(self, file_name):
         """Description."""
@@ -72,28 +152,44 @@ class ImportRecords:
         return True
 
     def _check_date(self, item):
-        """Checks if the record was created today."""
-        if item["created"] > current_date():
+        """Checks if the record was created after the watermark (or today)."""
+        if self.full:
             return True
-        else:
+        if not self.watermark:
+            if item["created"] > current_date():
+                return True
             date = item["created"].split("T")[0]
             self.report.add(f"{self.report_base} Too old: {date}")
             return False
+        if (
+            item["id"] != self.watermark["recid"]
+            and item["created"] >= self.watermark["created"]
+        ):
+            return True
+        date = item["created"].split("T")[0]
+        self.report.add(f"{self.report_base} Already exported: {date}")
+        return False
 
     def _create_xml(self):
-        """Creates the xml file that will be imported in pure."""
+        """Namespaces of the xml file that will be imported in pure."""
         name_space = {
             "dataset": "v1.dataset.pure.atira.dk",
             "commons": "v3.commons.pure.atira.dk",
         }
-
-        ET.register_namespace("v1", name_space["dataset"])
-        ET.register_namespace("v3", name_space["commons"])
-
-        # Build a tree structure
-        self.root = ET.Element("{%s}datasets" % name_space["dataset"])
+        self.nsmap = {"v1": name_space["dataset"], "v3": name_space["commons"]}
         return name_space
 
+    def _copy_exported_datasets(self, file_name: str, name_space: dict):
+        """Copies the datasets of the current export, one at a time."""
+        tag = "{%s}dataset" % name_space["dataset"]
+        with _open_file(file_name, "rb") as source:
+            for _, element in etree.iterparse(source, tag=tag, remove_blank_text=True):
+                self.xml_file.write(element, pretty_print=True)
+                # Frees the copied elements
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
     def _process_data(self, data, name_space):
         """Creates the xml file that will be imported in pure."""
         count = 0
@@ -105,30 +201,38 @@ class ImportRecords:
             self.report_base = f"{add_spaces(count)} - {item['id']} -"
             item_metadata = item["metadata"]
 
-            # Checks if the record was created today
+            # Checks if the record was created after the last export
             if not self._check_date(item):
                 self.next_page = False
                 return
 
+            # Sorted by most recent, the first one is the newest
+            if not self.newest_item:
+                self.newest_item = item
+
             # If the rdm record has a uuid means that it was imported from pure - REVIEW
             if not self._check_uuid(item_metadata):
                 continue
 
+            # Creates the dataset element and writes it to the file
+            dataset = self._populate_xml(item_metadata, name_space)
+            if dataset is None:
+                self.report.add(f"{self.report_base} Missing title")
+                continue
             self.report.add(f"{self.report_base} Adding")
-
-            # Adds fields to the created xml element
-            self._populate_xml(item_metadata, name_space)
+            self.xml_file.write(dataset, pretty_print=True)
+            self.added += 1
 
     def _populate_xml(self, item, name_space):
         """Description."""
         # Dataset element
-        body = ET.SubElement(self.root, "{%s}dataset" % name_space["dataset"])
+        body = etree.Element("{%s}dataset" % name_space["dataset"], nsmap=self.nsmap)
         body.set("type", "dataset")
 
         # Title                     (mandatory field)
         value = get_value(item, ["titles", 0, "title"])
         if not value:
-            return False
+            return None
         self._sub_element(body, name_space["dataset"], "title").text = value
 
         # Managing organisation     (mandatory field)
@@ -171,6 +275,7 @@ class ImportRecords:
 
         # Organisations
         self._add_organisations(body, name_space, item)
+        return body
 
     def _add_publisher(self, body, name_space, item):
         """Description."""
@@ -187,12 +292,12 @@ class ImportRecords:
 
         publisher = self._sub_element(body, name_space["dataset"], "publisher")
         publisher.set("lookupId", publisher_uuid)
-        self._sub_element(
-            publisher, name_space["dataset"], "name"
-        ).text = publisher_name
-        self._sub_element(
-            publisher, name_space["dataset"], "type"
-        ).text = publisher_type
+        self._sub_element(publisher, name_space["dataset"], "name").text = (
+            publisher_name
+        )
+        self._sub_element(publisher, name_space["dataset"], "type").text = (
+            publisher_type
+        )
 
     def _add_organisations(self, body, name_space, item):
         """Description."""
@@ -247,31 +352,23 @@ class ImportRecords:
                 link = self._sub_element(links, name_space["dataset"], "link")
                 link.set("id", "link_files")
                 self._sub_element(link, name_space["dataset"], "url").text = link_files
-                self._sub_element(
-                    link, name_space["dataset"], "description"
-                ).text = "Link to record files"
+                self._sub_element(link, name_space["dataset"], "description").text = (
+                    "Link to record files"
+                )
             # Self
             if link_self:
                 link = self._sub_element(links, name_space["dataset"], "link")
                 link.set("id", "link_self")
-                url = self._sub_element(
-                    link, name_space["dataset"], "url"
-                ).text = link_self
-                self._sub_element(
-                    link, name_space["dataset"], "description"
-                ).text = "Link to record API"
-
-    def _parse_xml(self):
-        """Description."""
-        check_if_directory_exists(f"{dirpath}/{pure_import_path}")
-
-        # Wrap it in an ElementTree instance and save as XML
-        xml_str = minidom.parseString(ET.tostring(self.root)).toprettyxml(indent="   ")
-        open(pure_import_file, "w").write(xml_str)
+                url = self._sub_element(link, name_space["dataset"], "url").text = (
+                    link_self
+                )
+                self._sub_element(link, name_space["dataset"], "description").text = (
+                    "Link to record API"
+                )
 
     def _sub_element(self, element, namespace: str, sub_element_name: str):
         """Adds the the xml a sub element."""
-        return ET.SubElement(element, "{%s}%s" % (namespace, sub_element_name))
+        return etree.SubElement(element, "{%s}%s" % (namespace, sub_element_name))
 
     def _add_attribute(
         self, item: object, sub_element, attribute: str, value_path: list
@@ -286,7 +383,10 @@ class ImportRecords:
         sub_element.text = get_value(item, path)
 
     def _get_rdm_records_metadata(self, page: int):
-        """Requests to rdm records metadata by page."""
+        """Requests to rdm records metadata by page.
+
+        Returns an empty list after the last page, None if the request failed.
+        """
         # Size of the pages received from RDM
         page_size = 50
 
@@ -294,13 +394,13 @@ class ImportRecords:
         response = self.rdm_requests.get_metadata(params)
 
         if response.status_code >= 300:
-            return False
+            return None
         # Load response
         json_data = json.loads(response.content)["hits"]["hits"]
 
         # Checks if any record is listed
         if not json_data:
-            return False
+            return []
 
         self.report.add_template(
             ["console"], ["pages", "page_and_size"], [page, page_size]
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Local index of Pure persons, by externalId and orcid."""
+
+import json
+import time
+
+from ...setup import persons_index_page_size
+from ..reports import Reports
+from ..state_db import StateDatabase
+from .requests_pure import get_next_page, get_pure_metadata
+
+schema = """
+CREATE TABLE IF NOT EXISTS persons (
+    uuid            TEXT PRIMARY KEY,
+    external_id     TEXT,
+    orcid           TEXT,
+    first_name      TEXT,
+    last_name       TEXT,
+    updated         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS persons_external_id ON persons (external_id);
+CREATE INDEX IF NOT EXISTS persons_orcid ON persons (orcid);
+"""
+
+# Pure person field -> column of the persons table
+key_columns = {"externalId": "external_id", "orcid": "orcid"}
+
+
+class PersonIndex:
+    """Maps the externalId and orcid of Pure persons to their uuid.
+
+    Filled by get_pure_persons (all the persons endpoint) and kept up to date
+    by the Person items of the changes endpoint: a changed person is removed,
+    and indexed again by the next live lookup that finds it.
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+        self.report = Reports()
+
+    def get(self, key_name: str, key_value: str):
+        """Gets (uuid, first_name, last_name) of the person, None if not indexed."""
+        column = key_columns[key_name]
+        return self.db.select_one(
+            f"SELECT uuid, first_name, last_name FROM persons WHERE {column} = ?",
+            (key_value,),
+        )
+
+    def add(self, items: list):
+        """Adds or updates the given Pure persons."""
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO persons VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    item["uuid"],
+                    item.get("externalId"),
+                    item.get("orcid"),
+                    item.get("name", {}).get("firstName"),
+                    item.get("name", {}).get("lastName"),
+                    now,
+                )
+                for item in items
+            ],
+        )
+
+    def remove(self, uuid: str):
+        """Removes a person deleted in Pure."""
+        self.db.execute("DELETE FROM persons WHERE uuid = ?", (uuid,))
+
+    def invalidate(self, uuids: list):
+        """Removes the persons changed (or deleted) in Pure, without requests."""
+        if not uuids or self.count() == 0:
+            return
+        self.db.executemany(
+            "DELETE FROM persons WHERE uuid = ?", [(uuid,) for uuid in uuids]
+        )
+
+    def count(self):
+        """Gets the number of indexed persons."""
+        return self.db.select_one("SELECT COUNT(*) FROM persons")[0]
+
+    def get_pure_persons(self):
+        """Indexes all the persons of Pure 'persons' endpoint."""
+        self.report.add_template(["console"], ["general", "title"], ["PERSONS INDEX"])
+
+        next_page = True
+        page = 1
+        while next_page:
+            params = {"page": page, "pageSize": persons_index_page_size}
+            response = get_pure_metadata("persons", "", params)
+            if response.status_code >= 300:
+                return False
+
+            resp_json = json.loads(response.content)
+            self.add(resp_json["items"])
+            self.report.add(
+                f"\nPag {page} - Get persons    - {response} - Items: {len(resp_json['items'])}"
+            )
+
+            next_page = get_next_page(resp_json)
+            page += 1
+
+        self.report.add(f"\nIndexed persons: {self.count()}\n")
+        return True
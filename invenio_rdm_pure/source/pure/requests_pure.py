@@ -15,10 +15,14 @@ from flask import current_app
 from requests.auth import HTTPBasicAuth
 
 from ...setup import temporary_files_name
-from ..reports import Reports
+from ..metrics import metrics
+from ..reports import ERROR, INFO, Reports
 
 reports = Reports()
 
+# Keeps the connections to Pure open between requests
+pure_session = requests.Session()
+
 
 def get_research_output_count(pure_api_key: str, pure_api_url: str) -> int:
     """Get the amount of available research outputs at /research-outputs endpoint.
@@ -31,7 +35,7 @@ def get_research_output_count(pure_api_key: str, pure_api_url: str) -> int:
         "accept": "application/json",
     }
     url = pure_api_url + "research-outputs"
-    response = requests.get(url, headers=headers)
+    response = pure_session.get(url, headers=headers)
     if response.status_code == 200:
         return int(json.loads(response.text)["count"])
     else:
@@ -55,7 +59,7 @@ def get_research_outputs(
     url = pure_api_url + "research-outputs?size={}&offset={}".format(
         str(size), str(offset)
     )  # There are ca. 65300 research output entries in Pure (15.12.2020)
-    response = requests.get(url, headers=headers)
+    response = pure_session.get(url, headers=headers)
     if response.status_code == 200:
         response_json = json.loads(response.text)
         items = response_json["items"]
@@ -89,7 +93,8 @@ def get_pure_metadata(endpoint, identifier="", parameters={}, review=True):
     url = url[:-1]
 
     # Sending request
-    response = requests.get(url, headers=headers)
+    with metrics.timer(f"pure.get_metadata.{endpoint}"):
+        response = pure_session.get(url, headers=headers)
 
     if response.status_code >= 300 and review:
         reports.add(response.content)
@@ -100,12 +105,15 @@ def get_pure_metadata(endpoint, identifier="", parameters={}, review=True):
     return response
 
 
+@metrics.timed("pure.get_file")
 def get_pure_file(file_url: str, file_name: str):
     """Description."""
     # Get request to Pure
     pure_username = current_app.config.get("PURE_USERNAME")
     pure_password = current_app.config.get("PURE_PASSWORD")
-    response = requests.get(file_url, auth=HTTPBasicAuth(pure_username, pure_password))
+    response = pure_session.get(
+        file_url, auth=HTTPBasicAuth(pure_username, pure_password)
+    )
 
     if response.status_code >= 300:
         reports.add(f"Error getting the file {file_url} from Pure")
@@ -123,19 +131,23 @@ def get_pure_record_metadata_by_uuid(uuid: str):
     # PURE REQUEST
     response = get_pure_metadata("research-outputs", uuid)
 
-    report = f"\tPure get metadata     - {response}"
     if response.status_code == 404:
-        report += f" - Metadata not found in Pure for record {uuid}"
+        message = f"Metadata not found in Pure for record {uuid}"
     elif response.status_code >= 300:
-        report += f" - Error: {response.content}"
+        message = f"Error: {response.content}"
     else:
-        report += f"                       - {uuid}"
-    reports.add(report)
+        message = f"                      - {uuid}"
+    reports.event(
+        "pure_get_metadata",
+        ERROR if response.status_code >= 300 else INFO,
+        status=response.status_code,
+        message=message,
+    )
 
     # Check response
     if response.status_code >= 300:
         report = f"Get Pure metadata      - {response.content}\n"
-        reports.add(report["console", "records"])
+        reports.add(report, ["console", "records"])
         return False
 
     return json.loads(response.content)
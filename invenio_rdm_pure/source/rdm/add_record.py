@@ -7,6 +7,7 @@
 
 """File description."""
 
+import copy
 import json
 import time
 
@@ -18,23 +19,20 @@ from ...setup import (
     resourcetype_pure_to_rdm,
     versioning_running,
 )
+from ..metrics import metrics
 from ..pure.requests_pure import (
     get_pure_file,
     get_pure_metadata,
     get_pure_record_metadata_by_uuid,
 )
 from ..rdm.database import RdmDatabase
+from ..rdm.known_groups import known_groups
+from ..rdm.owner_map import owner_map
 from ..rdm.requests_rdm import Requests
-from ..rdm.run.groups import RdmGroups
+from ..rdm.retry_queue import RetryQueue
 from ..rdm.versioning import Versioning
-from ..reports import Reports
-from ..utils import (
-    check_if_file_exists,
-    file_read_lines,
-    get_userid_from_list_by_externalid,
-    get_value,
-    shorten_file_name,
-)
+from ..reports import ERROR, INFO, Reports
+from ..utils import file_lock, get_value
 
 
 class RdmAddRecord:
@@ -44,56 +42,88 @@ class RdmAddRecord:
         """Description."""
         self.rdm_requests = Requests()
         self.report = Reports()
-        self.groups = RdmGroups()
         self.versioning = Versioning()
         self.rdm_db = RdmDatabase()
+        self.retry_queue = RetryQueue()
 
     def push_record_by_uuid(self, global_counters: dict, uuid: str):
         """Gets from Pure the metadata of a given uuid."""
         item = get_pure_record_metadata_by_uuid(uuid)
         if not item:
+            self.retry_queue.push(uuid, "Pure get metadata")
             return False
         return self.create_invenio_data(global_counters, item)
 
-    def _set_initial_variables(func):
-        """Description."""
+    @metrics.timed("record.total")
+    def create_invenio_data(self, global_counters: dict, item: dict):
+        """Process the data received from Pure and submits it to RDM.
 
-        def _wrapper(self, global_counters, item):
-            """Description."""
-            self.global_counters = global_counters
-            self.global_counters["total"] += 1
+        Returns True if the metadata and the files were transmitted.
+        """
+        self.start(global_counters, item)
+        self.enrich()
+        if not self.convert() or not self.write():
+            return False
+        return self.upload()
 
-            self.uuid = item["uuid"]
-            self.item = item
-            # Stores the data that will be then converted to json
-            self.data = {}
-            # Stores the name of the record files
-            # Necessary because we need first to create the record and then to put the files
-            self.record_files = []
+    def new_record(self):
+        """Gets an RdmAddRecord for another record, sharing the clients of this one.
 
-            # Stores all extra fields that are not in the standard RDM datamodel
-            self.pure_extensions = {}
+        The requests, database, versioning and retry queue clients are
+        stateless, the record data is set by start.
+        """
+        return copy.copy(self)
 
-            # Decorated function
-            func(self, global_counters, item)
+    def start(self, global_counters: dict, item: dict):
+        """Sets the initial variables of the record."""
+        self.global_counters = global_counters
+        self.global_counters["total"] += 1
 
-        return _wrapper
+        self.uuid = item["uuid"]
+        self.item = item
+        # Stores the data that will be then converted to json
+        self.data = {}
+        # Stores the name of the record files
+        # Necessary because we need first to create the record and then to put the files
+        self.record_files = []
 
-    @_set_initial_variables
-    def create_invenio_data(self, global_counters: dict, item: dict):
-        """Process the data received from Pure and submits it to RDM."""
+        # Stores all extra fields that are not in the standard RDM datamodel
+        self.pure_extensions = {}
+
+    def enrich(self):
+        """Gets the record data that is not in the Pure item.
+
+        Versions already in RDM, contributors orcid, files and groups.
+        """
         # Versioning
         self._check_record_version()
 
         # Record owners
         self._check_record_owners()
 
-        # Initialize data attribute
-        self.data = dict()
+        # Person Associations
+        self._process_person_associations()
+
+        # Electronic Versions (files)
+        self._process_electronic_versions()
+
+        # Additional Files
+        if "additionalFiles" in self.item:
+            for i in self.item["additionalFiles"]:
+                self.get_files_data(i)
+
+        # Organisational Units
+        self._process_organisational_units()
+
+    def convert(self):
+        """Converts the Pure item to the RDM json."""
+        build_start = time.perf_counter()
+        item = self.item
 
         # Assign to '_created_by' the userid of the Pure admin user
         userid = self.rdm_db.get_pure_user_id()
         if not userid:
+            self.retry_queue.push(self.uuid, "RDM pure user not found")
             return False
         self.data["_created_by"] = userid
 
@@ -118,9 +148,6 @@ class RdmAddRecord:
         # Title
         self._add_title()
 
-        # Person Associations
-        self._process_person_associations()
-
         # Description
         self._add_description()
 
@@ -136,17 +163,6 @@ class RdmAddRecord:
         # Process various general fields
         self._process_general_fields(item)
 
-        # Electronic Versions (files)
-        self._process_electronic_versions()
-
-        # Additional Files
-        if "additionalFiles" in item:
-            for i in item["additionalFiles"]:
-                self.get_files_data(i)
-
-        # Organisational Units
-        self._process_organisational_units()
-
         # Checks if the restrictions applied to the record are valid
         self._applied_restrictions_check()
 
@@ -156,11 +172,8 @@ class RdmAddRecord:
         # Convert to json string
         self.data = json.dumps(self.data)
 
-        # Post request to RDM
-        self._post_metadata()
-
-        # Updates the versioning data of all records with the same uuid
-        self._update_all_uuid_versions()
+        metrics.observe("record.build", time.perf_counter() - build_start)
+        return True
 
     def _access_right_and_restrictions(self, item):
         """Description."""
@@ -241,6 +254,7 @@ class RdmAddRecord:
         return _wrapper
 
     @_versioning_required
+    @metrics.timed("record.versioning")
     def _check_record_version(self):
         """Checks if there are in RDM other versions of the same uuid."""
         # Get metadata version
@@ -248,11 +262,19 @@ class RdmAddRecord:
         if response:
             self.data["metadataVersion"] = response[0]
             self.data["metadataOtherVersions"] = response[1]
+            # Old versions metadata, used after the record is created
+            self.old_versions = response[2]
 
     @_versioning_required
+    @metrics.timed("record.versioning")
     def _update_all_uuid_versions(self):
         """Updates the versioning data of all records with the same uuid."""
-        self.versioning.update_all_uuid_versions(self.uuid)
+        # The record was not created
+        if not self.recid:
+            return
+        self.versioning.update_all_uuid_versions(
+            self.recid, json.loads(self.data), self.old_versions
+        )
 
     def _check_record_owners(self):
         """Removes duplicate owners."""
@@ -303,6 +325,7 @@ class RdmAddRecord:
         if value:
             self.pure_extensions[rdm_field] = value
 
+    @metrics.timed("record.files_download")
     def _process_electronic_versions(self):
         """Data relative to files."""
         self.rdm_file_review = []
@@ -315,6 +338,7 @@ class RdmAddRecord:
             for i in self.item["electronicVersions"]:
                 self.get_files_data(i)
 
+    @metrics.timed("record.person_associations")
     def _process_person_associations(self):
         """Process data ralative to the record creators."""
         if "personAssociations" not in self.item:
@@ -322,8 +346,6 @@ class RdmAddRecord:
 
         self.data["creators"] = []
 
-        file_data = file_read_lines("user_ids_match")
-
         for item in self.item["personAssociations"]:
 
             self.sub_data = {}
@@ -363,7 +385,13 @@ class RdmAddRecord:
 
             # Checks if the record owner is available in user_ids_match.txt
             person_external_id = get_value(item, ["person", "externalId"])
-            owner = get_userid_from_list_by_externalid(person_external_id, file_data)
+            owner = owner_map.get_user_id_by_external_id(person_external_id)
+            if owner:
+                self.report.event(
+                    "rdm_owner_match",
+                    user_id=owner,
+                    external_id=person_external_id,
+                )
             if owner and int(owner) not in self.data["_owners"]:
                 self.data["_owners"].append(int(owner))
 
@@ -401,22 +429,24 @@ class RdmAddRecord:
                 "type_p" in self.sub_data
                 and self.sub_data["type_p"] == "External person"
             ):
-                report = f"\tPure get orcid @@ External person @ {person_uuid} @ {person_name}"
-                self.report.add(report)
+                self.report.event(
+                    "pure_orcid_external", person_uuid=person_uuid, name=person_name
+                )
             else:
                 orcid = self._get_orcid(person_uuid, person_name)
                 if orcid:
                     self.sub_data["identifiers"]["orcid"] = orcid
 
+    @metrics.timed("record.organisational_units")
     def _process_organisational_units(self):
         """Process the metadata relative to the organisational units."""
         if "organisationalUnits" in self.item:
             self.data["group_restrictions"] = []
+            groups = {}
 
             for i in self.item["organisationalUnits"]:
 
                 organisational_unit_name = get_value(i, ["names", 0, "value"])
-                organisational_unit_uuid = get_value(i, ["uuid"])
                 organisational_unit_externalId = get_value(i, ["externalId"])
 
                 if not organisational_unit_externalId:
@@ -424,11 +454,10 @@ class RdmAddRecord:
 
                 # Adding organisational unit as group owner
                 self.data["group_restrictions"].append(organisational_unit_externalId)
+                groups[organisational_unit_externalId] = organisational_unit_name
 
-                # Create group
-                self.groups.rdm_create_group(
-                    organisational_unit_externalId, organisational_unit_name
-                )
+            # Creates the groups not in RDM yet
+            known_groups.ensure(groups)
 
     def _applied_restrictions_check(self):
         """Checks if the restrictions applied to the record are valid.
@@ -446,56 +475,76 @@ class RdmAddRecord:
                 self.report.add(report)
         return True
 
-    def _post_metadata(self):
-        """Submits the created json to RDM."""
+    def write(self):
+        """Submits the created json to RDM and gets the recid of the new record."""
         uuid = self.item["uuid"]
-        success_check = {"metadata": False, "file": False}
+        self.success_check = {"metadata": False, "file": False}
+        self.recid = None
 
         # POST REQUEST metadata
-        response = self.rdm_requests.post_metadata(self.data)
+        with metrics.timer("record.post_metadata"):
+            response = self.rdm_requests.post_metadata(self.data)
 
         # Process response
         if not self._process_post_response(response, uuid):
+            self.retry_queue.push(uuid, f"RDM post metadata: {response.status_code}")
             return False
 
-        success_check["metadata"] = True
+        self.success_check["metadata"] = True
 
         # After pushing a record's metadata to RDM it takes about one second to be able to get its recid
-        time.sleep(1)
+        with metrics.timer("record.post_create_sleep"):
+            time.sleep(1)
 
         # Gets recid from RDM
-        recid = self.rdm_requests.get_recid(uuid, self.global_counters)
+        with metrics.timer("record.get_recid"):
+            recid = self.rdm_requests.get_recid(uuid, self.global_counters)
         if not recid:
+            self.retry_queue.push(uuid, "RDM recid not found")
             return False
+        self.recid = recid
 
-        # add record to all_rdm_records.txt
-        open(data_files_name["all_rdm_records"], "a").write(f"{uuid} {recid}\n")
+        # add record to all_rdm_records.txt (locked against the compaction)
+        file_name = data_files_name["all_rdm_records"]
+        with file_lock(file_name), open(file_name, "a") as fp:
+            fp.write(f"{uuid} {recid}\n")
+        return True
 
+    def upload(self):
+        """Submits the record files and updates the versions of the same uuid."""
         # Submit record FILES
         for file_name in self.record_files:
 
             # Submit request
-            response = self.rdm_requests.rdm_add_file(file_name, recid)
+            with metrics.timer("record.files_upload"):
+                response = self.rdm_requests.rdm_add_file(file_name, self.recid)
             # Process response
-            successful = self._process_file_response(response, success_check)
+            successful = self._process_file_response(response, self.success_check)
 
             # if successful:
             # # Sends email to remove record from Pure
             # send_email(uuid, file_name)
 
         if not self.record_files:
-            success_check["file"] = True
+            self.success_check["file"] = True
 
         # Checks if both metadata and files were correctly transmitted
-        self._metadata_and_file_submission_check(success_check)
+        transmitted = self._metadata_and_file_submission_check(self.success_check)
+
+        # Updates the versioning data of all records with the same uuid
+        self._update_all_uuid_versions()
+        return transmitted
 
     def _process_post_response(self, response: object, uuid: str):
         """Description."""
         # Count http responses
         self._http_response_counter(response.status_code)
 
-        self.report.add(
-            f"\tRDM post metadata @ {response} @ Uuid:                 {uuid}"
+        self.report.event(
+            "rdm_post_metadata",
+            ERROR if response.status_code >= 300 else INFO,
+            status=response.status_code,
+            uuid=uuid,
         )
 
         if response.status_code >= 300:
@@ -514,17 +563,6 @@ class RdmAddRecord:
         else:
             self.global_counters["file"]["error"] += 1
 
-    def _remove_uuid_from_list(self, uuid: str, file_name: str):
-        """If the given uuid is in the given file then the line will be removed."""
-        check_if_file_exists(file_name)
-
-        with open(file_name, "r") as f:
-            lines = f.readlines()
-        with open(file_name, "w") as f:
-            for line in lines:
-                if line.strip("\n") != uuid:
-                    f.write(line)
-
     def _add_field(self, item: list, rdm_field: str, path: list):
         """Adds the field to the data json."""
         value = get_value(item, path)
@@ -674,23 +712,30 @@ class RdmAddRecord:
             if self.pure_rdm_file_match[1]:
                 match_review = "Match: T, Review: T"
 
-        file_name_report = shorten_file_name(file_name)
-
-        report = f"\tPure get file @ {response} @ {match_review} @ {file_name_report}"
-        self.report.add(report)
+        self.report.event(
+            "pure_get_file",
+            INFO if response else ERROR,
+            status=response.status_code if response is not None else False,
+            match_review=match_review,
+            file_name=file_name,
+        )
 
         self.record_files.append(file_name)
 
+    @metrics.timed("record.orcid")
     def _get_orcid(self, person_uuid: str, name: str):
         """Gets from pure a person orcid."""
         # Pure request
         response = get_pure_metadata("persons", person_uuid, {}, False)
 
-        message = f"\tPure get orcid @ {response} @"
-
         # Error
         if response.status_code >= 300:
-            self.report.add(f"{message} Error: {response.content}")
+            self.report.event(
+                "pure_get_orcid_error",
+                ERROR,
+                status=response.status_code,
+                content=response.content,
+            )
             return False
 
         # Load json
@@ -699,23 +744,33 @@ class RdmAddRecord:
         # Read orcid
         if "orcid" in resp_json:
             orcid = resp_json["orcid"]
-            self.report.add(f"{message} {orcid} @ {person_uuid} @ {name}")
+            self.report.event(
+                "pure_get_orcid",
+                status=response.status_code,
+                orcid=orcid,
+                person_uuid=person_uuid,
+                name=name,
+            )
             return orcid
 
         # Not found
-        self.report.add(f"{message} Orcid not found @ {person_uuid} @ {name}")
+        self.report.event(
+            "pure_get_orcid",
+            status=response.status_code,
+            orcid="Orcid not found",
+            person_uuid=person_uuid,
+            name=name,
+        )
         return False
 
     def _metadata_and_file_submission_check(self, success_check: dict):
         """Checks if both metadata and files were correctly transmitted."""
         if success_check["metadata"] is True and success_check["file"] is True:
-            # Remove uuid from to_transmit.txt
-            self._remove_uuid_from_list(
-                self.uuid, data_files_name["transfer_uuid_list"]
-            )
+            # Remove uuid from the retry queue
+            self.retry_queue.remove(self.uuid)
         else:
-            # Add uuid to to_transmit.txt to be re-transmitted
-            open(data_files_name["transfer_uuid_list"], "a").write(f"{self.uuid}\n")
+            # Add uuid to the retry queue to be re-transmitted
+            self.retry_queue.push(self.uuid, "RDM put file")
             return False
         return True
 
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Final operation to apply in RDM for each record changed in Pure."""
+
+import sqlite3
+import time
+
+from ...setup import change_plan_max_attempts
+from ..state_db import StateDatabase
+from .retry_queue import RetryQueue
+
+schema = """
+CREATE TABLE IF NOT EXISTS change_plan (
+    uuid            TEXT PRIMARY KEY,
+    change_type     TEXT NOT NULL,
+    date            TEXT NOT NULL,
+    updated         REAL NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt    REAL NOT NULL DEFAULT 0
+);
+"""
+
+# Columns added after the first version of the table
+added_columns = {
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "next_attempt": "REAL NOT NULL DEFAULT 0",
+}
+
+
+class ChangePlan:
+    """Pure changes of all the pending dates, reduced to one operation per uuid.
+
+    A change of a later date replaces the planned one, while within the
+    same date a deletion wins over creations and updates (as when the
+    changes were processed page by page).
+    A change that failed is retried after a backoff (as in the retry
+    queue), until change_plan_max_attempts attempts.
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+        self._add_columns()
+
+    @staticmethod
+    def reduce(items: list, changes: dict = None):
+        """Reduces the items of a changes page to their last change type per uuid.
+
+        Returns the number of items merged with an other change of the same uuid.
+        """
+        changes = {} if changes is None else changes
+        duplicated = 0
+        for item in items:
+            uuid = item["uuid"]
+            if uuid in changes:
+                duplicated += 1
+                if changes[uuid] == "DELETE":
+                    continue
+            changes[uuid] = item["changeType"]
+        return duplicated
+
+    def add(self, changes_date: str, changes: dict):
+        """Merges the changes of a date into the plan.
+
+        To be called within the transaction that stores the page checkpoint.
+        """
+        now = time.time()
+        self.db.connection.executemany(
+            """
+            INSERT INTO change_plan (uuid, change_type, date, updated)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(uuid) DO UPDATE SET
+                change_type = CASE
+                    WHEN change_plan.date = excluded.date
+                        AND change_plan.change_type = 'DELETE' THEN 'DELETE'
+                    ELSE excluded.change_type END,
+                date = excluded.date,
+                updated = excluded.updated,
+                attempts = 0,
+                next_attempt = 0
+            WHERE excluded.date >= change_plan.date
+            """,
+            [
+                (uuid, change_type, changes_date, now)
+                for uuid, change_type in changes.items()
+            ],
+        )
+
+    def get_all(self):
+        """Gets (uuid, change_type) of the planned changes due, deletions first.
+
+        The changes waiting for their backoff, or given up, are left out.
+        """
+        return self.db.select_all(
+            "SELECT uuid, change_type FROM change_plan "
+            "WHERE next_attempt <= ? AND attempts < ? "
+            "ORDER BY change_type != 'DELETE', date, uuid",
+            (time.time(), change_plan_max_attempts),
+        )
+
+    def fail(self, uuid: str, change_type: str):
+        """Counts a failed attempt of a change, delaying the next one."""
+        with self.db.transaction() as connection:
+            row = connection.execute(
+                "SELECT attempts FROM change_plan WHERE uuid = ? AND change_type = ?",
+                (uuid, change_type),
+            ).fetchone()
+            if row is None:
+                # Replaced meanwhile by a newer change
+                return
+            attempts = row[0] + 1
+            connection.execute(
+                "UPDATE change_plan SET attempts = ?, next_attempt = ?, updated = ? "
+                "WHERE uuid = ?",
+                (
+                    attempts,
+                    time.time() + RetryQueue.backoff(attempts),
+                    time.time(),
+                    uuid,
+                ),
+            )
+
+    def remove(self, uuid: str, change_type: str = None):
+        """Removes from the plan an applied change.
+
+        With change_type, the change is kept if it was replaced meanwhile.
+        """
+        if change_type is None:
+            self.db.execute("DELETE FROM change_plan WHERE uuid = ?", (uuid,))
+            return
+        self.db.execute(
+            "DELETE FROM change_plan WHERE uuid = ? AND change_type = ?",
+            (uuid, change_type),
+        )
+
+    def count(self):
+        """Gets the number of changes still to apply."""
+        return self.db.select_one("SELECT COUNT(*) FROM change_plan")[0]
+
+    def count_due(self):
+        """Gets the number of changes returned by get_all."""
+        return self.db.select_one(
+            "SELECT COUNT(*) FROM change_plan WHERE next_attempt <= ? AND attempts < ?",
+            (time.time(), change_plan_max_attempts),
+        )[0]
+
+    def count_given_up(self):
+        """Gets the number of changes that failed change_plan_max_attempts times."""
+        return self.db.select_one(
+            "SELECT COUNT(*) FROM change_plan WHERE attempts >= ?",
+            (change_plan_max_attempts,),
+        )[0]
+
+    def _add_columns(self):
+        """Adds the columns missing in a plan created by an older version."""
+        columns = {
+            row[1] for row in self.db.select_all("PRAGMA table_info(change_plan)")
+        }
+        for name, definition in added_columns.items():
+            if name in columns:
+                continue
+            try:
+                self.db.execute(
+                    f"ALTER TABLE change_plan ADD COLUMN {name} {definition}"
+                )
+            except sqlite3.OperationalError:
+                # Added meanwhile by another process
+                pass
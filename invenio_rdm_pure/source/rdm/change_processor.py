@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Concurrent processing of Pure changes, on the record pipeline."""
+
+from .delete_record import Delete
+from .record_pipeline import RecordPipeline, Transfer
+from .requests_rdm import Requests
+
+
+class ChangeProcessor:
+    """Applies Pure changes on the record pipeline (see record_pipeline.py).
+
+    The change plan holds a single change per uuid, so the changes of
+    different records can run in any order. Deletions are done by the fetch
+    stage, creations and updates go through all the stages. The threads
+    are kept until close (e.g. between two polls of the watch).
+    """
+
+    def __init__(self):
+        """Description."""
+        self.delete_record = Delete()
+        self.rdm_requests = Requests()
+        self.pipeline = RecordPipeline(fetch=self._fetch)
+
+    def delete(self, uuid: str, on_done=None, on_failed=None):
+        """Queues the deletion of the RDM record of the given uuid."""
+        self.pipeline.put(
+            Transfer(uuid, on_done=on_done, key="DELETE", on_failed=on_failed)
+        )
+
+    def update(self, uuid: str, on_done=None, on_failed=None):
+        """Queues the creation / update of the RDM record of the given uuid."""
+        self.pipeline.put(
+            Transfer(uuid, on_done=on_done, key="UPDATE", on_failed=on_failed)
+        )
+
+    def join(self):
+        """Waits for all queued changes and returns (and resets) their counters."""
+        return self.pipeline.join()
+
+    def close(self):
+        """Stops the threads once the queued changes are processed."""
+        self.pipeline.close()
+
+    def _fetch(self, transfer: Transfer):
+        """Deletes the record, or gets its Pure metadata (see RecordPipeline)."""
+        if transfer.key != "DELETE":
+            return self.pipeline.fetch_by_uuid(transfer)
+
+        # Gets the record recid
+        recid = self.rdm_requests.get_recid(transfer.uuid, transfer.counters)
+
+        if recid:
+            # Deletes the record from RDM (410: already deleted)
+            response = self.delete_record.record(recid)
+            transfer.completed = (
+                response.status_code < 300 or response.status_code == 410
+            )
+        else:
+            # The record is not in RDM
+            transfer.counters["delete"]["success"] += 1
+            transfer.completed = True
+        return []
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Checkpoints of the processing of Pure 'changes' endpoint."""
+
+import os
+import time
+from datetime import date, timedelta
+
+from ...setup import data_files_name
+from ..state_db import StateDatabase
+
+schema = """
+CREATE TABLE IF NOT EXISTS change_dates (
+    date            TEXT PRIMARY KEY,
+    completed       INTEGER NOT NULL DEFAULT 0,
+    reference       TEXT NOT NULL,
+    page            INTEGER NOT NULL DEFAULT 1,
+    updated         REAL NOT NULL
+);
+"""
+
+
+class ChangesLedger:
+    """Keeps track of the dates and pages of Pure changes already processed.
+
+    For each date it stores the reference (resume token) of the next page to
+    process, so that an interrupted run continues from the page where it
+    stopped.
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+
+    def missing_dates(self, days_span: int = 7):
+        """Gets the dates (most recent first) whose changes were not fully processed."""
+        today = date.today()
+        dates = [str(today - timedelta(days=days)) for days in range(days_span)]
+        completed = {
+            row[0]
+            for row in self.db.select_all(
+                "SELECT date FROM change_dates WHERE completed = 1 AND date >= ?",
+                (dates[-1],),
+            )
+        }
+        return [changes_date for changes_date in dates if changes_date not in completed]
+
+    def get_checkpoint(self, changes_date: str):
+        """Gets reference and number of the page to resume from."""
+        row = self.db.select_one(
+            "SELECT reference, page FROM change_dates WHERE date = ?",
+            (changes_date,),
+        )
+        if row is None:
+            return changes_date, 1
+        return row
+
+    def set_page(self, changes_date: str, reference: str, page: int):
+        """Stores the reference of the next page to process."""
+        self._upsert(changes_date, 0, reference, page)
+
+    def complete(self, changes_date: str):
+        """Marks all the changes of a date as processed."""
+        reference, page = self.get_checkpoint(changes_date)
+        self._upsert(changes_date, 1, reference, page)
+
+    def prune(self, days_keep: int):
+        """Removes the checkpoints older than days_keep days."""
+        date_limit = str(date.today() - timedelta(days=days_keep))
+        cursor = self.db.execute(
+            "DELETE FROM change_dates WHERE date < ?", (date_limit,)
+        )
+        return cursor.rowcount
+
+    def _upsert(self, changes_date, completed, reference, page):
+        """Description."""
+        self.db.execute(
+            "INSERT OR REPLACE INTO change_dates "
+            "(date, completed, reference, page, updated) VALUES (?, ?, ?, ?, ?)",
+            (changes_date, completed, reference, page, time.time()),
+        )
+
+    def import_successful_changes(
+        self, file_name: str = data_files_name["successful_changes"]
+    ):
+        """Moves the dates listed in successful_changes.txt (older versions).
+
+        One-off migration, called before the changes are processed.
+        """
+        if not os.path.isfile(file_name):
+            return
+        for line in open(file_name):
+            changes_date = line.strip()
+            if changes_date:
+                self._upsert(changes_date, 1, changes_date, 1)
+        os.remove(file_name)
@@ -7,36 +7,280 @@
 
 """File description."""
 
+import threading
+import time
+from contextlib import contextmanager
+
 from flask import current_app
 from flask_security.utils import hash_password
 from invenio_db import db
+from sqlalchemy import bindparam, text
 
+from ...models import TaskLease
+from ...setup import database_cache_ttl_sec, task_lease_sec
 from ..reports import Reports
 
 
+class TtlCache:
+    """Dictionary whose values expire after ttl seconds."""
+
+    def __init__(self, ttl: float):
+        """Description."""
+        self.ttl = ttl
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Gets the value of the key if not expired."""
+        with self._lock:
+            value, expires = self._values.get(key, (default, 0))
+            if expires < time.monotonic():
+                self._values.pop(key, None)
+                return default
+            return value
+
+    def set(self, key, value):
+        """Description."""
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + self.ttl)
+
+    def clear(self):
+        """Description."""
+        with self._lock:
+            self._values.clear()
+
+
 class RdmDatabase:
-    """Responsible for database connection and querying."""
+    """Responsible for database connection and querying.
+
+    Runs on the Invenio SQLAlchemy engine (invenio_db), always with bound
+    parameters. The statements are built once and reused, so SQLAlchemy
+    can reuse their compiled form.
+    """
+
+    # Statements shared by all the instances, by (fields, table, filter keys)
+    _statements = {}
+    # Connection of the transaction running in the current thread
+    _local = threading.local()
+
+    # Short-lived caches of the hot lookups
+    roles_cache = TtlCache(database_cache_ttl_sec)
+    emails_cache = TtlCache(database_cache_ttl_sec)
 
     def __init__(self):
         """Description."""
         self.report = Reports()
 
-    def select_query(self, fields: str, table: str, filters={}):
-        """Makes a select query to the database."""
-        # Creating filters string
-        filters_str = ""
-        if filters:
-            filters_str += " WHERE"
-            for key in filters:
-                filters_str += f" {key} = {filters[key]} AND"
-            filters_str = filters_str[:-4]
-        # Query
-        query = f"SELECT {fields} FROM {table}{filters_str};"
-
-        self.cursor.execute(query)
-        if self.cursor.rowcount == 0:
+    @contextmanager
+    def transaction(self):
+        """Runs the queries of the with block in a single transaction.
+
+        Nested blocks join the transaction that is already running.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            yield connection
+            return
+
+        with db.engine.begin() as connection:
+            self._local.connection = connection
+            try:
+                yield connection
+            finally:
+                self._local.connection = None
+
+    def execute(self, query, parameters: dict = None):
+        """Executes a statement (text or SQLAlchemy statement), returns the rowcount."""
+        if isinstance(query, str):
+            query = self._get_statement(query)
+        with self.transaction() as connection:
+            return connection.execute(query, parameters or {}).rowcount
+
+    def fetch_all(self, query, parameters: dict = None):
+        """Executes a query and returns all its rows.
+
+        The rows are fetched before the transaction is committed.
+        """
+        if isinstance(query, str):
+            query = self._get_statement(query)
+        with self.transaction() as connection:
+            return connection.execute(query, parameters or {}).fetchall()
+
+    def executemany(self, query, parameters: list):
+        """Executes a statement for each set of parameters, in a single transaction."""
+        if not parameters:
+            return 0
+        if isinstance(query, str):
+            query = self._get_statement(query)
+        with self.transaction() as connection:
+            return connection.execute(query, parameters).rowcount
+
+    def select_query(self, fields: str, table: str, filters: dict = None):
+        """Makes a select query to the database.
+
+        The filters values are bound parameters, they must not be quoted.
+        """
+        filters = filters or {}
+        key = (fields, table, tuple(filters))
+        query = self._statements.get(key)
+        if query is None:
+            conditions = " AND ".join(f"{name} = :{name}" for name in filters)
+            where = f" WHERE {conditions}" if conditions else ""
+            query = text(f"SELECT {fields} FROM {table}{where}")
+            self._statements[key] = query
+
+        rows = self.fetch_all(query, filters)
+        if not rows:
             return False
-        return self.cursor.fetchall()
+        return rows
+
+    def get_role(self, name: str):
+        """Gets (id, description) of the role (group) with the given name."""
+        role = self.roles_cache.get(name)
+        if role is None:
+            rows = self.select_query("id, description", "accounts_role", {"name": name})
+            if not rows:
+                return False
+            role = tuple(rows[0])
+            self.roles_cache.set(name, role)
+        return role
+
+    def get_user_email(self, user_id: int):
+        """Gets the email of the user with the given id."""
+        email = self.emails_cache.get(user_id)
+        if email is None:
+            rows = self.select_query("email", "accounts_user", {"id": user_id})
+            if not rows:
+                return False
+            email = rows[0][0]
+            self.emails_cache.set(user_id, email)
+        return email
+
+    def clear_caches(self):
+        """Empties the caches (e.g. after roles are created or removed)."""
+        self.roles_cache.clear()
+        self.emails_cache.clear()
+
+    def get_role_ids(self, names: list):
+        """Gets the ids of the roles (groups) with the given names, in a single query."""
+        query = self._get_statement(
+            "SELECT name, id FROM accounts_role WHERE name IN :names", ["names"]
+        )
+        rows = self.fetch_all(query, {"names": list(names)})
+        return {name: role_id for name, role_id in rows}
+
+    def count_role_users(self, role_ids: list):
+        """Gets the number of users of each role."""
+        query = self._get_statement(
+            "SELECT role_id, COUNT(*) FROM accounts_userrole "
+            "WHERE role_id IN :role_ids GROUP BY role_id",
+            ["role_ids"],
+        )
+        rows = self.fetch_all(query, {"role_ids": list(role_ids)})
+        return {role_id: count for role_id, count in rows}
+
+    def move_role_users(self, old_role_ids: list, new_role_ids: list):
+        """Moves all the users of the old roles to the new roles, in one transaction.
+
+        Returns the number of added and of removed memberships.
+        """
+        insert_query = self._get_statement(
+            """
+            INSERT INTO accounts_userrole (user_id, role_id)
+            SELECT DISTINCT old.user_id, :new_role_id
+            FROM accounts_userrole AS old
+            WHERE old.role_id IN :old_role_ids
+            AND NOT EXISTS (
+                SELECT 1 FROM accounts_userrole AS new
+                WHERE new.user_id = old.user_id AND new.role_id = :new_role_id
+            )
+            """,
+            ["old_role_ids"],
+        )
+        delete_query = self._get_statement(
+            "DELETE FROM accounts_userrole WHERE role_id IN :old_role_ids",
+            ["old_role_ids"],
+        )
+
+        # A role that is also a new one keeps its users
+        old_role_ids = [
+            role_id for role_id in old_role_ids if role_id not in new_role_ids
+        ]
+
+        added = 0
+        with self.transaction() as connection:
+            for new_role_id in new_role_ids:
+                result = connection.execute(
+                    insert_query,
+                    {"old_role_ids": old_role_ids, "new_role_id": new_role_id},
+                )
+                added += result.rowcount
+            result = connection.execute(delete_query, {"old_role_ids": old_role_ids})
+        return added, result.rowcount
+
+    def _get_statement(self, query: str, expanding: list = None):
+        """Gets the statement of the query, built only the first time."""
+        expanding = expanding or []
+        key = (query, tuple(expanding))
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = text(query)
+            if expanding:
+                statement = statement.bindparams(
+                    *[bindparam(name, expanding=True) for name in expanding]
+                )
+            self._statements[key] = statement
+        return statement
+
+    def acquire_lease(self, key: str, seconds: float = task_lease_sec):
+        """Takes the lease of the key, False if it is held by another task.
+
+        The leases are in the RDM database (TaskLease), shared by all the
+        worker nodes.
+        """
+        now = time.time()
+        rowcount = self.execute(
+            f"""
+            INSERT INTO {TaskLease.__tablename__} (lease_key, expires)
+            VALUES (:key, :expires)
+            ON CONFLICT (lease_key) DO UPDATE SET expires = :expires
+            WHERE {TaskLease.__tablename__}.expires < :now
+            """,
+            {"key": key, "expires": now + seconds, "now": now},
+        )
+        return rowcount == 1
+
+    def renew_lease(self, key: str, seconds: float = task_lease_sec):
+        """Extends a held lease (long task chains)."""
+        self.execute(
+            f"UPDATE {TaskLease.__tablename__} SET expires = :expires "
+            "WHERE lease_key = :key",
+            {"key": key, "expires": time.time() + seconds},
+        )
+
+    def release_lease(self, key: str):
+        """Description."""
+        self.execute(
+            f"DELETE FROM {TaskLease.__tablename__} WHERE lease_key = :key",
+            {"key": key},
+        )
+
+    def create_roles(self, roles: dict):
+        """Creates the roles (name -> description) with a single commit.
+
+        Returns the names of the created roles.
+        """
+        datastore = current_app.extensions["security"].datastore
+        created = []
+        for name, description in roles.items():
+            if datastore.find_role(name):
+                continue
+            # As when the role is created with 'invenio roles create'
+            description = (description or "").replace(" ", "_")
+            datastore.create_role(name=name, description=description)
+            created.append(name)
+        db.session.commit()
+        return created
 
     @staticmethod
     def get_pure_user_id():
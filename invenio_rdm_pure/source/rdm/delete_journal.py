@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Journal of the RDM records deleted and not yet removed from the data files."""
+
+import os
+import time
+
+from ...setup import data_files_name, delete_compact_every
+from ..state_db import StateDatabase
+from ..utils import file_lock
+
+schema = """
+CREATE TABLE IF NOT EXISTS delete_journal (
+    recid           TEXT PRIMARY KEY,
+    deleted         REAL NOT NULL
+);
+"""
+
+
+class DeleteJournal:
+    """Recids deleted from RDM.
+
+    Each deletion is recorded with a single insert, to_delete.txt and
+    all_rdm_records.txt are rewritten once (compact_files), instead of
+    after every deletion.
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+
+    def add(self, recid: str):
+        """Records a deleted recid."""
+        self.db.execute(
+            "INSERT OR REPLACE INTO delete_journal VALUES (?, ?)", (recid, time.time())
+        )
+
+    def get_all(self):
+        """Gets the set of deleted recids."""
+        return {
+            row[0] for row in self.db.select_all("SELECT recid FROM delete_journal")
+        }
+
+    def count(self):
+        """Gets the number of deleted recids not yet removed from the data files."""
+        return self.db.select_one("SELECT COUNT(*) FROM delete_journal")[0]
+
+    def compact_if_due(self):
+        """Compacts the data files once delete_compact_every recids were deleted."""
+        if self.count() < delete_compact_every:
+            return 0
+        return self.compact_files()
+
+    def compact_files(self):
+        """Removes the deleted recids from to_delete.txt and all_rdm_records.txt.
+
+        Returns the number of removed lines.
+        """
+        snapshot_time = time.time()
+        deleted = self.get_all()
+        if not deleted:
+            return 0
+
+        # to_delete.txt: one recid per line
+        removed = _rewrite_file(
+            data_files_name["delete_recid_list"],
+            lambda line: line.strip("\n") in deleted,
+        )
+        # all_rdm_records.txt: '<uuid> <recid>' per line
+        removed += _rewrite_file(
+            data_files_name["all_rdm_records"],
+            lambda line: line.strip("\n").split(" ")[-1] in deleted,
+        )
+
+        # The recids deleted meanwhile are kept for the next compaction
+        self.db.execute(
+            "DELETE FROM delete_journal WHERE deleted <= ?", (snapshot_time,)
+        )
+        return removed
+
+
+def _rewrite_file(file_name: str, is_deleted):
+    """Rewrites the file without the lines of the deleted recids."""
+    if not os.path.isfile(file_name):
+        return 0
+
+    removed = 0
+    temporary_file_name = f"{file_name}.tmp"
+    # No line can be appended between the read and the replace
+    with file_lock(file_name):
+        with open(file_name) as source, open(temporary_file_name, "w") as target:
+            for line in source:
+                if is_deleted(line):
+                    removed += 1
+                else:
+                    target.write(line)
+
+        # Replaces the file at once, it is never left half written
+        os.replace(temporary_file_name, file_name)
+    return removed
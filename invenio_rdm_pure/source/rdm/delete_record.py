@@ -7,9 +7,14 @@
 
 """File description."""
 
-from ...setup import data_files_name
-from ..reports import Reports
-from ..utils import file_read_lines
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+from ...setup import data_files_name, delete_progress_every, delete_workers
+from ..reports import ERROR, INFO, Reports
+from .delete_journal import DeleteJournal
 from .requests_rdm import Requests
 
 
@@ -20,26 +25,35 @@ class Delete:
         """Description."""
         self.rdm_requests = Requests()
         self.report = Reports()
+        self.journal = DeleteJournal()
 
     def record(self, recid: str):
         """Deletes record from RDM."""
+        response = self._delete(recid)
+        # Deletions outside of from_list and all_records (changes, duplicates)
+        self.journal.compact_if_due()
+        return response
+
+    def _delete(self, recid: str):
+        """Deletes record from RDM and records it in the journal."""
         # NOTE: the user ACCOUNT related to the used TOKEN must be ADMIN
 
         # Delete record request
         response = self.rdm_requests.delete_metadata(recid)
 
-        report = f"\tRDM delete record @ {response} @ Deleted recid:        {recid}"
-        self.report.add(report)
+        self.report.event(
+            "rdm_delete_record",
+            ERROR if response.status_code >= 300 else INFO,
+            status=response.status_code,
+            recid=recid,
+        )
 
         # 410 -> "PID has been deleted"
         if response.status_code >= 300 and response.status_code != 410:
             return response
 
-        # Remove deleted recid from to_delete.txt
-        self._remove_recid_from_delete_list(recid)
-
-        # remove record from all_rdm_records.txt
-        self._remove_recid_from_records_list(recid)
+        # Removed from to_delete.txt and all_rdm_records.txt by compact_files
+        self.journal.add(recid)
 
         return response
 
@@ -48,12 +62,21 @@ class Delete:
 
         def _wrapper(self):
             """Description."""
+            title = {"from_list": "DELETE FROM LIST", "all_records": "DELETE ALL"}
             self.report.add_template(
-                ["console"], ["general", "title"], ["DELETE FROM LIST"]
+                ["console"], ["general", "title"], [title[func.__name__]]
             )
             self.counters = {"total": 0, "success": 0, "error": 0}
+
+            # Removes the recids deleted by an interrupted run
+            self.journal.compact_files()
+
             # Decorated function
-            func(self)
+            try:
+                func(self)
+            finally:
+                # Rewrites the data files once
+                self.journal.compact_files()
 
             report = f"\nTotal: {self.counters['total']} @ Success: {self.counters['success']} @ Error: {self.counters['error']}"
             self.report.add(report)
@@ -67,6 +90,7 @@ class Delete:
         if not recids:
             return
 
+        valid_recids = []
         for recid in recids:
 
             recid = recid.strip("\n")
@@ -81,21 +105,51 @@ class Delete:
                 self.report.add(f"\n{recid} -> Wrong recid lenght! \n")
                 continue
 
-            # -- REQUEST --
-            response = self.record(recid)
+            valid_recids.append(recid)
 
-            # 410 -> "PID has been deleted"
-            if response.status_code < 300 or response.status_code == 410:
-                self.counters["success"] += 1
-            else:
-                self.counters["error"] += 1
+        self._delete_recids(valid_recids)
 
+    @_set_counters_and_title
     def all_records(self):
         """Delete all RDM records."""
-        file_data = open(data_files_name["all_rdm_records"]).readlines()
-        for line in file_data:
-            recid = line.split(" ")[1].strip("\n")
-            self.record(recid)
+        recids = []
+        for line in open(data_files_name["all_rdm_records"]):
+            line = line.strip("\n")
+            if line:
+                recids.append(line.split(" ")[1])
+
+        self.counters["total"] = len(recids)
+        self._delete_recids(recids)
+
+    def _delete_recids(self, recids: list):
+        """Deletes the recids on delete_workers threads, under the RDM rate limit."""
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def _initializer():
+            """Each thread needs its own application context."""
+            if app is not None:
+                app.app_context().push()
+
+        progress = _DeleteProgress(self.report, len(recids))
+        with ThreadPoolExecutor(delete_workers, initializer=_initializer) as executor:
+            for response in executor.map(self._delete_safely, recids):
+                # 410 -> "PID has been deleted"
+                if response is not None and (
+                    response.status_code < 300 or response.status_code == 410
+                ):
+                    self.counters["success"] += 1
+                else:
+                    self.counters["error"] += 1
+                progress.step()
+        progress.report_progress()
+
+    def _delete_safely(self, recid: str):
+        """Deletes the recid, an error only fails this recid (None)."""
+        try:
+            return self._delete(recid)
+        except Exception as error:
+            self.report.event("rdm_delete_failed", ERROR, recid=recid, error=error)
+            return None
 
     def _read_file_recids(self):
         """Reads from to_delete.txt all recids to be deleted."""
@@ -106,20 +160,32 @@ class Delete:
             return False
         return recids
 
-    def _remove_recid_from_delete_list(self, recid):
+
+class _DeleteProgress:
+    """Reports throughput and estimated remaining time of a deletion run."""
+
+    def __init__(self, report: Reports, total: int):
         """Description."""
-        file_name = "delete_recid_list"
-        lines = file_read_lines(file_name)
-        with open(data_files_name[file_name], "w") as f:
-            for line in lines:
-                if line.strip("\n") != recid:
-                    f.write(line)
-
-    def _remove_recid_from_records_list(self, recid):
+        self.report = report
+        self.total = total
+        self.done = 0
+        self.start = time.monotonic()
+
+    def step(self):
+        """Counts a processed recid, reports every delete_progress_every recids."""
+        self.done += 1
+        if self.done % delete_progress_every == 0:
+            self.report_progress()
+
+    def report_progress(self):
         """Description."""
-        file_name = "all_rdm_records"
-        lines = file_read_lines(file_name)
-        with open(data_files_name[file_name], "w") as f:
-            for line in lines:
-                if line.strip("\n").split(" ")[1] != recid:
-                    f.write(line)
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        self.report.event(
+            "delete_progress",
+            done=self.done,
+            total=self.total,
+            rate=f"{rate:.2f}",
+            eta=time.strftime("%H:%M:%S", time.gmtime(eta)),
+        )
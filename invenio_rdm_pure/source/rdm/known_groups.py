@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Process-wide cache of the RDM groups (accounts_role) that exist."""
+
+import threading
+import time
+
+from ...setup import database_cache_ttl_sec
+from ..reports import Reports
+from .database import RdmDatabase
+
+
+class KnownGroups:
+    """Names of the existing RDM groups, read in a single query.
+
+    Records are checked against the cache and only the groups not seen
+    yet are created (all the missing groups of a record at once).
+    The group split / merge commands invalidate it, the other processes
+    (watch, celery workers) read it again after database_cache_ttl_sec.
+    """
+
+    def __init__(self, ttl: float = database_cache_ttl_sec):
+        """Description."""
+        self.ttl = ttl
+        self._names = None
+        self._expires = 0
+        self._lock = threading.RLock()
+        self.report = Reports()
+
+    def ensure(self, groups: dict):
+        """Creates the groups (externalId -> name) that do not exist yet.
+
+        Returns the list of the created groups.
+        """
+        with self._lock:
+            self._warm()
+            missing = {
+                external_id: name
+                for external_id, name in groups.items()
+                if external_id not in self._names
+            }
+            if not missing:
+                return []
+
+            rdm_db = RdmDatabase()
+            created = rdm_db.create_roles(missing)
+            self._names.update(missing)
+
+        for external_id in created:
+            self.report.add(
+                f"\tNew group check @@ Group created @ External id: {external_id}"
+            )
+        return created
+
+    def add(self, external_id: str):
+        """Adds a group created elsewhere (e.g. invenio roles create)."""
+        with self._lock:
+            if self._names is not None:
+                self._names.add(external_id)
+
+    def invalidate(self):
+        """The cache is read again from the database at the next check."""
+        with self._lock:
+            self._names = None
+
+    def _warm(self):
+        """Reads the names of all the groups, if not read yet or expired."""
+        if self._names is not None and self._expires > time.monotonic():
+            return
+        rows = RdmDatabase().fetch_all("SELECT name FROM accounts_role")
+        self._names = {row[0] for row in rows}
+        self._expires = time.monotonic() + self.ttl
+
+
+# Shared by all the threads of the process
+known_groups = KnownGroups()
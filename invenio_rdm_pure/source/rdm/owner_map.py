@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""In memory indexes of data/user_ids_match.txt."""
+
+import os
+import threading
+import time
+
+from ...setup import data_files_name, owner_map_check_interval_sec
+from ..utils import check_if_directory_exists, check_if_file_exists
+
+
+class OwnerMap:
+    """Maps RDM user ids, Pure person uuids and Pure person externalIds.
+
+    Each line of user_ids_match.txt contains: rdm_user_id person_uuid externalId.
+    The file is read once per process and read again only if it has been
+    modified by another process (checked at most every check_interval seconds).
+    """
+
+    def __init__(
+        self,
+        file_name: str = data_files_name["user_ids_match"],
+        check_interval: float = owner_map_check_interval_sec,
+    ):
+        """Description."""
+        self.file_name = file_name
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._file_state = None
+        self._next_check = 0
+        self.by_user_id = {}
+        self.by_uuid = {}
+        self.by_external_id = {}
+
+    def get_user_id_by_external_id(self, external_id: str):
+        """Gets the RDM user id of the person with the given externalId."""
+        with self._lock:
+            self._load_if_changed()
+            entry = self.by_external_id.get(external_id)
+        return entry[0] if entry else None
+
+    def get_by_uuid(self, uuid: str):
+        """Gets the (user_id, uuid, externalId) entry of a Pure person uuid."""
+        with self._lock:
+            self._load_if_changed()
+            return self.by_uuid.get(uuid)
+
+    def get_by_user_id(self, user_id):
+        """Gets the (user_id, uuid, externalId) entry of an RDM user id."""
+        with self._lock:
+            self._load_if_changed()
+            return self.by_user_id.get(str(user_id))
+
+    def contains(self, user_id, uuid: str, external_id: str):
+        """Checks if the exact match is already listed."""
+        entry = (str(user_id), uuid, external_id)
+        with self._lock:
+            self._load_if_changed()
+            return self.by_external_id.get(external_id) == entry
+
+    def add(self, user_id, uuid: str, external_id: str):
+        """Appends the match to the file and to the indexes.
+
+        Returns False if the match was already listed.
+        """
+        with self._lock:
+            # Matches added by other processes are checked first
+            self._next_check = 0
+            if self.contains(user_id, uuid, external_id):
+                return False
+            line = f"{user_id} {uuid} {external_id}\n"
+            with open(self.file_name, "a") as fp:
+                # Size of the file before the match is appended
+                size = fp.seek(0, os.SEEK_END)
+                fp.write(line)
+            self._index(str(user_id), uuid, external_id)
+
+            # The file state is kept only if no other process appended to
+            # it since it was read, otherwise it is read again
+            file_state = self._get_file_state()
+            if (
+                self._file_state
+                and size == self._file_state[1]
+                and file_state[1] == size + len(line.encode())
+            ):
+                self._file_state = file_state
+            else:
+                self._file_state = None
+                self._next_check = 0
+            return True
+
+    def _load_if_changed(self):
+        """Reads the file if it was modified since the last time it was read."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        file_state = self._get_file_state()
+        if file_state == self._file_state:
+            return
+        self.by_user_id = {}
+        self.by_uuid = {}
+        self.by_external_id = {}
+        for line in open(self.file_name):
+            line = line.split()
+            if len(line) != 3:
+                continue
+            self._index(*line)
+        self._file_state = file_state
+
+    def _index(self, user_id: str, uuid: str, external_id: str):
+        """Adds the match to the indexes."""
+        entry = (user_id, uuid, external_id)
+        self.by_user_id[user_id] = entry
+        self.by_uuid[uuid] = entry
+        self.by_external_id[external_id] = entry
+
+    def _get_file_state(self):
+        """Modification time and size of the file (creates it if missing)."""
+        if not os.path.isfile(self.file_name):
+            check_if_directory_exists(os.path.dirname(self.file_name))
+            check_if_file_exists(self.file_name)
+        stat = os.stat(self.file_name)
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+# Shared by all the modules of the process
+owner_map = OwnerMap()
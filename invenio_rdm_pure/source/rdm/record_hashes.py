@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Hashes of the Pure metadata last synchronized for each research output."""
+
+import hashlib
+import json
+import time
+
+from ..state_db import StateDatabase
+
+schema = """
+CREATE TABLE IF NOT EXISTS record_hashes (
+    uuid            TEXT PRIMARY KEY,
+    hash            TEXT NOT NULL,
+    updated         REAL NOT NULL
+);
+"""
+
+
+class RecordHashes:
+    """Research outputs already synchronized, by the hash of their Pure metadata.
+
+    A research output whose metadata has the same hash as on the last
+    synchronization is unchanged and is not converted again.
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+
+    @staticmethod
+    def digest(item: dict):
+        """Gets the hash of the Pure metadata of a research output."""
+        content = json.dumps(item, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def is_unchanged(self, uuid: str, digest: str):
+        """Checks if the research output was synchronized with the same metadata."""
+        row = self.db.select_one(
+            "SELECT hash FROM record_hashes WHERE uuid = ?", (uuid,)
+        )
+        return row is not None and row[0] == digest
+
+    def set(self, uuid: str, digest: str):
+        """Records the hash of a synchronized research output."""
+        self.db.execute(
+            "INSERT OR REPLACE INTO record_hashes VALUES (?, ?, ?)",
+            (uuid, digest, time.time()),
+        )
+
+    def remove(self, uuid: str):
+        """Removes a research output deleted in Pure."""
+        self.db.execute("DELETE FROM record_hashes WHERE uuid = ?", (uuid,))
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Transfer of Pure records to RDM: fetch, enrich, convert, write and upload."""
+
+import threading
+
+from ...setup import pipeline_workers
+from ..pipeline import Pipeline, Stage
+from ..pure.requests_pure import get_pure_record_metadata_by_uuid
+from ..reports import ERROR, Reports
+from ..utils import initialize_counters, merge_counters
+from .add_record import RdmAddRecord
+
+# RdmAddRecord of each enrich thread, whose clients the records share
+_records = threading.local()
+
+
+class Transfer:
+    """A record moving through the pipeline.
+
+    Either the Pure item is given, or it is fetched by uuid. on_done is
+    called once the record is completed (it went through all the stages, or
+    the fetch stage applied it), on_failed when it was dropped or failed.
+    key is left to the run module (e.g. the page of the record).
+    """
+
+    def __init__(
+        self,
+        uuid: str = None,
+        item: dict = None,
+        on_done=None,
+        key=None,
+        on_failed=None,
+    ):
+        """Description."""
+        self.uuid = uuid or item["uuid"]
+        self.item = item
+        self.on_done = on_done
+        self.on_failed = on_failed
+        self.key = key
+        self.counters = initialize_counters()
+        self.record = None
+        self.completed = False
+
+
+class RecordPipeline:
+    """Pushes records to RDM, each stage on its own threads (pipeline_workers).
+
+    Slow stages (e.g. file uploads) only hold back the records behind
+    them once the bounded queue in front of them is full, so the metadata
+    of the other records keeps going.
+    fetch gets the input of the run module and returns a list of Transfer
+    (by default the input is a Transfer and its item is fetched by uuid).
+    """
+
+    def __init__(self, fetch=None, on_exit=None):
+        """Description."""
+        self.fetch = fetch or self.fetch_by_uuid
+        self.on_exit = on_exit
+        self.report = Reports()
+        self.global_counters = initialize_counters()
+        self._lock = threading.Lock()
+        self.pipeline = Pipeline(
+            [
+                Stage("fetch", self.fetch, pipeline_workers["fetch"], fan_out=True),
+                Stage("enrich", _enrich, pipeline_workers["enrich"]),
+                Stage("convert", _convert, pipeline_workers["convert"]),
+                Stage("write", _write, pipeline_workers["write"]),
+                Stage("upload", _upload, pipeline_workers["upload"]),
+            ],
+            on_exit=self._exit,
+        )
+
+    def put(self, item):
+        """Adds an input of the fetch stage, waits while the pipeline is full."""
+        self.pipeline.put(item)
+
+    def join(self):
+        """Waits for all the records and returns (and resets) their counters."""
+        self.pipeline.join()
+        with self._lock:
+            global_counters = self.global_counters
+            self.global_counters = initialize_counters()
+        return global_counters
+
+    def close(self):
+        """Stops the threads once the added records are processed."""
+        self.pipeline.close()
+
+    def run(self, items):
+        """Transfers all the items and returns the counters."""
+        self.pipeline.run(items)
+        return self.join()
+
+    @staticmethod
+    def fetch_by_uuid(transfer: Transfer):
+        """Gets from Pure the metadata of the record (default fetch stage)."""
+        if transfer.item is None:
+            transfer.item = get_pure_record_metadata_by_uuid(transfer.uuid)
+            if not transfer.item:
+                # Not in Pure, nothing to transfer
+                return []
+        return [transfer]
+
+    def _exit(self, transfer, error: str):
+        """Collects the counters of a record leaving the pipeline."""
+        # Input of the fetch stage that gave no record
+        if not isinstance(transfer, Transfer):
+            if error:
+                self.report.event("pipeline_failed", ERROR, error=error)
+            return
+
+        if error:
+            transfer.counters["metadata"]["error"] += 1
+            self.report.event("change_failed", ERROR, uuid=transfer.uuid, error=error)
+        with self._lock:
+            merge_counters(self.global_counters, transfer.counters)
+
+        if self.on_exit:
+            self.on_exit(transfer, error)
+        if transfer.completed and not error:
+            if transfer.on_done:
+                transfer.on_done()
+        elif transfer.on_failed:
+            transfer.on_failed()
+
+
+def _enrich(transfer: Transfer):
+    """Description."""
+    transfer.record = _get_record()
+    transfer.record.start(transfer.counters, transfer.item)
+    transfer.record.enrich()
+    return transfer
+
+
+def _get_record():
+    """Gets an RdmAddRecord, whose clients are built once per enrich thread."""
+    if not hasattr(_records, "record"):
+        _records.record = RdmAddRecord()
+    return _records.record.new_record()
+
+
+def _convert(transfer: Transfer):
+    """Description."""
+    return transfer if transfer.record.convert() else None
+
+
+def _write(transfer: Transfer):
+    """Description."""
+    return transfer if transfer.record.write() else None
+
+
+def _upload(transfer: Transfer):
+    """Description."""
+    # Failed file uploads are in the retry queue, the record is not completed
+    transfer.completed = transfer.record.upload()
+    return transfer
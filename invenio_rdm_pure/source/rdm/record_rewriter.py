@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Bulk modification of the RDM records matching a query."""
+
+import copy
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+from ...setup import rewrite_reindex_command, rewrite_workers
+from ..metrics import metrics
+from ..reports import Reports
+from .requests_rdm import Requests
+
+
+class RecordRewriter:
+    """Applies a transformation to all the RDM records matching a query.
+
+    1 - fetch:    gets all the result pages, before any record is modified.
+    2 - transform: applies the function, only the changed records are kept.
+    3 - write:    updates the records on rewrite_workers threads (the RDM
+                  rate limit is shared by all the threads).
+    4 - reindex:  reindexes the records once, at the end.
+    """
+
+    def __init__(self, report_files: list = None):
+        """Description."""
+        self.rdm_requests = Requests()
+        self.report = Reports()
+        self.report_files = report_files or ["console"]
+
+    def run(self, query_value: str, transform):
+        """Rewrites the records matching the query with transform(record).
+
+        The function modifies the record metadata in place.
+        Returns the counters of the run.
+        """
+        counters = {"total": 0, "changed": 0, "success": 0, "error": 0}
+        timings = {}
+
+        start = time.perf_counter()
+        with metrics.timer("rewrite.fetch"):
+            records = self._get_all_records(query_value)
+        timings["fetch"] = time.perf_counter() - start
+        counters["total"] = len(records)
+
+        start = time.perf_counter()
+        with metrics.timer("rewrite.transform"):
+            changed = self._transform_records(records, transform)
+        timings["transform"] = time.perf_counter() - start
+        counters["changed"] = len(changed)
+
+        start = time.perf_counter()
+        with metrics.timer("rewrite.write"):
+            records = [(record["recid"], record) for record in changed]
+            for response in self.write_records(records):
+                if response.status_code >= 300:
+                    counters["error"] += 1
+                else:
+                    counters["success"] += 1
+        timings["write"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if counters["success"]:
+            with metrics.timer("rewrite.reindex"):
+                self._reindex()
+        timings["reindex"] = time.perf_counter() - start
+
+        self._report_summary(query_value, counters, timings)
+        return counters
+
+    def _get_all_records(self, query_value: str):
+        """Gets the metadata of all the records matching the query, page by page."""
+        records = []
+        page = 1
+        while True:
+            response = self.rdm_requests.get_metadata_by_query(query_value, page)
+            if response.status_code >= 300:
+                break
+
+            resp_json = json.loads(response.content)
+            hits = resp_json["hits"]["hits"]
+            records += [hit["metadata"] for hit in hits]
+
+            if not hits or len(records) >= resp_json["hits"]["total"]:
+                break
+            page += 1
+        return records
+
+    @staticmethod
+    def _transform_records(records: list, transform):
+        """Applies the transformation, returns only the records that changed."""
+        changed = []
+        for record in records:
+            original = copy.deepcopy(record)
+            transform(record)
+            if record != original:
+                # When updating a record it is not possible to specify _communities field
+                record.pop("_communities", None)
+                changed.append(record)
+        return changed
+
+    def write_records(self, records: list):
+        """Updates the (recid, metadata) records concurrently, yields the responses."""
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def _initializer():
+            """Each thread needs its own application context."""
+            if app is not None:
+                app.app_context().push()
+
+        def _put_record(record: tuple):
+            """Description."""
+            recid, metadata = record
+            return self.rdm_requests.put_metadata(recid, metadata)
+
+        with ThreadPoolExecutor(rewrite_workers, initializer=_initializer) as executor:
+            yield from executor.map(_put_record, records)
+
+    def _reindex(self):
+        """Description."""
+        response = os.system(rewrite_reindex_command)
+        if response != 0:
+            self.report.add(
+                f"\tReindex records @@ Error: {response}", self.report_files
+            )
+
+    def _report_summary(self, query_value: str, counters: dict, timings: dict):
+        """Description."""
+        report = (
+            f"\tRewrite records @ Query: {query_value} @ Total: {counters['total']}"
+            f" @ Changed: {counters['changed']} @ Success: {counters['success']}"
+            f" @ Error: {counters['error']}"
+        )
+        self.report.add(report, self.report_files)
+
+        phases = " @ ".join(
+            f"{phase}: {seconds:.2f} s" for phase, seconds in timings.items()
+        )
+        self.report.add(f"\tRewrite timings @ {phases}", self.report_files)
@@ -8,6 +8,7 @@
 """File description."""
 
 import json
+import threading
 import time
 from os import makedirs, path, remove
 
@@ -16,8 +17,39 @@ from flask import current_app
 from requests import Response
 
 from ...setup import push_dist_sec, temporary_files_name, versioning_running, wait_429
-from ..reports import Reports
-from ..utils import add_spaces
+from ..metrics import metrics
+from ..reports import ERROR, INFO, Reports
+
+
+class RateLimiter:
+    """Keeps a minimum time gap between RDM requests of all threads."""
+
+    def __init__(self, interval: float):
+        """Description."""
+        self.interval = interval
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Waits until the next request is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    def pause(self, seconds: float):
+        """Holds back all the requests for the given time (e.g. after a 429)."""
+        with self._lock:
+            self._next_time = max(self._next_time, time.monotonic() + seconds)
+
+
+# Shared by all the threads of the process
+rdm_rate_limiter = RateLimiter(push_dist_sec)
+
+# Keeps the connections to RDM open between requests
+rdm_session = requests.Session()
 
 
 class Requests:
@@ -61,7 +93,10 @@ class Requests:
             url = url[:-1]
 
         # Sending request
-        response = requests.get(url, headers=headers, params=params, verify=False)
+        with metrics.timer("rdm.get_metadata"):
+            response = rdm_session.get(
+                url, headers=headers, params=params, verify=False
+            )
 
         # Write response to file
         get_response_file = temporary_files_name["get_rdm_metadata"]
@@ -84,13 +119,14 @@ class Requests:
 
         rdm_records_url = current_app.config.get("INVENIO_PURE_RECORDS_URL")
 
-        response = requests.post(
-            rdm_records_url,
-            headers=headers,
-            params=params,
-            data=data_utf8,
-            verify=False,
-        )
+        with metrics.timer("rdm.post_metadata"):
+            response = rdm_session.post(
+                rdm_records_url,
+                headers=headers,
+                params=params,
+                data=data_utf8,
+                verify=False,
+            )
 
         open(temporary_files_name["post_rdm_response"], "wb").write(response.content)
 
@@ -108,9 +144,10 @@ class Requests:
         rdm_record_url = str(current_app.config.get("INVENIO_PURE_RECORD_URL"))
         url = rdm_record_url.format(recid)
 
-        response = requests.put(
-            url, headers=headers, params=params, data=data, verify=False
-        )
+        with metrics.timer("rdm.put_metadata"):
+            response = rdm_session.put(
+                url, headers=headers, params=params, data=data, verify=False
+            )
 
         cls._check_response(response)
         return response
@@ -128,7 +165,8 @@ class Requests:
 
         url += "/files/{file_name}"
 
-        return requests.put(url, headers=headers, data=data, verify=False)
+        with metrics.timer("rdm.put_file"):
+            return rdm_session.put(url, headers=headers, data=data, verify=False)
 
     def delete_metadata(self, recid: str):
         """Description."""
@@ -136,7 +174,8 @@ class Requests:
         rdm_record_url = current_app.config.get("INVENIO_PURE_RECORD_URL")
         url = rdm_record_url.format(recid)
 
-        response = requests.delete(url, headers=headers, verify=False)
+        with metrics.timer("rdm.delete_metadata"):
+            response = rdm_session.delete(url, headers=headers, verify=False)
 
         self._check_response(response)
         return response
@@ -153,17 +192,34 @@ class Requests:
         if response.status_code == 429:
             report = f"{response.content}\nToo many RDM requests.. wait {wait_429 / 60} minutes\n"
             cls.report.add(report)
-            time.sleep(wait_429)
+            rdm_rate_limiter.pause(wait_429)
+            with metrics.timer("rdm.wait_429"):
+                rdm_rate_limiter.wait()
             return False
 
         # RDM accepts 5000 records per hour (one record every ~ 1.4 sec.)
-        time.sleep(push_dist_sec)
+        with metrics.timer("rdm.push_dist_sleep"):
+            rdm_rate_limiter.wait()
 
         return True
 
-    def get_metadata_by_query(self, query_value: str):
+    def get_metadata_by_query(self, query_value: str, page: int = 1):
         """Query RDM record metadata."""
-        params = {"sort": "mostrecent", "size": 250, "page": 1, "q": f'"{query_value}"'}
+        params = {
+            "sort": "mostrecent",
+            "size": 250,
+            "page": page,
+            "q": f'"{query_value}"',
+        }
+        response = self.get_metadata(params)
+
+        self._check_response(response)
+        return response
+
+    def get_metadata_by_uuids(self, uuids: list, page: int = 1):
+        """Query in a single request (a page of) the RDM records of many Pure uuids."""
+        query = " OR ".join(f'"{uuid}"' for uuid in uuids)
+        params = {"sort": "mostrecent", "size": 250, "page": page, "q": f"({query})"}
         response = self.get_metadata(params)
 
         self._check_response(response)
@@ -191,7 +247,7 @@ class Requests:
         2 - delete duplicates
         3 - add the record uuid and recid to all_rdm_records.txt.
         """
-        response = self.rdm_requests.get_metadata_by_query(uuid)
+        response = self.get_metadata_by_query(uuid)
 
         resp_json = json.loads(response.content)
 
@@ -216,22 +272,36 @@ class Requests:
                 landing_page_url = f"{rdm_host_url}records/{recid}"
                 newest_recid = recid
 
-                report = f"\tRDM get recid @ {response} @ Total: {add_spaces(total_recids)} @ {api_url}"
-                self.reports.add(report)
+                self.report.event(
+                    "rdm_get_recid",
+                    status=response.status_code,
+                    total=total_recids,
+                    api_url=api_url,
+                )
 
             else:
                 # If versioning is running then it is not necessary to delete older versions of the record
                 if not versioning_running:
-                    # Duplicate records are deleted
-                    response = self.delete.record(recid)
+                    # Duplicate records are deleted (410: already deleted)
+                    response = self._get_delete().record(recid)
 
-                    if response:
+                    if response.status_code < 300 or response.status_code == 410:
                         global_counters["delete"]["success"] += 1
                     else:
                         global_counters["delete"]["error"] += 1
 
         return newest_recid
 
+    def _get_delete(self):
+        """Gets the Delete of this instance, created the first time."""
+        # Imported here, delete_record imports this module
+        from .delete_record import Delete
+
+        if getattr(self, "_delete", None) is None:
+            self._delete = Delete()
+        return self._delete
+
+    @staticmethod
     def rdm_add_file(file_name: str, recid: str):
         """Description."""
         rdm_requests = Requests()
@@ -243,7 +313,12 @@ class Requests:
         response = rdm_requests.put_file(file_path_name, recid)
 
         # Report
-        reports.add(f"\tRDM put file @ {response} @ {file_name}")
+        reports.event(
+            "rdm_put_file",
+            ERROR if response.status_code >= 300 else INFO,
+            status=response.status_code,
+            file_name=file_name,
+        )
 
         if response.status_code >= 300:
             reports.add(response.content)
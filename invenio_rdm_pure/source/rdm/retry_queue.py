@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Queue of the records whose transfer to RDM failed."""
+
+import os
+import time
+
+from ...setup import data_files_name, retry_backoff_max_sec, retry_backoff_sec
+from ..state_db import StateDatabase
+from ..utils import check_if_file_exists
+
+schema = """
+CREATE TABLE IF NOT EXISTS retry_queue (
+    uuid            TEXT PRIMARY KEY,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt    REAL NOT NULL,
+    last_error      TEXT,
+    created         REAL NOT NULL,
+    updated         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS retry_queue_next_attempt ON retry_queue (next_attempt);
+"""
+
+
+class RetryQueue:
+    """Durable queue of record uuids to be transmitted again to RDM.
+
+    Each uuid is listed once. After every failed attempt the next one is
+    delayed exponentially (retry_backoff_sec, doubled up to retry_backoff_max_sec).
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+
+    @staticmethod
+    def backoff(attempts: int):
+        """Seconds to wait before the next attempt."""
+        if attempts <= 0:
+            return 0
+        return min(retry_backoff_sec * 2 ** (attempts - 1), retry_backoff_max_sec)
+
+    def push(self, uuid: str, error: str = ""):
+        """Adds a failed uuid to the queue, or counts a new failed attempt."""
+        now = time.time()
+        with self.db.transaction() as connection:
+            row = connection.execute(
+                "SELECT attempts FROM retry_queue WHERE uuid = ?", (uuid,)
+            ).fetchone()
+            if row is None:
+                connection.execute(
+                    "INSERT INTO retry_queue VALUES (?, 1, ?, ?, ?, ?)",
+                    (uuid, now + self.backoff(1), error, now, now),
+                )
+                return
+            attempts = row[0] + 1
+            connection.execute(
+                """UPDATE retry_queue
+                SET attempts = ?, next_attempt = ?, last_error = ?, updated = ?
+                WHERE uuid = ?""",
+                (attempts, now + self.backoff(attempts), error, now, uuid),
+            )
+
+    def add(self, uuids: list):
+        """Adds uuids to be transmitted as soon as possible (if not listed yet)."""
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR IGNORE INTO retry_queue VALUES (?, 0, ?, '', ?, ?)",
+            [(uuid, now, now, now) for uuid in uuids],
+        )
+
+    def remove(self, uuid: str):
+        """Removes a successfully transmitted uuid from the queue."""
+        self.db.execute("DELETE FROM retry_queue WHERE uuid = ?", (uuid,))
+
+    def dequeue(self, limit: int):
+        """Gets up to limit uuids whose next attempt is due.
+
+        The uuids are leased until their next backoff, so that they are not
+        returned again while being processed.
+        """
+        now = time.time()
+        with self.db.transaction() as connection:
+            rows = connection.execute(
+                """SELECT uuid, attempts FROM retry_queue
+                WHERE next_attempt <= ? ORDER BY next_attempt LIMIT ?""",
+                (now, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE retry_queue SET next_attempt = ? WHERE uuid = ?",
+                [(now + self.backoff(max(row[1], 1)), row[0]) for row in rows],
+            )
+        return [row[0] for row in rows]
+
+    def count(self):
+        """Number of uuids in the queue, and of those that are due."""
+        row = self.db.select_one(
+            "SELECT COUNT(*), SUM(next_attempt <= ?) FROM retry_queue", (time.time(),)
+        )
+        return row[0], row[1] or 0
+
+    def import_transfer_list(self, file_name: str = None):
+        """Moves the uuids listed in to_transmit.txt into the queue.
+
+        The file is renamed before being read, so that the uuids appended
+        meanwhile go to a new file (imported by the next run). A renamed
+        file left by an interrupted run is imported first.
+        Returns the number of lines read.
+        """
+        file_name = file_name or data_files_name["transfer_uuid_list"]
+        importing_file = f"{file_name}.importing"
+        if not os.path.isfile(importing_file):
+            check_if_file_exists(file_name)
+            os.replace(file_name, importing_file)
+
+        with open(importing_file) as fp:
+            uuids = [line.strip() for line in fp if line.strip()]
+        if uuids:
+            self.add(uuids)
+        os.remove(importing_file)
+        return len(uuids)
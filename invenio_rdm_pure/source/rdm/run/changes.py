@@ -8,15 +8,15 @@
 """File description."""
 
 import json
-from datetime import datetime, timedelta
+from functools import partial
 
-from ....setup import data_files_name
+from ...pure.person_index import PersonIndex
 from ...pure.requests_pure import get_next_page, get_pure_metadata
 from ...reports import Reports
-from ...utils import add_spaces, check_if_file_exists, initialize_counters
-from ..add_record import RdmAddRecord
-from ..delete_record import Delete
-from ..requests_rdm import Requests
+from ...utils import add_spaces, initialize_counters, merge_counters
+from ..change_plan import ChangePlan
+from ..change_processor import ChangeProcessor
+from ..changes_ledger import ChangesLedger
 
 
 class PureChanges:
@@ -24,85 +24,152 @@ class PureChanges:
 
     def __init__(self):
         """Description."""
-        self.add_record = RdmAddRecord()
         self.report = Reports()
-        self.delete = Delete()
-        self.rdm_requests = Requests()
+        self.ledger = ChangesLedger()
+        self.plan = ChangePlan()
+        self.person_index = PersonIndex()
+        self.report_files = ["console", "changes"]
+        self.global_counters = initialize_counters()
+        self._initialize_local_counters()
 
     def get_pure_changes(self):
         """Gets from Pure 'changes' endpoint all records that have been created / updated / deleted.
 
         and modifies accordingly the relative RDM records.
+        First all the pending dates are reduced to the final change of each
+        uuid, then only that plan is applied.
         """
-        # Get date of last update
-        missing_updates = self._get_missing_updates()
+        self.ledger.import_successful_changes()
 
-        if missing_updates == []:
+        # Get dates whose changes were not fully processed
+        missing_updates = self.ledger.missing_dates()
+
+        if missing_updates == [] and self.plan.count() == 0:
             self.report.add("\nNothing to update.\n")
             return
 
-        for date_to_update in reversed(missing_updates):
-            self._changes_by_date(date_to_update)
-        return
-
-    def _set_counters_and_title(func):
-        """Description."""
-
-        def _wrapper(self, changes_date: str):
-            """Description."""
-            # Initialize global counters
-            self.global_counters = initialize_counters()
+        self.report_files = ["console", "changes"]
+        self.report.add_template(self.report_files, ["general", "title"], ["CHANGES"])
 
-            self.report_files = ["console", "changes"]
+        self.global_counters = initialize_counters()
+        self._initialize_local_counters()
 
-            self.report.add_template(
-                self.report_files, ["general", "title"], ["CHANGES"]
-            )
-            self.report.add(f"\nProcessed date: {changes_date}", self.report_files)
+        for date_to_update in reversed(missing_updates):
+            if not self._plan_date(date_to_update):
+                # The next dates can not overtake a date not fully planned
+                break
+
+        processor = ChangeProcessor()
+        try:
+            self._apply_plan(processor)
+        finally:
+            processor.close()
+        self._report_summary()
+        return
 
-            # Decorated function
-            func(self, changes_date)
+    def _plan_date(self, changes_date: str):
+        """Adds to the plan all changes that took place in a certain date.
 
-            self._report_summary()
+        Resumes from the page where the previous run stopped.
+        """
+        self.report.add(f"\nProcessed date: {changes_date}", self.report_files)
 
-        return _wrapper
+        page = self.ledger.get_checkpoint(changes_date)[1]
+        if page > 1:
+            self.report.add(f"Resume @ Page: {page}", self.report_files)
 
-    @_set_counters_and_title
-    def _changes_by_date(self, changes_date: str):
-        """Gets from Pure all changes that took place in a certain date."""
-        reference = changes_date
-        page = 1
+        more_pages = True
+        while more_pages:
+            more_pages = self.plan_page(changes_date)
+            if more_pages is None:
+                return False
+        return True
 
-        while reference:
-            # Get from pure all changes of a certain date
-            response = get_pure_metadata("changes", reference, {})
+    def plan_page(self, changes_date: str):
+        """Adds to the plan the changes of the next page of a date.
 
-            if response.status_code >= 300:
-                self.report.add(response.content, self.report_files)
-                return False
+        Returns True if the date has more pages, False once all its changes
+        are planned, None if the Pure request failed.
+        """
+        reference, page = self.ledger.get_checkpoint(changes_date)
+        if not reference:
+            return None
 
-            # Check if there are records in the response from pure
-            json_response = self._records_to_process(response, page, changes_date)
+        # Get from pure all changes of a certain date
+        response = get_pure_metadata("changes", reference, {})
 
-            # If there are no records to process
-            if not json_response:
-                return True
+        if response.status_code >= 300:
+            self.report.add(response.content, self.report_files)
+            return None
 
-            # Used to check if there are doubled tasks (e.g. update uuid and delete same uuid)
-            self.duplicated_uuid = []
+        # Check if there are records in the response from pure
+        json_response = self._records_to_process(response, page, changes_date)
 
-            self._initialize_local_counters()
+        # If there are no records to process
+        if not json_response:
+            return False
 
-            # Iterates over all records that need to be deleted
-            self._delete_records(json_response)
+        changes = self._reduce_page(json_response["items"])
 
-            # Create / Add / Update
-            self._update_records(json_response)
+        # Gets the reference code of the next page
+        next_page = get_next_page(json_response)
 
-            # Gets the reference code of the next page
-            reference = get_next_page(json_response).split("/")[-1]
+        # The page changes and its checkpoint are stored together
+        with self.plan.db.transaction():
+            self.plan.add(changes_date, changes)
+            if not next_page:
+                self.ledger.complete(changes_date)
+                return False
+            reference = next_page.split("/")[-1]
+            self.ledger.set_page(changes_date, reference, page + 1)
+        return True
 
-            page += 1
+    def _reduce_page(self, items: list):
+        """Reduces the changes of a page to the last change type of each uuid."""
+        relevant = []
+        persons = []
+        for item in items:
+            if "changeType" not in item or "uuid" not in item:
+                self.local_counters["incomplete"] += 1
+            elif item["familySystemName"] == "ResearchOutput":
+                relevant.append(item)
+            else:
+                self.local_counters["not_ResearchOutput"] += 1
+                if item["familySystemName"] == "Person":
+                    persons.append(item)
+
+        # Keeps the persons index up to date (no Pure request while planning)
+        person_changes = {}
+        ChangePlan.reduce(persons, person_changes)
+        self.person_index.invalidate(list(person_changes))
+
+        changes = {}
+        self.local_counters["duplicated"] += ChangePlan.reduce(relevant, changes)
+        return changes
+
+    def _apply_plan(self, processor: ChangeProcessor):
+        """Deletes, creates or updates the RDM records of the planned changes."""
+        planned_changes = self.plan.get_all()
+        self.report.add(
+            f"\nChanges to apply: {len(planned_changes)} @ Given up: {self.plan.count_given_up()}",
+            self.report_files,
+        )
+
+        try:
+            for uuid, change_type in planned_changes:
+                # Kept if a newer change of the uuid was planned meanwhile
+                on_done = partial(self.plan.remove, uuid, change_type)
+                # Retried after a backoff
+                on_failed = partial(self.plan.fail, uuid, change_type)
+                if change_type == "DELETE":
+                    self._delete_record(processor, uuid, on_done, on_failed)
+                else:
+                    self._update_record(
+                        processor, uuid, change_type, on_done, on_failed
+                    )
+        finally:
+            # Waits for the queued changes and collects their counters
+            merge_counters(self.global_counters, processor.join())
 
     def _records_to_process(self, response: object, page: int, changes_date: str):
         """Check if there are records in the response from pure."""
@@ -112,8 +179,8 @@ class PureChanges:
         number_records = json_response["count"]
 
         if number_records == 0:
-            # Adds the date to successful_changes.txt
-            open(data_files_name["successful_changes"], "a").write(f"{changes_date}\n")
+            # All the changes of the date have been planned
+            self.ledger.complete(changes_date)
 
             if page == 1:
                 # If there are no changes at all
@@ -125,90 +192,41 @@ class PureChanges:
 
         return json_response
 
-    def _delete_records(self, json_response: dict):
-        """Iterates over the Pure response and process all records that need to be deleted."""
-        for item in json_response["items"]:
-
-            if "changeType" not in item or "uuid" not in item:
-                continue
-            elif item["familySystemName"] != "ResearchOutput":
-                continue
-            elif item["changeType"] != "DELETE":
-                continue
-
-            uuid = item["uuid"]
-            self.duplicated_uuid.append(uuid)
-            self.local_counters["delete"] += 1
-
-            report = f"\n{self.local_counters['delete']} @ {item['changeType']}"
-            self.report.add(report)
-
-            # Gets the record recid
-            recid = self.rdm_requests.get_recid(uuid, self.global_counters)
-
-            if recid:
-                # Deletes the record from RDM
-                self.delete.record(recid)
-            else:
-                # The record is not in RDM
-                self.global_counters["delete"]["success"] += 1
-        return True
-
-    def _update_records(self, json_response: dict):
-        """Iterates over the Pure response and process all records that need to be created/updated."""
-        for item in json_response["items"]:
-
-            if "changeType" not in item or "uuid" not in item:
-                self.local_counters["incomplete"] += 1
-                continue
-            elif item["familySystemName"] != "ResearchOutput":
-                self.local_counters["not_ResearchOutput"] += 1
-                continue
-            elif item["changeType"] == "DELETE":
-                continue
-
-            uuid = item["uuid"]
-            if uuid in self.duplicated_uuid:
-                self.local_counters["duplicated"] += 1
-                continue
-
-            record_number = add_spaces(self.global_counters["total"] + 1)
-            report = f"\n{record_number} - Change type           - {item['changeType']}"
-            self.report.add(report)
-
-            if item["changeType"] == "ADD" or item["changeType"] == "CREATE":
-                self.local_counters["create"] += 1
-
-            if item["changeType"] == "UPDATE":
-                self.local_counters["update"] += 1
-
-            # Checks if this uuid has already been created / updated / deleted
-            self.duplicated_uuid.append(uuid)
-
-            # Adds record to RDM
-            self.add_record.push_record_by_uuid(self.global_counters, uuid)
-
-    def _get_missing_updates(self):
-        """Reading successful_changes.txt gets the dates in which Pure changes have not been processed."""
-        file_name = data_files_name["successful_changes"]
-        check_if_file_exists(file_name)
-
-        missing_updates = []
-        count = 0
-        days_span = 7
-
-        date_today = str(datetime.today().strftime("%Y-%m-%d"))
-        date_check = datetime.strptime(date_today, "%Y-%m-%d").date()
-
-        while count < days_span:
-
-            if str(date_check) not in open(file_name, "r").read():
-                missing_updates.append(str(date_check))
-
-            date_check = date_check - timedelta(days=1)
-            count += 1
-
-        return missing_updates
+    def _delete_record(
+        self, processor: ChangeProcessor, uuid: str, on_done, on_failed=None
+    ):
+        """Queues the deletion from RDM of the record of a Pure deletion."""
+        self.local_counters["delete"] += 1
+
+        report = f"\n{self.local_counters['delete']} @ DELETE"
+        self.report.add(report)
+
+        processor.delete(uuid, on_done, on_failed)
+
+    def _update_record(
+        self,
+        processor: ChangeProcessor,
+        uuid: str,
+        change_type: str,
+        on_done,
+        on_failed=None,
+    ):
+        """Queues the creation / update of the RDM record of a Pure change."""
+        record_number = self.local_counters["create"] + self.local_counters["update"]
+        self.report.event(
+            "change_type",
+            record_number=record_number + 1,
+            change_type=change_type,
+        )
+
+        if change_type == "ADD" or change_type == "CREATE":
+            self.local_counters["create"] += 1
+
+        if change_type == "UPDATE":
+            self.local_counters["update"] += 1
+
+        # Adds record to RDM
+        processor.update(uuid, on_done, on_failed)
 
     def _report_summary(self):
         """Description."""
@@ -224,7 +242,8 @@ class PureChanges:
     def _initialize_local_counters(self):
         """Description."""
         # Incomplete:  when the uuid or changeType are not specified
-        # Duplicated:  e.g. when a record has been modified twice in a day
+        # Duplicated:  when a record has been changed more than once (e.g. in
+        #              different days), only its last change is applied
         # Irrelevant:  when familySystemName is not ResearchOutput
 
         self.local_counters = {
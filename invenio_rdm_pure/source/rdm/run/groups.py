@@ -9,11 +9,15 @@
 
 import json
 import os
+import time
 
+from ...metrics import metrics
 from ...pure.requests_pure import get_pure_metadata
 from ...reports import Reports
 from ...utils import add_spaces
 from ..database import RdmDatabase
+from ..known_groups import known_groups
+from ..record_rewriter import RecordRewriter
 from ..requests_rdm import Requests
 
 
@@ -26,6 +30,7 @@ class RdmGroups:
         self.report = Reports()
         self.rdm_requests = Requests()
         self.report_files = ["console", "groups"]
+        self.record_rewriter = RecordRewriter(self.report_files)
 
     def _general_report_and_variables(func):
         """Description."""
@@ -45,6 +50,9 @@ class RdmGroups:
             # Decorated function
             func(self, old_group_externalId, new_groups_externalIds)
 
+            # Groups and memberships changed
+            self._invalidate_caches()
+
         return _wrapper
 
     @_general_report_and_variables
@@ -102,6 +110,9 @@ class RdmGroups:
             # Decorated function
             func(self, old_groups_externalId, new_group_externalId)
 
+            # Groups and memberships changed
+            self._invalidate_caches()
+
         return _wrapper
 
     @_general_report_and_variables
@@ -138,17 +149,19 @@ class RdmGroups:
             old_groups_externalId, self.new_groups_data[0], new_group_externalId
         )
 
+    def _invalidate_caches(self):
+        """Description."""
+        known_groups.invalidate()
+        self.rdm_db.clear_caches()
+
     def _get_rdm_group_id(self, externalId: str):
         """Description."""
-        response = self.rdm_db.select_query(
-            "id, description", "accounts_role", {"name": f"'{externalId}'"}
-        )
+        response = self.rdm_db.get_role(externalId)
 
         if not response:
             return False
 
-        group_id = response[0][0]
-        group_name = response[0][1]
+        group_id, group_name = response
 
         report = f"\tOld group info @ ExtId: {add_spaces(externalId)} @ RDM id: {add_spaces(group_id)} @ {group_name}"
         self.report.add(report, self.report_files)
@@ -157,92 +170,64 @@ class RdmGroups:
     def _rdm_split_modify_record(
         self, old_group_externalId: str, new_groups_externalIds: list
     ):
-        """Description."""
-        # Get from RDM all old group's records
-        response = self.rdm_requests.get_metadata_by_query(old_group_externalId)
-
-        resp_json = json.loads(response.content)
-        total_items = resp_json["hits"]["total"]
-
-        report = f"\tModify old g. records @ ExtId: {add_spaces(old_group_externalId)} @ Num. of records: {total_items}"
-        self.report.add(report, self.report_files)
-
-        if total_items == 0:
-            self.report.add("\tNothing to modify @ End", self.report_files)
-            return True
-
-        # Iterates over all old group records
-        for item in resp_json["hits"]["hits"]:
-            item = item["metadata"]
-
-            # Change group restrictions
-            if old_group_externalId in item["group_restrictions"]:
-                item["group_restrictions"].remove(old_group_externalId)
-            for i in new_groups_externalIds:
-                item["group_restrictions"].append(i)
+        """Replaces the old group with the new ones in all the old group's records."""
+
+        def _transform(item: dict):
+            """Description."""
+            # Change group restrictions (the query matches any record mentioning the old group)
+            group_restrictions = item.get("group_restrictions") or []
+            if old_group_externalId in group_restrictions:
+                group_restrictions.remove(old_group_externalId)
+                for i in new_groups_externalIds:
+                    if i not in group_restrictions:
+                        group_restrictions.append(i)
 
             # Change managingOrganisationalUnit
-            item = self._process_managing_organisational_unit(
-                item, old_group_externalId
-            )
-
-            # When updating a record it is not possible to specify _communities field
-            del item["_communities"]
+            self._process_managing_organisational_unit(item, old_group_externalId)
 
-            # Update record
-            recid = item["recid"]
+        report = f"\tModify old g. records @ ExtId: {add_spaces(old_group_externalId)}"
+        self.report.add(report, self.report_files)
 
+        self.record_rewriter.run(old_group_externalId, _transform)
         return True
 
     def _process_managing_organisational_unit(
         self, item: object, old_group_externalId: str
     ):
         """Description."""
-        managing_org_unit_externalid_value = item["extensions"][
+        managing_org_unit_externalid_value = item.get("extensions", {}).get(
             "tug:managingOrganisationalUnit_externalId"
-        ]
+        )
         if managing_org_unit_externalid_value == old_group_externalId:
-            item["extensions"][
-                "tug:managingOrganisationalUnit_name"
-            ] = self.new_groups_data[0]["name"]
-            item["extensions"][
-                "tug:managingOrganisationalUnit_uuid"
-            ] = self.new_groups_data[0]["uuid"]
-            item["extensions"][
-                "tug:managingOrganisationalUnit_externalId"
-            ] = self.new_groups_data[0]["externalId"]
+            item["extensions"]["tug:managingOrganisationalUnit_name"] = (
+                self.new_groups_data[0]["name"]
+            )
+            item["extensions"]["tug:managingOrganisationalUnit_uuid"] = (
+                self.new_groups_data[0]["uuid"]
+            )
+            item["extensions"]["tug:managingOrganisationalUnit_externalId"] = (
+                self.new_groups_data[0]["externalId"]
+            )
         return item
 
     def _rdm_split_users_from_old_to_new_group(
         self, old_group_id: str, old_group_externalId: str, new_groups_externalIds: list
     ):
-        """Description."""
-        # Get all users in old group
-        response = self.rdm_db.select_query(
-            "user_id", "accounts_userrole", {"role_id": old_group_id}
-        )
-
-        report = "Old group @@ Num. of users:  "
-        if not response:
-            self.report.add(f"\t{report} 0", self.report_files)
-            return
-
-        self.report.add(f"\t{report} {len(response)}", self.report_files)
-
-        for i in response:
-            user_id = i[0]
-
-            # Get user email
-            user_email = self.rdm_db.select_query(
-                "email", "accounts_user", {"id": user_id}
-            )[0][0]
+        """Adds the users of the old group to the new groups and removes them from the old one."""
+        new_group_ids = self.rdm_db.get_role_ids(new_groups_externalIds)
+        missing = set(new_groups_externalIds) - set(new_group_ids)
+        if missing:
+            report = f"\nWarning @ New groups ({missing}) not in database @ END TASK\n"
+            self.report.add(report, self.report_files)
+            return False
 
-            for new_group_externalId in new_groups_externalIds:
-                # Add user to new groups
-                self._group_add_user(user_email, new_group_externalId, user_id)
+        users = self.rdm_db.count_role_users([old_group_id]).get(old_group_id, 0)
+        self.report.add(f"\tOld group @@ Num. of users:   {users}", self.report_files)
+        if not users:
+            return True
 
-            # Remove user from old group
-            response = self._group_remove_user(user_email, old_group_externalId)
+        self._move_group_users([old_group_id], list(new_group_ids.values()))
+        return True
 
     def _rdm_merge_modify_records(
         self,
@@ -250,31 +235,16 @@ class RdmGroups:
         new_group_data: dict,
         new_group_externalId: str,
     ):
-        """Description."""
+        """Replaces the old groups with the new one in all the old groups' records."""
         # Get from RDM all records with old groups
         for old_group_externalId in old_groups_externalId:
 
             self._rdm_check_if_group_exists(old_group_externalId)
 
-            # Get record metadata
-            response = self.rdm_requests.get_metadata_by_query(old_group_externalId)
-
-            resp_json = json.loads(response.content)
-            total_items = resp_json["hits"]["total"]
-
-            report = f"\tModify records @ Group: {add_spaces(old_group_externalId)} @ Num. of records: {total_items}"
-            self.report.add(report, self.report_files)
-
-            if total_items == 0:
-                continue
-
-            # Iterates over all old group records
-            for item in resp_json["hits"]["hits"]:
-
-                item = item["metadata"]
-
+            def _transform(item: dict):
+                """Description."""
                 # Organisational units
-                item = self._process_organisational_units(
+                self._process_organisational_units(
                     item, new_group_data, old_groups_externalId
                 )
 
@@ -284,21 +254,12 @@ class RdmGroups:
                 )
 
                 # Managing Organisational Unit
-                if (
-                    "managingOrganisationalUnit_externalId" in item
-                    and item["managingOrganisationalUnit_externalId"]
-                    == old_group_externalId
-                ):
-                    item["managingOrganisationalUnit_name"] = new_group_data["name"]
-                    item["managingOrganisationalUnit_uuid"] = new_group_data["uuid"]
-                    item["managingOrganisationalUnit_externalId"] = new_group_data[
-                        "externalId"
-                    ]
-
-                # When updating a record it is not possible to specify _communities field
-                del item["_communities"]
-
-                # Update record
+                self._process_managing_organisational_unit(item, old_group_externalId)
+
+            report = f"\tModify records @ Group: {add_spaces(old_group_externalId)}"
+            self.report.add(report, self.report_files)
+
+            self.record_rewriter.run(old_group_externalId, _transform)
 
     def _process_organisational_units(
         self, item, new_group_data, old_groups_externalId
@@ -306,7 +267,13 @@ class RdmGroups:
         """Description."""
         new_organisationalUnits_data = [new_group_data]
 
-        if "organisationalUnits" not in item:
+        # Only the records of the old groups get the new one
+        old_units = [
+            i
+            for i in item.get("organisationalUnits", [])
+            if i["externalId"] in old_groups_externalId
+        ]
+        if not old_units:
             return item
 
         for i in item["organisationalUnits"]:
@@ -325,12 +292,11 @@ class RdmGroups:
         self, item, old_group_externalId, new_group_externalId
     ):
         """Description."""
-        if "group_restrictions" not in item:
+        if old_group_externalId not in item.get("group_restrictions", []):
             return item
 
         # Remove old group
-        if old_group_externalId in item["group_restrictions"]:
-            item["group_restrictions"].remove(old_group_externalId)
+        item["group_restrictions"].remove(old_group_externalId)
         # Add new group
         if new_group_externalId not in item["group_restrictions"]:
             item["group_restrictions"].append(new_group_externalId)
@@ -339,52 +305,36 @@ class RdmGroups:
     def _merge_users_from_old_to_new_group(
         self, old_groups_externalId: list, new_group_externalId: str
     ):
-        """Description."""
-        # Iterate over old groups
-        for old_group_externalId in old_groups_externalId:
-
-            # Get group id
-            response = self.rdm_db.select_query(
-                "id, description",
-                "accounts_role",
-                {"name": f"'{old_group_externalId}'"},
-            )
-
-            if not response:
-                self.report.add(
-                    "\nWarning @ Old group ({old_groups_externalId}) not in database @ END TASK\n"
-                )
-                return False
-
-            old_group_id = response[0][0]
-            old_group_name = response[0][1]
-
-            # Get all users id that are in this group
-            old_group_users = self.rdm_db.select_query(
-                "user_id", "accounts_userrole", {"role_id": old_group_id}
-            )
-
-            if not old_group_users:
-                old_group_users = []
-
-            report = f"\tOld group @ ExtId:     {add_spaces(old_group_externalId)} @ Num. users:  {add_spaces(len(old_group_users))} @ {old_group_name}"
+        """Adds the users of the old groups to the new group and removes them from the old ones."""
+        # Group ids are resolved once
+        group_ids = self.rdm_db.get_role_ids(
+            old_groups_externalId + [new_group_externalId]
+        )
+        missing = set(old_groups_externalId + [new_group_externalId]) - set(group_ids)
+        if missing:
+            report = f"\nWarning @ Groups ({missing}) not in database @ END TASK\n"
             self.report.add(report, self.report_files)
+            return False
 
-            for i in old_group_users:
-                user_id = i[0]
-
-                # Get user email
-                user_email = self.rdm_db.select_query(
-                    "email", "accounts_user", {"id": user_id}
-                )[0][0]
+        old_group_ids = [group_ids[externalId] for externalId in old_groups_externalId]
+        users = self.rdm_db.count_role_users(old_group_ids)
+        for old_group_externalId in old_groups_externalId:
+            old_group_users = users.get(group_ids[old_group_externalId], 0)
+            report = f"\tOld group @ ExtId:     {add_spaces(old_group_externalId)} @ Num. users:  {add_spaces(old_group_users)}"
+            self.report.add(report, self.report_files)
 
-                # - - Add user to new group - -
-                self._group_add_user(user_email, new_group_externalId, user_id)
+        self._move_group_users(old_group_ids, [group_ids[new_group_externalId]])
+        return True
 
-                # - - Remove user from old group - -
-                response = self._group_remove_user(user_email, old_group_externalId)
+    def _move_group_users(self, old_group_ids: list, new_group_ids: list):
+        """Moves the memberships with two set-based queries in a single transaction."""
+        start = time.perf_counter()
+        with metrics.timer("groups.move_users"):
+            added, removed = self.rdm_db.move_role_users(old_group_ids, new_group_ids)
+        elapsed = (time.perf_counter() - start) * 1000
 
-            # Delete old group
+        report = f"\tMove group users @ Added: {add_spaces(added)} @ Removed: {add_spaces(removed)} @ Time: {elapsed:.1f} ms"
+        self.report.add(report, self.report_files)
 
     def _get_pure_group_metadata(self, externalId: str):
         """Get organisationalUnit name and uuid."""
@@ -427,9 +377,7 @@ class RdmGroups:
 
     def _rdm_check_if_group_exists(self, group_externalId: str):
         """Checks if the group already exists."""
-        response = self.rdm_db.select_query(
-            "*", "accounts_role", {"name": f"'{group_externalId}'"}
-        )
+        response = self.rdm_db.get_role(group_externalId)
 
         if response:
             report = f"\tNew group check @@ ExtId:        {add_spaces(group_externalId)} @ Already exists"
@@ -459,6 +407,7 @@ class RdmGroups:
             return False
 
         self.report.add(f"{report} Group created @ External id: {externalId}")
+        known_groups.add(externalId)
         return True
 
     def _rdm_add_user_to_group(
@@ -466,24 +415,18 @@ class RdmGroups:
     ):
         """Description."""
         # Get user's rdm email
-        user_email = self.rdm_db.select_query(
-            "email", "accounts_user", {"id": user_id}
-        )[0][0]
+        user_email = self.rdm_db.get_user_email(user_id)
 
         # Get group id
-        response = self.rdm_db.select_query(
-            "id", "accounts_role", {"name": f"'{group_externalId}'"}
-        )
+        response = self.rdm_db.get_role(group_externalId)
 
         if not response:
             # If the group does not exist then creates it
             self.rdm_create_group(group_externalId, group_name)
             # Repeats the query to get the group id
-            response = self.rdm_db.select_query(
-                "id", "accounts_role", {"name": f"'{group_externalId}'"}
-            )
+            response = self.rdm_db.get_role(group_externalId)
 
-        group_id = response[0][0]
+        group_id = response[0]
 
         # Checks if match already exists
         response = self.rdm_db.select_query(
@@ -500,65 +443,3 @@ class RdmGroups:
         response = os.system(command)
         if response != 0:
             self.report.add(f"Warning @ Creating group response: {response}")
-
-    def _group_add_user(self, user_email: str, new_group_externalId: str, user_id: str):
-        """Description."""
-        # Get group id
-        group_id = self.rdm_db.select_query(
-            "id", "accounts_role", {"name": f"'{new_group_externalId}'"}
-        )[0][0]
-
-        # Check if the user is already in the group
-        response = self.rdm_db.select_query(
-            "*", "accounts_userrole", {"user_id": user_id, "role_id": group_id}
-        )
-
-        if response:
-            return True
-
-        command = f"pipenv run invenio roles add {user_email} {new_group_externalId}"
-        response = os.system(command)
-
-        report = f"\tAdd user to group @ ExtId:     {add_spaces(new_group_externalId)} @ User id:     {add_spaces(user_id)}"
-        if response != 0:
-            self.report.add(f"{report} @ Error: {response}", self.report_files)
-            return False
-
-        self.report.add(f"{report} @ Success", self.report_files)
-        return True
-
-    def _group_remove_user(self, user_email: str, group_name: str):
-        """Description."""
-        # Get user id
-        user_id = self.rdm_db.select_query(
-            "id", "accounts_user", {"email": f"'{user_email}'"}
-        )[0][0]
-
-        # Get group id
-        group_id = self.rdm_db.select_query(
-            "id", "accounts_role", {"name": f"'{group_name}'"}
-        )[0][0]
-
-        # Check if the user is already in the group
-        response = self.rdm_db.select_query(
-            "*", "accounts_userrole", {"user_id": user_id, "role_id": group_id}
-        )
-
-        report = f"Remove user fromGroup @ ExtId:     {add_spaces(group_name)} @ User id:     {add_spaces(user_id)}"
-
-        if not response:
-            self.report.add(
-                f"\t{report} @ Not in group (already removed)", self.report_files
-            )
-            return True
-
-        # Remove user from old group
-        command = f"pipenv run invenio roles remove {user_email} {group_name}"
-        response = os.system(command)
-
-        if response != 0:
-            self.report.add(f"\t{report} @ Error: {response}", self.report_files)
-            return False
-
-        self.report.add(f"\t{report} @ Success", self.report_files)
-        return True
@@ -9,12 +9,14 @@
 
 import json
 
-from ....setup import data_files_name, pure_uuid_length
+from ....setup import owners_query_size, pure_uuid_length
+from ...pure.person_index import PersonIndex
 from ...pure.requests_pure import get_next_page, get_pure_metadata
 from ...reports import Reports
-from ...utils import file_read_lines, initialize_counters, shorten_file_name
+from ...utils import initialize_counters, shorten_file_name
 from ..add_record import RdmAddRecord
 from ..database import RdmDatabase
+from ..owner_map import owner_map
 from ..requests_rdm import Requests
 
 
@@ -27,6 +29,7 @@ class RdmOwners:
         self.rdm_db = RdmDatabase()
         self.report = Reports()
         self.rdm_add_record = RdmAddRecord()
+        self.person_index = PersonIndex()
         self.report_files = ["console", "owners"]
 
     def _set_counters_and_title(func):
@@ -113,6 +116,144 @@ class RdmOwners:
 
         self._final_report()
 
+    @_set_counters_and_title
+    def run_owners_bulk(self, identifier: str, identifier_values: list):
+        """Gets from pure all the records related to many users at once.
+
+        First all (user, record) pairs are gathered, then the RDM records are
+        queried in bulk and each record gets a single update with all its
+        new owners (co-authored records are fetched and updated only once).
+        """
+        self.local_counters = {"create": 0, "in_record": 0, "to_update": 0}
+
+        # Record uuid -> RDM user ids of its owners, and Pure record item
+        record_owners = {}
+        pure_items = {}
+
+        for identifier_value in identifier_values:
+            self.report.add(f"\n{identifier}: {identifier_value}\n")
+
+            user_uuid = self._get_user_uuid_from_pure(identifier, identifier_value)
+            if not user_uuid:
+                continue
+
+            # The RDM user ids are taken from user_ids_match.txt
+            entry = owner_map.get_by_uuid(user_uuid)
+            if not entry:
+                self.report.add(
+                    "RDM user id NOT FOUND in user_ids_match", self.report_files
+                )
+                continue
+            # RDM _owners holds integer user ids
+            user_id = int(entry[0])
+
+            for item in self._get_person_research_outputs(user_uuid):
+                record_owners.setdefault(item["uuid"], set()).add(user_id)
+                pure_items.setdefault(item["uuid"], item)
+
+        self.report.add(
+            f"\nUsers: {len(identifier_values)} @ Records: {len(record_owners)}",
+            self.report_files,
+        )
+
+        rdm_records = self._get_rdm_records(list(record_owners))
+        if rdm_records is None:
+            # Unknown records would be created again (duplicates)
+            self.report.add(
+                "\nFailed to get the RDM records @ End task\n", self.report_files
+            )
+            return
+
+        for uuid, user_ids in record_owners.items():
+            title = shorten_file_name(pure_items[uuid]["title"])
+            self.report.add(f"\n\tRecord uuid  @ {uuid} @ {title}")
+
+            if uuid not in rdm_records:
+                # Record NOT in RDM, create it
+                self._create_rdm_record(pure_items[uuid], sorted(user_ids))
+                continue
+
+            self._merge_record_owners(rdm_records[uuid], user_ids)
+
+        self._final_report()
+
+    def _get_person_research_outputs(self, user_uuid: str):
+        """Gets from Pure all the research outputs of a person."""
+        next_page = True
+        page = 1
+        while next_page:
+            params = {"sort": "modified", "page": page, "pageSize": 100}
+            response = get_pure_metadata(
+                "persons", f"{user_uuid}/research-outputs", params
+            )
+            if response.status_code >= 300:
+                return
+
+            pure_json = self._process_response(response, page)
+            if not pure_json:
+                return
+
+            yield from pure_json["items"]
+
+            next_page = get_next_page(pure_json)
+            page += 1
+
+    def _get_rdm_records(self, uuids: list):
+        """Gets the metadata of the newest RDM record of each uuid, querying many at once.
+
+        Returns None if a request failed, as the records of the uuids not
+        found could then be in RDM anyway.
+        """
+        rdm_records = {}
+        for index in range(0, len(uuids), owners_query_size):
+            chunk = uuids[index : index + owners_query_size]
+            page = 1
+            fetched = 0
+            while True:
+                response = self.rdm_requests.get_metadata_by_uuids(chunk, page)
+                if response.status_code >= 300:
+                    return None
+
+                resp_json = json.loads(response.content)
+                hits = resp_json["hits"]["hits"]
+                # Sorted by most recent, the first hit of a uuid is its newest version
+                for hit in hits:
+                    uuid = hit["metadata"].get("extensions", {}).get("tug:uuid")
+                    if uuid and uuid not in rdm_records:
+                        rdm_records[uuid] = hit["metadata"]
+
+                fetched += len(hits)
+                if not hits or fetched >= resp_json["hits"]["total"]:
+                    break
+                page += 1
+        return rdm_records
+
+    def _merge_record_owners(self, data: dict, user_ids: set):
+        """Adds all the missing owners to an RDM record with a single request."""
+        new_owners = [user_id for user_id in user_ids if user_id not in data["_owners"]]
+
+        self.report.add(f"\tRDM record owners @@ Current owners: @ {data['_owners']}")
+
+        if not new_owners:
+            self.report.add("\tRDM record status @@ Owners IN record")
+            self.local_counters["in_record"] += 1
+            return
+
+        # When updating a record it is not possible to specify _communities field
+        data.pop("_communities", None)
+        data["_owners"].extend(sorted(new_owners))
+
+        response = self.rdm_requests.put_metadata(data["recid"], data)
+        self.report.add(
+            f"\tRDM record status @ {response} @ New owners: @ {data['_owners']}"
+        )
+        if response.status_code >= 300:
+            self.global_counters["metadata"]["error"] += 1
+            return
+
+        self.global_counters["metadata"]["success"] += 1
+        self.local_counters["to_update"] += 1
+
     def _process_record_owners(self, recid):
         """Gets record metadata from RDM and checks if the user is already a record owner."""
         response = self.rdm_requests.get_metadata_by_recid(recid)
@@ -145,9 +286,9 @@ class RdmOwners:
 
         self.local_counters["to_update"] += 1
 
-    def _create_rdm_record(self, item: dict):
+    def _create_rdm_record(self, item: dict, owners: list = None):
         """If a record of the processed user is not in RDM creates it."""
-        item["_owners"] = [self.user_id]
+        item["_owners"] = owners or [self.user_id]
 
         self.report.add("\tRDM record status @@ CREATE record")
         self.local_counters["create"] += 1
@@ -184,6 +325,17 @@ class RdmOwners:
 
     def _get_user_uuid_from_pure(self, key_name: str, key_value: str):
         """Given the user's external id it return the relative user uuid."""
+        # Local lookup (persons index)
+        person = self.person_index.get(key_name, key_value)
+        if person:
+            uuid, first_name, last_name = person
+            self.report.add(
+                f"Name:    {first_name} {last_name}\nUuid:    {uuid}",
+                self.report_files,
+            )
+            return uuid
+
+        # Live lookup, if the person is not indexed yet
         # If the uuid is not found in the first x items then it will continue with the next page
         page = 1
         page_size = 10
@@ -204,7 +356,9 @@ class RdmOwners:
 
             for item in record_json["items"]:
 
-                if item[key_name] == key_value:
+                if item.get(key_name) == key_value:
+                    self.person_index.add([item])
+
                     first_name = item["name"]["firstName"]
                     lastName = item["name"]["lastName"]
                     uuid = item["uuid"]
@@ -261,32 +415,11 @@ class RdmOwners:
 
         rdm_user_id, user_uuid and user_external_id.
         """
-        file_name = data_files_name["user_ids_match"]
+        added = owner_map.add(self.user_id, self.user_uuid, external_id)
 
-        needs_to_add = self._check_user_ids_match("user_ids_match", external_id)
-
-        if needs_to_add:
-            open(file_name, "a").write(
-                f"{self.user_id} {self.user_uuid} {external_id}\n"
-            )
-            report = f"user_ids_match @ Adding id toList @ {self.user_id}, {self.user_uuid}, {external_id}"
-            self.report.add(report, self.report_files)
+        if not added:
+            self.report.add("Ids list:   user in list", self.report_files)
+            return
 
-    def _check_user_ids_match(self, file_name: str, external_id: str):
-        """Description."""
-        lines = file_read_lines(file_name)
-        for line in lines:
-            line = line.split("\n")[0]
-            line = line.split(" ")
-
-            # Checks if at least one of the ids match
-            if (
-                str(self.user_id) == line[0]
-                or self.user_uuid == line[1]
-                or external_id == line[2]
-            ):
-
-                if line == [str(self.user_id), self.user_uuid, external_id]:
-                    self.report.add("Ids list:   user in list", self.report_files)
-                    return False
-        return True
+        report = f"user_ids_match @ Adding id toList @ {self.user_id}, {self.user_uuid}, {external_id}"
+        self.report.add(report, self.report_files)
@@ -8,11 +8,12 @@
 """File description."""
 
 import json
+import threading
 
 from ...pure.requests_pure import get_pure_metadata
 from ...reports import Reports
-from ...utils import initialize_counters
-from ..add_record import RdmAddRecord
+from ...utils import initialize_counters, merge_counters
+from ..record_pipeline import RecordPipeline, Transfer
 
 
 class RunPages:
@@ -21,38 +22,66 @@ class RunPages:
     def __init__(self):
         """Description."""
         self.report = Reports()
-        self.rdm_add_record = RdmAddRecord()
+        self._lock = threading.Lock()
 
     def get_pure_by_page(self, page_begin: int, page_end: int, page_size: int):
-        """Gets records from Pure 'research-outputs' endpoint by page and submit them to RDM."""
-        for page in range(page_begin, page_end):
+        """Gets records from Pure 'research-outputs' endpoint by page and submit them to RDM.
 
-            self.global_counters = initialize_counters()
+        The pages are fetched while the records of the previous ones are
+        still being transferred, each page is reported once all its records are done.
+        """
+        self.report.add_template(["console"], ["general", "title"], ["PAGES"])
+        self.page_size = page_size
+        # Counters and number of records still in the pipeline of each page
+        self.page_counters = {}
+        self.page_remaining = {}
 
-            # Report intro
-            self.report.add_template(["console"], ["general", "title"], ["PAGES"])
-            self.report.add_template(
-                ["console"], ["pages", "page_and_size"], [page, page_size]
-            )
+        pipeline = RecordPipeline(fetch=self._fetch_page, on_exit=self._record_done)
+        self.global_counters = pipeline.run(range(page_begin, page_end))
 
-            # Pure get request
-            response = get_pure_metadata(
-                "research-outputs", "", {"page": page, "pageSize": page_size}
-            )
+    def _fetch_page(self, page: int):
+        """Gets a page of Pure records (fetch stage of the pipeline)."""
+        self.report.add_template(
+            ["console"], ["pages", "page_and_size"], [page, self.page_size]
+        )
 
-            # Load json response
-            resp_json = json.loads(response.content)
+        # Pure get request
+        response = get_pure_metadata(
+            "research-outputs", "", {"page": page, "pageSize": self.page_size}
+        )
+        if response.status_code >= 300:
+            self.report.add(f"\nPag {page} @ Pure get research outputs @ {response}")
+            self.report_summary(page, initialize_counters())
+            return []
 
-            # Creates data to push to RDM
-            for item in resp_json["items"]:
-                self.report.add("")  # adds new line in the console
-                self.rdm_add_record.create_invenio_data(self.global_counters, item)
+        # Load json response
+        items = json.loads(response.content)["items"]
+        if not items:
+            self.report_summary(page, initialize_counters())
+            return []
 
-            self.report_summary(page, page_size)
+        with self._lock:
+            self.page_counters[page] = initialize_counters()
+            self.page_remaining[page] = len(items)
 
-    def report_summary(self, pag, page_size):
+        # Creates data to push to RDM
+        return [Transfer(item=item, key=page) for item in items]
+
+    def _record_done(self, transfer: Transfer, error: str):
+        """Reports the page once all its records left the pipeline."""
+        page = transfer.key
+        with self._lock:
+            merge_counters(self.page_counters[page], transfer.counters)
+            self.page_remaining[page] -= 1
+            if self.page_remaining[page]:
+                return
+            del self.page_remaining[page]
+            page_counters = self.page_counters.pop(page)
+        self.report_summary(page, page_counters)
+
+    def report_summary(self, pag, page_counters):
         """Description."""
-        # Global counters
-        self.report.summary_global_counters(["console"], self.global_counters)
+        # Page counters
+        self.report.summary_global_counters(["console"], page_counters)
         # Summary pages.log
-        self.report.pages_single_line(self.global_counters, pag, page_size)
+        self.report.pages_single_line(page_counters, pag, self.page_size)
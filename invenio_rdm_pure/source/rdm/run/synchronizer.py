@@ -8,28 +8,49 @@
 """Synchronizer module to facilitate record synchronization between Invenio and Pure."""
 
 import datetime
+import json
+import math
 import os
 import time
 import traceback
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
-from flask import current_app
+from flask import current_app, has_app_context
 
+from ....setup import (
+    data_files_name,
+    marc21_records_path,
+    sync_chunk_size,
+    sync_days_span,
+    sync_page_size,
+    sync_workers,
+)
 from ...pure.requests_pure import (
+    get_next_page,
     get_pure_metadata,
+    get_pure_record_metadata_by_uuid,
     get_research_output_count,
     get_research_outputs,
 )
-from ...utils import get_dates_in_span
+from ...reports import ERROR, WARNING, Reports
+from ...state_db import StateDatabase
+from ...utils import check_if_directory_exists, get_dates_in_span
+from ..change_plan import ChangePlan
 from ..converter import Converter
+from ..record_hashes import RecordHashes
+from ..sync_chunks import SyncChunks
 
 
 class Synchronizer(object):
     """Synchronizer class to facilitate record synchronization between Invenio and Pure."""
 
-    def __init__(self):
+    def __init__(self, state_db: StateDatabase = None):
         """Default Constructor of the class Synchronizer."""
+        self.report = Reports()
+        self.converter = Converter()
+        self.hashes = RecordHashes(state_db)
 
     def run_initial_synchronization(self) -> None:
         """Run the initial synchronization.
@@ -43,74 +64,307 @@ class Synchronizer(object):
         self.run_initial_research_output_synchronization(pure_api_key, pure_api_url)
 
     def run_initial_research_output_synchronization(
-        self, pure_api_key: str, pure_api_url: str, granularity: int = 100
+        self, pure_api_key: str, pure_api_url: str, granularity: int = sync_chunk_size
     ) -> None:
         """Run initial synchronization for all research outputs.
 
         There are ca. 65300 research output entries in Pure (15.12.2020).
+        The offset windows are kept in the sync_chunks table: a new run
+        only synchronizes the windows that are not done yet.
         """
+        self.report.add_template(
+            ["console"], ["general", "title"], ["INITIAL SYNCHRONIZATION"]
+        )
+        chunks = SyncChunks()
+        recovered = chunks.recover()
+        chunks.retry_failed()
+
         research_count = get_research_output_count(pure_api_key, pure_api_url)
-        assert research_count != -1, "Failed to get research output count"
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            for job_counter in range(0, (research_count // granularity) + 1):
-                if job_counter == (research_count // granularity):
-                    executor.submit(
-                        self.synchronize_research_outputs,
-                        pure_api_key,
-                        pure_api_url,
-                        research_count - job_counter * granularity,
-                        job_counter * granularity,
-                    )
-                else:
-                    executor.submit(
-                        self.synchronize_research_outputs,
-                        pure_api_key,
-                        pure_api_url,
-                        granularity,
-                        job_counter * granularity,
-                    )
+        if research_count == -1:
+            # The chunks planned by a previous run can still be processed
+            self.report.event("sync_count_failed", WARNING)
+        else:
+            added = chunks.plan(research_count, granularity)
+            self.report.add(
+                f"\nResearch outputs: {research_count} @ New chunks: {added} @ Recovered: {recovered}"
+            )
+
+        with self._executor() as executor:
+            for _ in range(sync_workers):
+                executor.submit(
+                    self._process_chunks, chunks, pure_api_key, pure_api_url
+                )
+
+        counts = chunks.count()
+        self.report.add(
+            f"\nChunks @ Done: {counts['done']} @ Failed: {counts['failed']} @ Pending: {counts['pending']}\n"
+        )
+
+    def _process_chunks(self, chunks: SyncChunks, pure_api_key: str, pure_api_url: str):
+        """Synchronizes chunks until none is pending."""
+        while True:
+            chunk = chunks.claim()
+            if chunk is None:
+                wait = chunks.next_wait()
+                if wait is None:
+                    return
+                # The next chunk is waiting for its backoff
+                time.sleep(wait)
+                continue
+
+            offset, size, attempts = chunk
+            start = time.time()
+            try:
+                records = self.synchronize_research_outputs(
+                    pure_api_key, pure_api_url, size, offset
+                )
+            except Exception as error:
+                status = chunks.fail(offset, str(error))
+                self.report.event(
+                    "sync_chunk_failed",
+                    ERROR,
+                    offset=offset,
+                    attempts=attempts + 1,
+                    status=status,
+                    error=str(error),
+                )
+                continue
+
+            seconds = time.time() - start
+            chunks.done(offset, records, seconds)
+            self.report.event(
+                "sync_chunk",
+                offset=offset,
+                records=records,
+                rate=round(records / seconds, 1) if seconds else records,
+            )
 
     def synchronize_research_outputs(
         self, pure_api_key: str, pure_api_url: str, size: int, offset: int
-    ) -> None:
+    ) -> int:
         """Synchronize a series of research outputs.
 
         Pure API identifies a series by the following parameters:
         The *size* parameter defines the length of the series.
         The *offset* parameter defines the offset of the series.
+        Returns the number of research outputs, raises RuntimeError if the
+        series could not be fetched (the chunk is retried later).
         """
-        while True:
-            research_outputs = get_research_outputs(
-                pure_api_key,
-                pure_api_url,
-                size,
-                offset,
-            )  # Fetch research outputs from Pure
-            if research_outputs:
-                break
-            else:
-                time.sleep(0.001)
-        # Check if list is not empty
-        converter = Converter()
-        for research_output in research_outputs:
-            try:
-                converter.convert_pure_json_to_marc21_xml(research_output)
-            except RuntimeError:
-                traceback.print_exc()
+        research_outputs = get_research_outputs(
+            pure_api_key,
+            pure_api_url,
+            size,
+            offset,
+        )  # Fetch research outputs from Pure
+        if not research_outputs:
+            raise RuntimeError(f"No research outputs (size {size}, offset {offset})")
 
-        # TODO: Store record with the help of marc21 module
-        pass
+        for research_output in research_outputs:
+            self._synchronize_research_output(research_output)
+        return len(research_outputs)
 
     def run_scheduled_synchronization(self) -> None:
         """Run scheduled synchronization.
 
         In this case the invenio datawarehouse already contains entries.
+        Only the research outputs changed in Pure since the last synchronized
+        date are fetched, and only those whose metadata differs from the
+        last synchronization are converted.
         """
+        self.report.add_template(
+            ["console"], ["general", "title"], ["SCHEDULED SYNCHRONIZATION"]
+        )
+        date_today = datetime.date.today()
+        for changes_date in self._get_missing_synchronization_dates(sync_days_span):
+            changes = self._get_date_changes(str(changes_date))
+            if changes is None:
+                # The date and the following ones are synchronized next time
+                break
+
+            deleted = [
+                uuid for uuid, change_type in changes.items() if change_type == "DELETE"
+            ]
+            for uuid in deleted:
+                self._remove_record(uuid)
+            updated = [
+                uuid for uuid, change_type in changes.items() if change_type != "DELETE"
+            ]
+            with self._executor() as executor:
+                counts = Counter(executor.map(self._synchronize_uuid, updated))
+
+            self.report.add(
+                f"\n{changes_date} @ Changes: {len(changes)} @ Deleted: {len(changes) - len(updated)} @ {self._format_counts(counts)}"
+            )
+            # Only a date whose records are all stored is not fetched again,
+            # today can still change, it is checked again on the next run
+            if changes_date < date_today and not counts["error"]:
+                self._add_synchronization_date(changes_date)
 
     def run_user_synchronization(self, userid: str) -> None:
-        """Run on-demand synchronization for a user."""
+        """Run on-demand synchronization for a user.
+
+        userid is the Pure uuid of the person. The pages of the research
+        outputs of the person are fetched concurrently, only those whose
+        metadata differs from the last synchronization are converted.
+        """
+        self.report.add_template(
+            ["console"], ["general", "title"], ["USER SYNCHRONIZATION"]
+        )
+        first_page = self._get_user_page(userid, 1)
+        if first_page is None:
+            return
 
-    def _get_missing_synchronization_dates(self, days_span: int = 7) -> List[str]:
+        pages = math.ceil(first_page["count"] / sync_page_size)
+        counts = Counter()
+        with self._executor() as executor:
+            counts.update(
+                executor.map(self._synchronize_research_output, first_page["items"])
+            )
+            for page in executor.map(
+                lambda page: self._get_user_page(userid, page), range(2, pages + 1)
+            ):
+                if page is None:
+                    counts["error"] += 1
+                    continue
+                counts.update(
+                    executor.map(self._synchronize_research_output, page["items"])
+                )
+
+        self.report.add(
+            f"\nUser {userid} @ Research outputs: {first_page['count']} @ {self._format_counts(counts)}\n"
+        )
+
+    def _executor(self):
+        """Gets a pool of sync_workers threads, each with the application context."""
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def _initializer():
+            """Each thread needs its own application context."""
+            if app is not None:
+                app.app_context().push()
+
+        return ThreadPoolExecutor(sync_workers, initializer=_initializer)
+
+    def _synchronize_uuid(self, uuid: str) -> str:
+        """Fetches a research output from Pure and synchronizes it."""
+        research_output = get_pure_record_metadata_by_uuid(uuid)
+        if not research_output:
+            return "error"
+        return self._synchronize_research_output(research_output)
+
+    def _synchronize_research_output(self, research_output: dict) -> str:
+        """Converts a research output, unless its metadata is unchanged.
+
+        Returns 'converted' once the record is stored, 'unchanged' or 'error'.
+        """
+        uuid = research_output["uuid"]
+        digest = RecordHashes.digest(research_output)
+        if self.hashes.is_unchanged(uuid, digest):
+            return "unchanged"
+
+        try:
+            marc21_xml = self.converter.convert_pure_json_to_marc21_xml(research_output)
+        except RuntimeError:
+            self.report.event(
+                "sync_convert_failed", ERROR, uuid=uuid, error=traceback.format_exc()
+            )
+            return "error"
+
+        # Only a stored record can be skipped by the next synchronization
+        if not self._store_record(uuid, marc21_xml):
+            return "error"
+        self.hashes.set(uuid, digest)
+        return "converted"
+
+    def _store_record(self, uuid: str, marc21_xml: str) -> bool:
+        """Stores the converted record in marc21_records_path, returns True once stored."""
+        file_name = self._get_record_file_name(uuid)
+        temporary_file_name = f"{file_name}.tmp"
+        try:
+            check_if_directory_exists(marc21_records_path)
+            with open(temporary_file_name, "w") as fp:
+                fp.write(marc21_xml)
+            # A record is never left half written
+            os.replace(temporary_file_name, file_name)
+        except OSError as error:
+            self.report.event("sync_store_failed", ERROR, uuid=uuid, error=error)
+            return False
+        return True
+
+    def _remove_record(self, uuid: str):
+        """Removes a research output deleted in Pure, and its hash."""
+        # A research output created again is synchronized again
+        self.hashes.remove(uuid)
+        file_name = self._get_record_file_name(uuid)
+        if os.path.isfile(file_name):
+            os.remove(file_name)
+
+    @staticmethod
+    def _get_record_file_name(uuid: str) -> str:
+        """Description."""
+        return os.path.join(marc21_records_path, f"{os.path.basename(uuid)}.xml")
+
+    def _get_date_changes(self, changes_date: str):
+        """Gets the research output changes of a date, reduced to one change type per uuid.
+
+        The pages of the changes endpoint are chained (each page gives the
+        reference of the next one), they are fetched one after the other.
+        Returns None if a Pure request failed.
+        """
+        changes = {}
+        reference = changes_date
+        while reference:
+            response = get_pure_metadata("changes", reference, {})
+            if response.status_code >= 300:
+                self.report.event(
+                    "sync_changes_failed",
+                    ERROR,
+                    date=changes_date,
+                    status=response.status_code,
+                )
+                return None
+
+            resp_json = json.loads(response.content)
+            ChangePlan.reduce(
+                [
+                    item
+                    for item in resp_json.get("items", [])
+                    if "changeType" in item
+                    and "uuid" in item
+                    and item.get("familySystemName") == "ResearchOutput"
+                ],
+                changes,
+            )
+            next_page = get_next_page(resp_json)
+            reference = next_page.split("/")[-1] if next_page else None
+        return changes
+
+    def _get_user_page(self, userid: str, page: int):
+        """Gets a page of the research outputs of a person, None if the request failed."""
+        response = get_pure_metadata(
+            "persons",
+            f"{userid}/research-outputs",
+            {"sort": "modified", "page": page, "pageSize": sync_page_size},
+        )
+        if response.status_code >= 300:
+            self.report.event(
+                "sync_user_failed",
+                ERROR,
+                userid=userid,
+                page=page,
+                status=response.status_code,
+            )
+            return None
+        return json.loads(response.content)
+
+    @staticmethod
+    def _format_counts(counts: Counter) -> str:
+        """Description."""
+        return f"Converted: {counts['converted']} @ Unchanged: {counts['unchanged']} @ Errors: {counts['error']}"
+
+    def _get_missing_synchronization_dates(
+        self, days_span: int = sync_days_span
+    ) -> List[datetime.date]:
         """Gets the dates, on which Pure changes have not been synchronized."""
         missing_dates = []
         sync_dates = self._get_synchronization_history()
@@ -125,18 +379,23 @@ class Synchronizer(object):
 
         return missing_dates
 
-    def _get_synchronization_history(self) -> List[str]:
+    def _get_synchronization_history(self) -> List[datetime.date]:
         """Open the synchronization history file and return an ascending list of dates the synchronization ran on."""
-        path = os.path.join(
-            os.path.dirname(__file__), "../../../data/synchronization_history.txt"
-        )
+        file_name = data_files_name["synchronization_history"]
         sync_history = []
-        if os.path.isfile(path):
-            with open(path) as fp:
-                lines = fp.readlines()
-                for line in lines:
-                    sync_history.append(
-                        datetime.datetime.strptime(date_string=line, format="%Y-%m-%d")
-                    )
-                sync_history = fp.readlines()
-        return sync_history
+        if os.path.isfile(file_name):
+            with open(file_name) as fp:
+                for line in fp:
+                    line = line.strip()
+                    if line:
+                        sync_history.append(
+                            datetime.datetime.strptime(line, "%Y-%m-%d").date()
+                        )
+        return sorted(sync_history)
+
+    def _add_synchronization_date(self, date: datetime.date) -> None:
+        """Adds a synchronized date to the synchronization history file."""
+        file_name = data_files_name["synchronization_history"]
+        check_if_directory_exists(os.path.dirname(file_name))
+        with open(file_name, "a") as fp:
+            fp.write(f"{date}\n")
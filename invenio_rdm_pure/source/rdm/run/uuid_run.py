@@ -7,19 +7,20 @@
 
 """File description."""
 
-from ....setup import data_files_name
+from ....setup import retry_batch_size
 from ...reports import Reports
 from ...utils import check_uuid_authenticity, initialize_counters
-from ..add_record import RdmAddRecord
+from ..record_pipeline import RecordPipeline, Transfer
+from ..retry_queue import RetryQueue
 
 
 class AddFromUuidList:
-    """Reads from a txt file a list of record uuids and submit them to RDM."""
+    """Submits to RDM the records of the retry queue (and of to_transmit.txt)."""
 
     def __init__(self):
         """Description."""
         self.report = Reports()
-        self.add_record = RdmAddRecord()
+        self.retry_queue = RetryQueue()
 
     def _set_counters_and_title(func):
         """Description."""
@@ -37,30 +38,48 @@ class AddFromUuidList:
 
     @_set_counters_and_title
     def add_from_uuid_list(self):
-        """Submits to RDM all uuids in list (data/to_transfer.txt)."""
-        uuids = self._read_file()
-        if not uuids:
+        """Submits to RDM all uuids of the retry queue whose next attempt is due.
+
+        The uuids listed in data/to_transmit.txt are first added to the queue.
+        """
+        imported = self.retry_queue.import_transfer_list()
+        if imported:
+            self.report.add(f"\nto_transmit.txt @ Added to queue: {imported}")
+
+        total, due = self.retry_queue.count()
+        self.report.add(f"\nRetry queue @ Total: {total} @ Due: {due}\n")
+        if not due:
+            self.report.add("\nThere is nothing to transfer.\n")
             return
 
-        for uuid in uuids:
-            uuid = uuid.split("\n")[0]
+        pipeline = RecordPipeline(fetch=self._fetch, on_exit=self._exit)
+        self.global_counters = pipeline.run(self._get_transfers())
+        self.report.summary_global_counters(["console"], self.global_counters)
 
-            # Checks if lenght of the uuid is correct
-            if not check_uuid_authenticity(uuid):
-                self.report.add("Invalid uuid lenght.")
-                continue
+    def _get_transfers(self):
+        """Takes the uuids that are due from the queue, batch by batch."""
+        uuids = self.retry_queue.dequeue(retry_batch_size)
+        while uuids:
+            for uuid in uuids:
+                # Checks if lenght of the uuid is correct
+                if not check_uuid_authenticity(uuid):
+                    self.report.add(f"Invalid uuid lenght: {uuid}")
+                    self.retry_queue.remove(uuid)
+                    continue
 
-            self.add_record.push_record_by_uuid(self.global_counters, uuid)
-        return
+                yield Transfer(uuid)
 
-    def _read_file(self):
-        """Description."""
-        # read to_transmit.txt
-        file_name = data_files_name["transfer_uuid_list"]
-        uuids = open(file_name, "r").readlines()
+            uuids = self.retry_queue.dequeue(retry_batch_size)
 
-        if len(uuids) == 0:
-            self.report.add("\nThere is nothing to transfer.\n")
-            return False
+    def _fetch(self, transfer: Transfer):
+        """Gets the Pure metadata, a failure delays the next attempt."""
+        transfers = RecordPipeline.fetch_by_uuid(transfer)
+        if not transfers:
+            self.retry_queue.push(transfer.uuid, "Pure get metadata")
+        return transfers
 
-        return uuids
+    def _exit(self, transfer: Transfer, error: str):
+        """Delays the next attempt of a record that raised an error."""
+        # The other failures are pushed to the queue by RdmAddRecord
+        if error:
+            self.retry_queue.push(transfer.uuid, error)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Continuous processing of Pure 'changes' endpoint."""
+
+import json
+import signal
+import threading
+from datetime import date, timedelta
+
+from ....setup import watch_poll_interval_sec
+from ...metrics import metrics
+from ...pure.requests_pure import get_next_page, get_pure_metadata
+from ...utils import initialize_counters
+from ..change_processor import ChangeProcessor
+from .changes import PureChanges
+
+
+class PureChangesWatch(PureChanges):
+    """Polls Pure 'changes' endpoint and applies the changes as they arrive.
+
+    The resume token is stored in the state database together with the
+    changes of each page, so that the watch can be stopped (SIGTERM) and
+    started again without losing or repeating changes. The worker threads,
+    their HTTP sessions and caches are kept between two polls.
+    """
+
+    token_key = "watch_pure_changes_token"
+    # Number of items of the token's changes already planned
+    seen_key = "watch_pure_changes_seen"
+
+    def __init__(self, poll_interval: float = watch_poll_interval_sec):
+        """Description."""
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+
+    def watch_pure_changes(self):
+        """Applies Pure changes until SIGTERM (or SIGINT) is received."""
+        self._handle_signals()
+
+        self.report_files = ["console", "changes"]
+        self.report.add_template(
+            self.report_files, ["general", "title"], ["CHANGES WATCH"]
+        )
+
+        self.ledger.import_successful_changes()
+        token = self._get_token()
+        seen = int(self.plan.db.get_value(self.seen_key) or 0)
+        processor = ChangeProcessor()
+        try:
+            while not self.stop_event.is_set():
+                token, seen, more_changes = self._poll(token, seen, processor)
+                if not more_changes:
+                    # Up to date, waits for new changes
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            # Waits for the queued changes, the plan keeps the others
+            processor.close()
+            self.report.add(f"\nWatch stopped @ Token: {token}\n", self.report_files)
+
+    def _poll(self, token: str, seen: int, processor: ChangeProcessor):
+        """Gets the changes following the token and applies them.
+
+        seen is the number of items of the token's changes already planned.
+        Returns the token and seen items of the next poll, and if there are
+        more changes.
+        """
+        self.global_counters = initialize_counters()
+        self._initialize_local_counters()
+
+        response = get_pure_metadata("changes", token, {})
+        if response.status_code >= 300:
+            self.report.add(response.content, self.report_files)
+            return token, seen, False
+
+        json_response = json.loads(response.content)
+        items = json_response.get("items", [])
+        next_token, next_seen = self._get_next_position(json_response, token, items)
+        changes = self._reduce_page(items[seen:])
+
+        # The changes and the position of the next ones are stored together
+        with self.plan.db.transaction():
+            self.plan.add(str(date.today()), changes)
+            self.plan.db.set_value(self.token_key, next_token)
+            self.plan.db.set_value(self.seen_key, str(next_seen))
+
+        if self.plan.count_due() > 0:
+            self._apply_plan(processor)
+            self._report_summary()
+            metrics.export()
+
+        more_changes = json_response.get(
+            "moreChanges", bool(get_next_page(json_response))
+        )
+        if not more_changes:
+            self._complete_past_dates()
+        return next_token, next_seen, more_changes
+
+    def _get_next_position(self, json_response: dict, token: str, items: list):
+        """Gets the token and the seen items of the next poll.
+
+        Without a next token, a past date goes on with the following date,
+        while today (or a resumption token) is polled again, skipping the
+        items already planned.
+        """
+        next_token = self._get_next_token(json_response)
+        if next_token:
+            return next_token, 0
+        try:
+            token_date = date.fromisoformat(token)
+        except ValueError:
+            token_date = None
+        if token_date and token_date < date.today():
+            return str(token_date + timedelta(days=1)), 0
+        return token, len(items)
+
+    def _get_token(self):
+        """Gets the stored token, or the oldest date not processed yet."""
+        token = self.plan.db.get_value(self.token_key)
+        if token:
+            return token
+        missing_dates = self.ledger.missing_dates()
+        if missing_dates:
+            return self.ledger.get_checkpoint(missing_dates[-1])[0]
+        return str(date.today())
+
+    @staticmethod
+    def _get_next_token(json_response: dict):
+        """Description."""
+        if json_response.get("resumptionToken"):
+            return json_response["resumptionToken"]
+        next_page = get_next_page(json_response)
+        if next_page:
+            return next_page.split("/")[-1]
+        return None
+
+    def _complete_past_dates(self):
+        """Marks the past dates as processed, so that get_pure_changes skips them."""
+        today = str(date.today())
+        for changes_date in self.ledger.missing_dates():
+            if changes_date < today:
+                self.ledger.complete(changes_date)
+
+    def _handle_signals(self):
+        """Description."""
+        # Signal handlers can only be set from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_number, self._stop)
+
+    def _stop(self, signal_number, frame):
+        """Stops the watch once the current changes are applied."""
+        # Only sets the event, the reports are written by the main loop
+        self.stop_event.set()
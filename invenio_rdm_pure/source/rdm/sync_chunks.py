@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Offset windows of the initial synchronization and their status."""
+
+import time
+
+from ...setup import (
+    sync_chunk_backoff_max_sec,
+    sync_chunk_backoff_sec,
+    sync_chunk_max_attempts,
+)
+from ..state_db import StateDatabase
+
+schema = """
+CREATE TABLE IF NOT EXISTS sync_chunks (
+    offset          INTEGER PRIMARY KEY,
+    size            INTEGER NOT NULL,
+    status          TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt    REAL NOT NULL,
+    last_error      TEXT,
+    records         INTEGER,
+    seconds         REAL,
+    updated         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sync_chunks_status ON sync_chunks (status, next_attempt);
+"""
+
+# Chunk status
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class SyncChunks:
+    """Persistent table of the chunks (size, offset) of the initial synchronization.
+
+    Each chunk is pending, running, done or failed. A failed attempt puts
+    the chunk back to pending with an exponential backoff, until
+    sync_chunk_max_attempts. After a crash the chunks that were running
+    are pending again, so only the missing windows are synchronized.
+    """
+
+    def __init__(self, state_db: StateDatabase = None):
+        """Description."""
+        self.db = state_db or StateDatabase()
+        self.db.create_tables(schema)
+
+    @staticmethod
+    def backoff(attempts: int):
+        """Seconds to wait before the next attempt of a chunk."""
+        if attempts <= 0:
+            return 0
+        return min(
+            sync_chunk_backoff_sec * 2 ** (attempts - 1), sync_chunk_backoff_max_sec
+        )
+
+    def plan(self, total: int, size: int):
+        """Adds the chunks covering total records not planned yet.
+
+        A last chunk planned shorter (fewer records at the time) is extended
+        and synchronized again. Returns the number of added chunks.
+        """
+        now = time.time()
+        with self.db.transaction() as connection:
+            before = connection.execute("SELECT COUNT(*) FROM sync_chunks").fetchone()
+            connection.executemany(
+                """
+                INSERT INTO sync_chunks (offset, size, status, next_attempt, updated)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(offset) DO UPDATE SET
+                    size = excluded.size,
+                    status = excluded.status,
+                    next_attempt = excluded.next_attempt,
+                    updated = excluded.updated
+                WHERE excluded.size > sync_chunks.size AND sync_chunks.status != 'running'
+                """,
+                [
+                    (offset, min(size, total - offset), PENDING, now, now)
+                    for offset in range(0, total, size)
+                ],
+            )
+            after = connection.execute("SELECT COUNT(*) FROM sync_chunks").fetchone()
+        return after[0] - before[0]
+
+    def recover(self):
+        """Puts back to pending the chunks left running (interrupted run).
+
+        Returns the number of recovered chunks.
+        """
+        cursor = self.db.execute(
+            "UPDATE sync_chunks SET status = ?, updated = ? WHERE status = ?",
+            (PENDING, time.time(), RUNNING),
+        )
+        return cursor.rowcount
+
+    def retry_failed(self):
+        """Gives the failed chunks a new series of attempts."""
+        self.db.execute(
+            "UPDATE sync_chunks SET status = ?, attempts = 0, next_attempt = ? "
+            "WHERE status = ?",
+            (PENDING, time.time(), FAILED),
+        )
+
+    def claim(self):
+        """Takes the first pending chunk that is due.
+
+        Returns (offset, size, attempts), None if no chunk is due.
+        """
+        now = time.time()
+        with self.db.transaction() as connection:
+            row = connection.execute(
+                "SELECT offset, size, attempts FROM sync_chunks "
+                "WHERE status = ? AND next_attempt <= ? ORDER BY offset LIMIT 1",
+                (PENDING, now),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE sync_chunks SET status = ?, updated = ? WHERE offset = ?",
+                    (RUNNING, now, row[0]),
+                )
+        return row
+
+    def done(self, offset: int, records: int, seconds: float):
+        """Marks a chunk as synchronized."""
+        self.db.execute(
+            "UPDATE sync_chunks SET status = ?, records = ?, seconds = ?, updated = ? "
+            "WHERE offset = ?",
+            (DONE, records, seconds, time.time(), offset),
+        )
+
+    def fail(self, offset: int, error: str):
+        """Counts a failed attempt, the chunk is retried later or marked as failed.
+
+        Returns the new status of the chunk.
+        """
+        now = time.time()
+        with self.db.transaction() as connection:
+            attempts = (
+                connection.execute(
+                    "SELECT attempts FROM sync_chunks WHERE offset = ?", (offset,)
+                ).fetchone()[0]
+                + 1
+            )
+            status = FAILED if attempts >= sync_chunk_max_attempts else PENDING
+            connection.execute(
+                """UPDATE sync_chunks
+                SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ?
+                WHERE offset = ?""",
+                (status, attempts, now + self.backoff(attempts), error, now, offset),
+            )
+        return status
+
+    def next_wait(self):
+        """Seconds until the next pending chunk is due, None if none is pending."""
+        row = self.db.select_one(
+            "SELECT MIN(next_attempt) FROM sync_chunks WHERE status = ?", (PENDING,)
+        )
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0)
+
+    def count(self):
+        """Gets the number of chunks of each status."""
+        rows = self.db.select_all(
+            "SELECT status, COUNT(*) FROM sync_chunks GROUP BY status"
+        )
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
@@ -8,9 +8,11 @@
 """File description."""
 
 import json
+from datetime import date
 
 from ..reports import Reports
 from ..utils import add_spaces
+from .record_rewriter import RecordRewriter
 from .requests_rdm import Requests
 
 
@@ -21,9 +23,14 @@ class Versioning:
         """Description."""
         self.report = Reports()
         self.rdm_requests = Requests()
+        self.record_rewriter = RecordRewriter()
 
     def get_uuid_version(self, uuid):
-        """Gives the version to use for a new record and old versions of the same uuid."""
+        """Gives the version to use for a new record and old versions of the same uuid.
+
+        The metadata of the old versions is returned as well, so that
+        update_all_uuid_versions does not need to query them again.
+        """
         # Request
         response = self.rdm_requests.get_metadata_by_query(uuid)
 
@@ -33,12 +40,13 @@ class Versioning:
 
         total_recids = resp_json["hits"]["total"]
         all_metadata_versions = []
+        old_versions = []
 
         if total_recids == 0:
             # If there are no records with the same uuid means it is the first one (version 1)
             new_version = 1
             self.report.add(f"{message}Record NOT found    - Metadata version: 1")
-            return [new_version, all_metadata_versions]
+            return [new_version, all_metadata_versions, old_versions]
 
         new_version = None
 
@@ -58,8 +66,9 @@ class Versioning:
             # Add data to listed versions (old versions)
             recid = item["id"]
             creation_date = item["created"].split("T")[0]
-            version = str(rdm_metadata["metadataVersion"])
+            version = str(rdm_metadata.get("metadataVersion"))
             all_metadata_versions.append([recid, version, creation_date])
+            old_versions.append((recid, rdm_metadata))
 
         # In case the record has no metadataVersion
         if not new_version:
@@ -73,39 +82,34 @@ class Versioning:
 
         self.report.add(message)
 
-        return [new_version, all_metadata_versions]
-
-    def update_all_uuid_versions(self, uuid):
-        """Description."""
-        # Request
-        response = self.rdm_requests.get_metadata_by_query(uuid)
+        return [new_version, all_metadata_versions, old_versions]
 
-        resp_json = json.loads(response.content)
-        total_recids = resp_json["hits"]["total"]
-
-        if total_recids == 0:
-            self.report.add("There are no records with this uuid")
-            return
+    def update_all_uuid_versions(
+        self, recid: str, record_data: dict, old_versions: list
+    ):
+        """Updates the list of versions of the new record and of its old versions.
 
-        all_metadata_versions = []
-        for item in resp_json["hits"]["hits"]:
-            # Add data to listed versions
-            recid = item["id"]
-            creation_date = item["created"].split("T")[0]
-            version = str(item["metadata"]["metadataVersion"])
-            all_metadata_versions.append([recid, version, creation_date])
+        Only the records whose list differs are updated, all at once.
+        """
+        # The new version is the most recent one
+        all_metadata_versions = [
+            [recid, str(record_data.get("metadataVersion")), str(date.today())]
+        ] + record_data.get("metadataOtherVersions", [])
 
         self.report.add(f"\tUpdate uuid versions")
 
-        for item in resp_json["hits"]["hits"]:
-
-            recid = item["id"]
-            item = item["metadata"]
+        records = []
+        for version_recid, item in [(recid, record_data)] + old_versions:
 
-            if item["metadataOtherVersions"] == all_metadata_versions:
-                self.report.add(f"\tRecord update @ Up to date @ {recid}")
+            if item.get("metadataOtherVersions") == all_metadata_versions:
+                self.report.add(f"\tRecord update @ Up to date @ {version_recid}")
                 continue
 
             item["metadataOtherVersions"] = all_metadata_versions
 
-            # Update record
+            # When updating a record it is not possible to specify _communities field
+            item.pop("_communities", None)
+            records.append((version_recid, item))
+
+        for response in self.record_rewriter.write_records(records):
+            self.report.add(f"\tRecord update @ {response}")
@@ -8,23 +8,24 @@
 """Module responsible for logging."""
 
 import datetime
+import json
+import logging
 import os
+import threading
 from datetime import date, timedelta
 
 from ..setup import (
-    data_files_name,
     days_keep_log,
     dirpath,
-    lines_successful_changes,
     log_files_name,
+    report_human_output,
+    report_json_output,
+    report_level,
     reports_full_path,
 )
-from .utils import (
-    add_spaces,
-    check_if_directory_exists,
-    check_if_file_exists,
-    current_time,
-)
+from .metrics import metrics
+from .rdm.changes_ledger import ChangesLedger
+from .utils import add_spaces, check_if_directory_exists, current_time
 
 report_templates = {
     # GENERAL       ***
@@ -60,6 +61,40 @@ Incomplete: {} - Duplicated: {} - Irrelevant:{}
 }
 
 
+# Templates used to format structured events for the human readable sinks.
+# The '@' character separates the columns (see Reports._report_columns_spaces)
+event_templates = {
+    "record_start": "",
+    "change_type": "\n{record_number:>5} - Change type           - {change_type}",
+    "change_failed": "\tChange failed @ {uuid} @ {error}",
+    "pure_get_metadata": "\tPure get metadata     - {status} - {message}",
+    "pure_get_file": "\tPure get file @ {status} @ {match_review} @ {file_name:.60}",
+    "pure_get_orcid": "\tPure get orcid @ {status} @ {orcid} @ {person_uuid} @ {name}",
+    "pure_get_orcid_error": "\tPure get orcid @ {status} @ Error: {content}",
+    "pure_orcid_external": "\tPure get orcid @@ External person @ {person_uuid} @ {name}",
+    "rdm_owner_match": "\tRDM owner list @@ User id:     {user_id:>5} @ externalId: {external_id}",
+    "rdm_post_metadata": "\tRDM post metadata @ {status} @ Uuid:                 {uuid}",
+    "rdm_get_recid": "\tRDM get recid @ {status} @ Total: {total:>5} @ {api_url}",
+    "rdm_put_file": "\tRDM put file @ {status} @ {file_name}",
+    "rdm_delete_record": "\tRDM delete record @ {status} @ Deleted recid:        {recid}",
+    "rdm_delete_failed": "\tRDM delete record @ Failed recid: {recid} @ {error}",
+    "delete_progress": "\nDeleted @ {done} / {total} @ {rate} records/s @ ETA: {eta}",
+    "sync_chunk": "\tSync chunk @ Offset: {offset} @ {records} records @ {rate} records/s",
+    "sync_chunk_failed": "\tSync chunk @ Offset: {offset} @ Attempt {attempts} - {status} @ {error}",
+    "sync_count_failed": "\nFailed to get research output count",
+    "sync_changes_failed": "\nFailed to get Pure changes @ Date: {date} @ Status: {status}",
+    "sync_store_failed": "\tStore failed @ Uuid: {uuid} @ {error}",
+    "sync_convert_failed": "\tConversion failed @ Uuid: {uuid} @ {error}",
+    "sync_user_failed": "\nFailed to get research outputs @ User: {userid} @ Page: {page} @ Status: {status}",
+}
+
+# Levels accepted by Reports.event
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+
 class Reports:
     """It is the responsible for giving a feedback to the user regarding.
 
@@ -67,6 +102,65 @@ class Reports:
     This information is available in the reports/ directory.
     """
 
+    # Events with a lower level are discarded (see setup.report_level)
+    level = logging.getLevelName(report_level)
+
+    _json_lock = threading.Lock()
+    _directory_checked = False
+
+    @classmethod
+    def set_level(cls, level):
+        """Sets the minimum level of the events to report (e.g. 'WARNING')."""
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        cls.level = level
+
+    @classmethod
+    def is_enabled_for(cls, level: int):
+        """Checks if an event of the given level would be reported."""
+        return level >= cls.level
+
+    def event(self, kind: str, level: int = INFO, files: list = None, **fields):
+        """Reports a structured event.
+
+        The human readable line is formatted only if it is going to be written,
+        the json-lines sink receives the raw fields.
+        """
+        if level < self.level:
+            return
+        if files is None:
+            files = ["console"]
+
+        if report_json_output:
+            self._add_json_line(kind, level, fields)
+
+        if report_human_output and files:
+            template = event_templates.get(kind)
+            if template is None:
+                template = kind + "".join(f" @ {key}: {{{key}}}" for key in fields)
+            self.add(template.format(**fields), files)
+
+    def _add_json_line(self, kind: str, level: int, fields: dict):
+        """Adds the event to the json-lines log file."""
+        line = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "level": logging.getLevelName(level),
+            "kind": kind,
+        }
+        line.update(fields)
+        line = json.dumps(line, default=str)
+
+        self._check_reports_directory()
+        with self._json_lock, open(log_files_name["events"], "a") as fp:
+            fp.write(f"{line}\n")
+
+    def _check_reports_directory(self):
+        """Creates the reports/ directory once per process."""
+        if Reports._directory_checked:
+            return
+        check_if_directory_exists(f"{dirpath}/reports")
+        Reports._directory_checked = True
+
     def add_template(self, files, template, arguments):
         """Description."""
         if template == ["general", "title"]:
@@ -77,7 +171,7 @@ class Reports:
     def add(self, report, files=["console"]):
         """Description."""
         report = self._report_columns_spaces(report)
-        check_if_directory_exists(f"{dirpath}/reports")
+        self._check_reports_directory()
         # For each log file
         for file in files:
             # Prints in console only when saving in console file
@@ -135,6 +229,23 @@ class Reports:
             http_response_str = self.metadata_http_responses(global_counters)
             self.add(http_response_str, report_files)
 
+        self.summary_stage_timings(report_files)
+
+    def summary_stage_timings(self, report_files):
+        """Adds the time spent in each stage of the run (see metrics.py)."""
+        summary = metrics.summary()
+        if not summary:
+            return
+        report = "\nStage timings (count - total - p50 / p95 / p99):"
+        for stage, values in summary.items():
+            report += (
+                f"\n{stage.ljust(35)}{add_spaces(values['count'], 7)}"
+                f" - {values['sum']:9.2f} s"
+                f" - {values['p50'] * 1000:.0f} / {values['p95'] * 1000:.0f}"
+                f" / {values['p99'] * 1000:.0f} ms"
+            )
+        self.add(f"{report}\n", report_files)
+
     def pages_single_line(self, global_counters, pag, pag_size):
         """Adds to pages report log a summary of the page submission to RDM."""
         current_time = datetime.now().strftime("%H:%M:%S")
@@ -195,32 +306,9 @@ class Reports:
             else:
                 self.align_response(file_name, "Keep")
 
-        # SHORTEN SUCCESSFUL_CHANGES.TXT
-        file_path_name = data_files_name["successful_changes"]
-        file_name = file_path_name.split("/")[-1]
-
-        check_if_file_exists(file_path_name)
-
-        # Count file lines
-        file_data = open(file_path_name)
-        num_lines = sum(1 for line in file_data)
-
-        if num_lines > lines_successful_changes:
-
-            # Remove older lines from file
-            data = ""
-            file_data = open(file_path_name)
-            lines = file_data.read().splitlines()
-            for i in range(lines_successful_changes, 0, -1):
-                last_line = lines[-i]
-                data += f"{last_line}\n"
-            open(file_path_name, "w").close()
-            open(file_path_name, "w").write(data)
-
-            action = f"Reduced from {num_lines} to {lines_successful_changes} lines\n"
-            self.align_response(file_name, action)
-            return
-        self.align_response(file_name, f"{num_lines} lines - ok")
+        # REMOVE OLD CHANGES CHECKPOINTS
+        removed = ChangesLedger().prune(days_keep_log)
+        self.align_response("changes checkpoints", f"Removed {removed} dates\n")
 
     def align_response(self, file_name, action):
         """Description."""
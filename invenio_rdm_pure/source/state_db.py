@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""SQLite database keeping the state of the synchronization tasks."""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from ..setup import data_files_name
+from .utils import check_if_directory_exists
+
+
+class StateDatabase:
+    """Local SQLite database (data/state.db).
+
+    Each thread gets its own connection, the database is shared by all
+    the processes running on the same machine.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, file_name: str = data_files_name["state_db"]):
+        """Description."""
+        self.file_name = file_name
+
+    @property
+    def connection(self):
+        """Gets the connection of the current thread."""
+        connections = self._local.__dict__.setdefault("connections", {})
+        if self.file_name not in connections:
+            check_if_directory_exists(os.path.dirname(self.file_name))
+            connection = sqlite3.connect(
+                self.file_name, timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connections[self.file_name] = connection
+        return connections[self.file_name]
+
+    def create_tables(self, schema: str):
+        """Creates the tables (and indexes) of the given schema if missing."""
+        self.connection.executescript(schema)
+
+    def execute(self, query: str, parameters=()):
+        """Executes a query and returns the cursor."""
+        return self.connection.execute(query, parameters)
+
+    def executemany(self, query: str, parameters: list):
+        """Executes a query for each set of parameters in a single transaction."""
+        with self.transaction() as connection:
+            connection.executemany(query, parameters)
+
+    def select_all(self, query: str, parameters=()):
+        """Executes a query and returns all the rows."""
+        return self.connection.execute(query, parameters).fetchall()
+
+    def select_one(self, query: str, parameters=()):
+        """Executes a query and returns the first row (None if empty)."""
+        return self.connection.execute(query, parameters).fetchone()
+
+    def get_value(self, key: str, default=None):
+        """Gets a value of the key / value store (e.g. a resume token)."""
+        self._create_values_table()
+        row = self.select_one("SELECT value FROM state_values WHERE key = ?", (key,))
+        return default if row is None else row[0]
+
+    def set_value(self, key: str, value: str):
+        """Stores a value in the key / value store."""
+        self._create_values_table()
+        self.execute(
+            "INSERT OR REPLACE INTO state_values VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+
+    def _create_values_table(self):
+        """Description."""
+        # A single statement, it does not end an open transaction
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS state_values "
+            "(key TEXT PRIMARY KEY, value TEXT, updated REAL NOT NULL)"
+        )
+
+    @contextmanager
+    def transaction(self):
+        """Runs the queries of the with block in a single transaction."""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
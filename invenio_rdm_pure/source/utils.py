@@ -7,9 +7,11 @@
 
 """File description."""
 
+import fcntl
 import os
 import smtplib
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import List
 
@@ -54,6 +56,16 @@ def initialize_counters():
     return global_counters
 
 
+def merge_counters(global_counters: dict, other_counters: dict):
+    """Adds the values of other_counters to global_counters (see initialize_counters)."""
+    for key, value in other_counters.items():
+        if isinstance(value, dict):
+            merge_counters(global_counters.setdefault(key, {}), value)
+        else:
+            global_counters[key] = global_counters.get(key, 0) + value
+    return global_counters
+
+
 def current_time():
     """Description."""
     return datetime.now().strftime("%H:%M:%S")
@@ -64,9 +76,7 @@ def current_date():
     return datetime.today().strftime("%Y-%m-%d")
 
 
-def get_dates_in_span(
-    start: datetime.date, stop: datetime.date, step: int
-) -> List[datetime.date]:
+def get_dates_in_span(start: date, stop: date, step: int) -> List[date]:
     """Returns an ascending list of dates with given step between the two endpoints of the span."""
     dates = []
     if start == stop:
@@ -79,7 +89,7 @@ def get_dates_in_span(
         else:
             while start >= stop:
                 dates.append(start)
-                start += datetime.timedelta(step)
+                start += timedelta(step)
             dates.reverse()
     elif step > 0:
         if stop < start:
@@ -87,7 +97,7 @@ def get_dates_in_span(
         else:
             while start <= stop:
                 dates.append(start)
-                start += datetime.timedelta(step)
+                start += timedelta(step)
     return dates
 
 
@@ -103,6 +113,20 @@ def check_if_file_exists(file_name: str):
         open(file_name, "a")
 
 
+@contextmanager
+def file_lock(file_name: str):
+    """Locks a data file, between threads and processes, while it is written.
+
+    The lock is taken on a separate file, as rewritten files are replaced.
+    """
+    with open(f"{file_name}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def file_read_lines(file_name: str):
     """Description."""
     file_full_name = data_files_name[file_name]
@@ -165,26 +189,6 @@ def get_value(item, path: list):
     return value
 
 
-def get_userid_from_list_by_externalid(self, external_id: str, file_data: list):
-    """Given a user external_id, it checks if it is listed in data/user_ids_match.txt.
-
-    If it is found it returns its relative user id.
-    """
-    for line in file_data:
-        line = line.split("\n")[0]
-        line = line.split(" ")
-
-        # Checks if at least one of the ids match
-        if external_id == line[2]:
-            user_id = line[0]
-            user_id_spaces = add_spaces(user_id)
-
-            report = f"\tRDM owner list @@ User id:     {user_id_spaces} @ externalId: {external_id}"
-            self.reports.add(report)
-
-            return user_id
-
-
 def send_email(uuid: str, file_name: str):
     """Description."""
     # creates SMTP session
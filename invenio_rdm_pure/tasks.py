@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Celery tasks of invenio-rdm-pure.
+
+The coordinator tasks (changes pages, initial synchronization, summaries)
+use data/state.db and run on the node consuming celery_state_queue. The
+record tasks (push_record, apply_change, sync_research_output_chunk) get
+their arguments from the coordinator, which aggregates their results, but
+they also write the data/ of the node running them (retry queue, record
+hashes, all_rdm_records.txt): they are routed to celery_record_queue, by
+default the queue of the state tasks. Other nodes can consume it only if
+data/ is on storage shared by the nodes.
+No task is sent to the default queue: only the node started with
+'celery worker -Q invenio_rdm_pure_state' uses data/.
+The leases keeping a record, the planning of the changes or the application
+of the changes plan to a single task are in the RDM database (TaskLease).
+"""
+
+import time
+from contextlib import contextmanager
+
+from celery import chord, shared_task
+from flask import current_app
+
+from .setup import (
+    celery_record_queue,
+    celery_state_queue,
+    pure_import_timeout_sec,
+    sync_chunk_max_attempts,
+    sync_chunk_size,
+)
+from .source.pure.import_records import ImportRecords
+from .source.pure.requests_pure import get_research_output_count
+from .source.rdm.add_record import RdmAddRecord
+from .source.rdm.change_plan import ChangePlan
+from .source.rdm.database import RdmDatabase
+from .source.rdm.delete_record import Delete
+from .source.rdm.requests_rdm import Requests
+from .source.rdm.run.changes import PureChanges
+from .source.rdm.run.synchronizer import Synchronizer
+from .source.rdm.sync_chunks import SyncChunks
+from .source.reports import Reports
+from .source.state_db import StateDatabase
+from .source.utils import initialize_counters, merge_counters
+
+# State value holding the start time of the running Pure import export
+pure_import_started_key = "pure_import_started"
+
+
+def state_options():
+    """Options routing a coordinator task to the node of the state database."""
+    return {"queue": celery_state_queue}
+
+
+def record_options():
+    """Options routing a record task (see the module description)."""
+    return {"queue": celery_record_queue} if celery_record_queue else state_options()
+
+
+@contextmanager
+def record_lease(uuid: str):
+    """Gives True if no other task is processing the record."""
+    rdm_db = RdmDatabase()
+    key = f"record:{uuid}"
+    acquired = rdm_db.acquire_lease(key)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            rdm_db.release_lease(key)
+
+
+def pure_import_running(state_db: StateDatabase = None):
+    """Checks if the Pure import export is being regenerated."""
+    state_db = state_db or StateDatabase()
+    started = state_db.get_value(pure_import_started_key)
+    return bool(started) and time.time() - float(started) < pure_import_timeout_sec
+
+
+def request_pure_import(state_db: StateDatabase = None):
+    """Queues the regeneration of the Pure import export, unless already running.
+
+    Returns True if the task was queued.
+    """
+    state_db = state_db or StateDatabase()
+    # Only one request claims the regeneration
+    with state_db.transaction():
+        if pure_import_running(state_db):
+            return False
+        state_db.set_value(pure_import_started_key, str(time.time()))
+    pure_import.apply_async(**state_options())
+    return True
+
+
+@shared_task(ignore_result=True)
+def pure_import(full: bool = False):
+    """Adds the new RDM records to the Pure import file, or rebuilds it (full)."""
+    state_db = StateDatabase()
+    state_db.set_value(pure_import_started_key, str(time.time()))
+    try:
+        ImportRecords().run_import(full)
+    finally:
+        state_db.set_value(pure_import_started_key, "")
+
+
+# RECORDS
+
+
+@shared_task
+def push_record(uuid: str):
+    """Creates or updates the RDM record of the given uuid.
+
+    Returns the counters of the task (see utils.initialize_counters).
+    """
+    global_counters = initialize_counters()
+    with record_lease(uuid) as acquired:
+        if acquired:
+            RdmAddRecord().push_record_by_uuid(global_counters, uuid)
+    return global_counters
+
+
+def push_records(uuids: list):
+    """Pushes the records on the worker nodes, their counters are then summed up."""
+    callback = aggregate_counters.s().set(**state_options())
+    return chord(push_record.s(uuid).set(**record_options()) for uuid in uuids)(
+        callback
+    )
+
+
+@shared_task
+def aggregate_counters(results: list):
+    """Sums up and reports the counters returned by the record tasks."""
+    global_counters = initialize_counters()
+    for task_counters in results:
+        merge_counters(global_counters, task_counters)
+    Reports().summary_global_counters(["console"], global_counters)
+    return global_counters
+
+
+# CHANGES
+
+
+# Lease of the chain of tasks planning the missing dates
+plan_changes_lease = "plan_changes"
+
+
+@shared_task(ignore_result=True)
+def get_pure_changes():
+    """Plans the changes of the missing dates, then applies them (beat schedule).
+
+    As in PureChanges.get_pure_changes, the dates are planned one after the
+    other from the oldest, so that a later date never overtakes an earlier one.
+    """
+    pure_changes = PureChanges()
+    pure_changes.ledger.import_successful_changes()
+    missing_dates = pure_changes.ledger.missing_dates()
+    if not missing_dates:
+        apply_planned_changes.apply_async(**state_options())
+        return
+
+    # The dates are still being planned by a previous chain
+    if not RdmDatabase().acquire_lease(plan_changes_lease):
+        return
+    process_changes_page.apply_async((missing_dates[-1],), **state_options())
+
+
+@shared_task(ignore_result=True)
+def process_changes_page(changes_date: str):
+    """Adds to the plan the next page of Pure changes of the date.
+
+    The next page, or the next missing date, is a new task. The changes are
+    applied once all dates are planned, or once a date failed (the later
+    dates wait for it, it is retried by the next get_pure_changes).
+    """
+    rdm_db = RdmDatabase()
+    pure_changes = PureChanges()
+    try:
+        more_pages = pure_changes.plan_page(changes_date)
+        missing_dates = pure_changes.ledger.missing_dates()
+    except Exception:
+        rdm_db.release_lease(plan_changes_lease)
+        raise
+
+    if more_pages:
+        next_date = changes_date
+    elif more_pages is False and missing_dates and missing_dates[-1] != changes_date:
+        next_date = missing_dates[-1]
+    else:
+        next_date = None
+
+    if next_date:
+        rdm_db.renew_lease(plan_changes_lease)
+        process_changes_page.apply_async((next_date,), **state_options())
+        return
+
+    rdm_db.release_lease(plan_changes_lease)
+    apply_planned_changes.apply_async(**state_options())
+
+
+@shared_task(ignore_result=True)
+def apply_planned_changes():
+    """Applies the planned changes on the worker nodes."""
+    rdm_db = RdmDatabase()
+    # A single application of the plan at a time
+    if not rdm_db.acquire_lease("apply_planned_changes"):
+        return
+
+    planned_changes = ChangePlan().get_all()
+    if not planned_changes:
+        rdm_db.release_lease("apply_planned_changes")
+        return
+
+    callback = finish_changes.s().set(**state_options())
+    # A failed change fails the chord, the plan can then be applied again
+    callback.on_error(release_lease.si("apply_planned_changes").set(**state_options()))
+    chord(
+        apply_change.s(uuid, change_type).set(**record_options())
+        for uuid, change_type in planned_changes
+    )(callback)
+
+
+@shared_task
+def apply_change(uuid: str, change_type: str):
+    """Deletes, creates or updates the RDM record of a Pure change.
+
+    Returns the counters, if the record lease was acquired and if the
+    change was applied (as in ChangeProcessor).
+    """
+    global_counters = initialize_counters()
+    applied = False
+    with record_lease(uuid) as acquired:
+        if acquired and change_type == "DELETE":
+            # Gets the record recid
+            recid = Requests().get_recid(uuid, global_counters)
+            if recid:
+                # 410: already deleted
+                response = Delete().record(recid)
+                applied = response.status_code < 300 or response.status_code == 410
+            else:
+                # The record is not in RDM
+                global_counters["delete"]["success"] += 1
+                applied = True
+        elif acquired:
+            applied = RdmAddRecord().push_record_by_uuid(global_counters, uuid)
+
+    return {
+        "uuid": uuid,
+        "change_type": change_type,
+        "acquired": acquired,
+        "applied": applied,
+        "counters": global_counters,
+    }
+
+
+@shared_task
+def finish_changes(results: list):
+    """Removes the applied changes from the plan and sums up their counters.
+
+    The failed changes are retried after a backoff (ChangePlan.fail).
+    """
+    plan = ChangePlan()
+    for result in results:
+        if not result["acquired"]:
+            # Skipped (record in use), applied next time
+            continue
+        if result["applied"]:
+            plan.remove(result["uuid"], result["change_type"])
+        else:
+            plan.fail(result["uuid"], result["change_type"])
+    RdmDatabase().release_lease("apply_planned_changes")
+    return aggregate_counters([result["counters"] for result in results])
+
+
+@shared_task(ignore_result=True)
+def release_lease(key: str):
+    """Releases the lease of a failed chain of tasks (error callback)."""
+    RdmDatabase().release_lease(key)
+
+
+# INITIAL SYNCHRONIZATION
+
+
+@shared_task(ignore_result=True)
+def initial_synchronization(granularity: int = sync_chunk_size):
+    """Synchronizes the research outputs chunks not done yet on the worker nodes."""
+    chunks = SyncChunks()
+    chunks.recover()
+    chunks.retry_failed()
+
+    pure_api_key = str(current_app.config.get("PURE_API_KEY"))
+    pure_api_url = str(current_app.config.get("PURE_API_URL"))
+    research_count = get_research_output_count(pure_api_key, pure_api_url)
+    if research_count != -1:
+        chunks.plan(research_count, granularity)
+
+    # The dispatched chunks are running until their result is received
+    header = []
+    chunk = chunks.claim()
+    while chunk:
+        header.append(
+            sync_research_output_chunk.s(chunk[0], chunk[1]).set(**record_options())
+        )
+        chunk = chunks.claim()
+    if header:
+        chord(header)(finish_initial_synchronization.s().set(**state_options()))
+
+
+@shared_task(bind=True, max_retries=sync_chunk_max_attempts - 1)
+def sync_research_output_chunk(self, offset: int, size: int):
+    """Synchronizes a chunk of research outputs, retried with backoff."""
+    start = time.time()
+    try:
+        records = Synchronizer().synchronize_research_outputs(
+            str(current_app.config.get("PURE_API_KEY")),
+            str(current_app.config.get("PURE_API_URL")),
+            size,
+            offset,
+        )
+    except Exception as error:
+        if self.request.retries < self.max_retries:
+            countdown = SyncChunks.backoff(self.request.retries + 1)
+            raise self.retry(exc=error, countdown=countdown)
+        return {"offset": offset, "records": 0, "seconds": 0, "error": str(error)}
+    return {
+        "offset": offset,
+        "records": records,
+        "seconds": time.time() - start,
+        "error": None,
+    }
+
+
+@shared_task
+def finish_initial_synchronization(results: list):
+    """Stores the status of the synchronized chunks."""
+    chunks = SyncChunks()
+    for result in results:
+        if result["error"]:
+            chunks.fail(result["offset"], result["error"])
+        else:
+            chunks.done(result["offset"], result["records"], result["seconds"])
+    return chunks.count()
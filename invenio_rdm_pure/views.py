@@ -7,12 +7,16 @@
 
 """Invenio module that adds pure."""
 
+import gzip
 import os
+import time
 
-from flask import Blueprint
+from flask import Blueprint, Response, request, send_file
 from flask_babelex import gettext as _
 
-from .setup import dirpath, pure_import_file
+from .setup import pure_import_gzip, pure_import_max_age_sec
+from .source.pure.import_records import export_file_name
+from .tasks import request_pure_import
 
 blueprint = Blueprint(
     "invenio_rdm_pure",
@@ -21,12 +25,53 @@ blueprint = Blueprint(
     static_folder="static",
 )
 
+# Size of the chunks of the decompressed file sent to clients not accepting gzip
+chunk_size = 64 * 1024
+
 
 @blueprint.route("/pure_import_xml")
 def index1():
-    """Render pure_import_xml view."""
-    # Check if the XML file does not exist
-    if not os.path.isfile(pure_import_file):
-        # Run pure_import task to create the XML file
-        os.system(f"python {dirpath}/cli.py pure_import")
-    return open(pure_import_file, "r").read()
+    """Render pure_import_xml view.
+
+    Serves the last generated file, the regeneration runs as a celery task.
+    """
+    file_name = export_file_name()
+
+    # Not generated yet, the client has to retry
+    if not os.path.isfile(file_name):
+        request_pure_import()
+        return Response(
+            "Pure import file being generated",
+            status=202,
+            headers={"Retry-After": "60"},
+        )
+
+    # Outdated, refreshed in background while the current one is served
+    if time.time() - os.path.getmtime(file_name) > pure_import_max_age_sec:
+        request_pure_import()
+
+    if not pure_import_gzip:
+        return send_file(file_name, mimetype="application/xml", conditional=True)
+
+    if "gzip" in request.accept_encodings:
+        response = send_file(file_name, mimetype="application/xml", conditional=True)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = _send_decompressed(file_name)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _send_decompressed(file_name: str):
+    """Streams the gzip file decompressed, with its own ETag."""
+    stat = os.stat(file_name)
+
+    def generate():
+        with gzip.open(file_name, "rb") as source:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                yield chunk
+
+    response = Response(generate(), mimetype="application/xml")
+    response.set_etag(f"{stat.st_mtime_ns}-{stat.st_size}-identity")
+    response.last_modified = stat.st_mtime
+    return response.make_conditional(request)
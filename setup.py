@@ -78,6 +78,8 @@ setup(
             "messages = invenio_rdm_pure",
         ],
         "invenio_celery.tasks": ["invenio_rdm_pure = invenio_rdm_pure.tasks"],
+        "invenio_db.alembic": ["invenio_rdm_pure = invenio_rdm_pure:alembic"],
+        "invenio_db.models": ["invenio_rdm_pure = invenio_rdm_pure.models"],
         "invenio_config.module": [
             "invenio_rdm_pure = invenio_rdm_pure.config",
         ],
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Changes plan tests."""
+
+from datetime import date, timedelta
+
+from invenio_rdm_pure.setup import change_plan_max_attempts
+from invenio_rdm_pure.source.rdm.change_plan import ChangePlan
+from invenio_rdm_pure.source.rdm.run.watch import PureChangesWatch
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_change_plan_coalescing(tmp_path):
+    """Test that only the last change of each uuid is planned."""
+    plan = ChangePlan(StateDatabase(str(tmp_path / "state.db")))
+
+    changes = {}
+    items = [
+        {"uuid": "uuid-1", "changeType": "CREATE"},
+        {"uuid": "uuid-1", "changeType": "UPDATE"},
+        {"uuid": "uuid-2", "changeType": "DELETE"},
+        {"uuid": "uuid-2", "changeType": "UPDATE"},
+    ]
+    assert ChangePlan.reduce(items, changes) == 2
+    assert changes == {"uuid-1": "UPDATE", "uuid-2": "DELETE"}
+
+    with plan.db.transaction():
+        plan.add("2020-10-01", changes)
+        plan.add("2020-10-02", {"uuid-1": "DELETE", "uuid-2": "CREATE"})
+        plan.add("2020-10-01", {"uuid-1": "UPDATE"})
+    assert plan.get_all() == [("uuid-1", "DELETE"), ("uuid-2", "CREATE")]
+
+    plan.remove("uuid-1")
+    assert plan.count() == 1
+
+
+def test_change_plan_backoff(tmp_path):
+    """Test that a failed change waits for its backoff, then is given up."""
+    plan = ChangePlan(StateDatabase(str(tmp_path / "state.db")))
+    with plan.db.transaction():
+        plan.add("2020-10-01", {"uuid-1": "UPDATE", "uuid-2": "DELETE"})
+
+    plan.fail("uuid-1", "UPDATE")
+    # A change replaced meanwhile is not counted
+    plan.fail("uuid-2", "UPDATE")
+    assert plan.get_all() == [("uuid-2", "DELETE")]
+    assert plan.count_due() == 1
+    assert plan.count() == 2
+
+    # Due again once the backoff is over
+    plan.db.execute("UPDATE change_plan SET next_attempt = 0")
+    assert plan.count_due() == 2
+
+    plan.db.execute(
+        "UPDATE change_plan SET attempts = ? WHERE uuid = 'uuid-1'",
+        (change_plan_max_attempts,),
+    )
+    assert plan.get_all() == [("uuid-2", "DELETE")]
+    assert plan.count_given_up() == 1
+
+    # A newer change of the uuid is tried again
+    with plan.db.transaction():
+        plan.add("2020-10-02", {"uuid-1": "UPDATE"})
+    assert plan.count_due() == 2
+    assert plan.count_given_up() == 0
+
+
+def test_watch_next_position():
+    """Test that a page without next token is not planned twice."""
+    watch = PureChangesWatch.__new__(PureChangesWatch)
+    items = [{"uuid": "uuid-1"}, {"uuid": "uuid-2"}]
+
+    json_response = {"items": items, "resumptionToken": "token-2"}
+    assert watch._get_next_position(json_response, "token-1", items) == (
+        "token-2",
+        0,
+    )
+
+    # Today, or a resumption token, is polled again skipping the seen items
+    today = str(date.today())
+    assert watch._get_next_position({}, today, items) == (today, 2)
+    assert watch._get_next_position({}, "token-1", items) == ("token-1", 2)
+
+    # A past date goes on with the following date
+    yesterday = str(date.today() - timedelta(days=1))
+    assert watch._get_next_position({}, yesterday, items) == (today, 0)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Changes checkpoints tests."""
+
+from datetime import date, timedelta
+
+from invenio_rdm_pure.source.rdm.changes_ledger import ChangesLedger
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_changes_checkpoints(tmp_path):
+    """Test resuming a date from the page where it stopped."""
+    ledger = ChangesLedger(StateDatabase(str(tmp_path / "state.db")))
+    today = str(date.today())
+    yesterday = str(date.today() - timedelta(days=1))
+
+    assert ledger.missing_dates(2) == [today, yesterday]
+    assert ledger.get_checkpoint(today) == (today, 1)
+
+    ledger.set_page(today, "token-2", 2)
+    assert ledger.get_checkpoint(today) == ("token-2", 2)
+
+    ledger.complete(yesterday)
+    assert ledger.missing_dates(2) == [today]
+
+    ledger.complete(today)
+    assert ledger.missing_dates(2) == []
+    assert ledger.prune(0) == 1
+
+
+def test_state_values(tmp_path):
+    """Test the key / value store keeping the watch resume token."""
+    state_db = StateDatabase(str(tmp_path / "state.db"))
+    assert state_db.get_value("watch_pure_changes_token") is None
+
+    with state_db.transaction():
+        state_db.set_value("watch_pure_changes_token", "token-1")
+    assert state_db.get_value("watch_pure_changes_token") == "token-1"
+
+
+def test_import_successful_changes(tmp_path):
+    """Test the migration of the dates of successful_changes.txt."""
+    file_name = tmp_path / "successful_changes.txt"
+    file_name.write_text("2020-12-01\n\n2020-12-02\n")
+    ledger = ChangesLedger(StateDatabase(str(tmp_path / "state.db")))
+
+    ledger.import_successful_changes(str(file_name))
+    assert not file_name.exists()
+    assert ledger.get_checkpoint("2020-12-02") == ("2020-12-02", 1)
+    assert ledger.db.select_one(
+        "SELECT completed FROM change_dates WHERE date = '2020-12-01'"
+    ) == (1,)
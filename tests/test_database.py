@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""RDM database tests."""
+
+from invenio_rdm_pure.source.rdm.database import RdmDatabase
+
+
+def add_roles(rdm_db: RdmDatabase):
+    """Adds three roles and their users, returns the role ids."""
+    rdm_db.create_roles(
+        {"old_group": "Old", "new_group": "New", "other_group": "Other"}
+    )
+    role_ids = rdm_db.get_role_ids(["old_group", "new_group", "other_group"])
+    old, new, other = (
+        role_ids[name] for name in ("old_group", "new_group", "other_group")
+    )
+    rdm_db.executemany(
+        "INSERT INTO accounts_userrole (user_id, role_id) "
+        "VALUES (:user_id, :role_id)",
+        [
+            {"user_id": 10, "role_id": old},
+            {"user_id": 11, "role_id": old},
+            {"user_id": 11, "role_id": new},
+            {"user_id": 12, "role_id": other},
+        ],
+    )
+    return old, new, other
+
+
+def test_bound_parameter_queries(base_app):
+    """Test the queries whose values are bound (and expanded) parameters."""
+    rdm_db = RdmDatabase()
+    old, new, other = add_roles(rdm_db)
+
+    # A quote in a value is not part of the query
+    assert rdm_db.select_query("id", "accounts_role", {"name": "x' OR '1'='1"}) is False
+    rows = rdm_db.select_query(
+        "id, description", "accounts_role", {"name": "new_group"}
+    )
+    assert [tuple(row) for row in rows] == [(new, "New")]
+
+    assert rdm_db.get_role_ids(["old_group", "other_group", "missing"]) == {
+        "old_group": old,
+        "other_group": other,
+    }
+    assert rdm_db.count_role_users([old, new, other]) == {old: 2, new: 1, other: 1}
+
+    query = "UPDATE accounts_role SET description = :description WHERE id = :id"
+    assert rdm_db.execute(query, {"description": "Renamed", "id": other}) == 1
+
+
+def test_move_role_users(base_app):
+    """Test that the users of the old roles are moved in one transaction."""
+    rdm_db = RdmDatabase()
+    old, new, other = add_roles(rdm_db)
+
+    # User 11 is already in the new role
+    assert rdm_db.move_role_users([old], [new]) == (1, 2)
+    assert rdm_db.count_role_users([old, new, other]) == {new: 2, other: 1}
+
+    # A failure rolls back the whole transaction
+    try:
+        with rdm_db.transaction():
+            rdm_db.move_role_users([new], [other])
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+    assert rdm_db.count_role_users([old, new, other]) == {new: 2, other: 1}
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Database lookup cache tests."""
+
+from invenio_rdm_pure.source.rdm import known_groups as known_groups_module
+from invenio_rdm_pure.source.rdm.database import TtlCache
+from invenio_rdm_pure.source.rdm.known_groups import KnownGroups
+
+
+def test_ttl_cache():
+    """Test that cached values expire."""
+    cache = TtlCache(60)
+    cache.set("group", (1, "Group"))
+    assert cache.get("group") == (1, "Group")
+
+    expired = TtlCache(-1)
+    expired.set("group", (1, "Group"))
+    assert expired.get("group") is None
+
+    cache.clear()
+    assert cache.get("group", False) is False
+
+
+def test_known_groups_expire(monkeypatch):
+    """Test that the known groups are read again once expired."""
+    names = [("group_a",)]
+
+    class FakeDatabase:
+        """Returns the current group names."""
+
+        def fetch_all(self, query):
+            """Description."""
+            return list(names)
+
+    monkeypatch.setattr(known_groups_module, "RdmDatabase", FakeDatabase)
+
+    cached = KnownGroups(60)
+    cached._warm()
+    names.append(("group_b",))
+    cached._warm()
+    assert cached._names == {"group_a"}
+
+    expiring = KnownGroups(-1)
+    expiring._warm()
+    names.append(("group_c",))
+    expiring._warm()
+    assert expiring._names == {"group_a", "group_b", "group_c"}
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Deletion journal tests."""
+
+from invenio_rdm_pure.setup import data_files_name, delete_compact_every
+from invenio_rdm_pure.source.rdm.delete_journal import DeleteJournal
+from invenio_rdm_pure.source.rdm.delete_record import Delete
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_delete_journal_compaction(tmp_path, monkeypatch):
+    """Test that the data files are rewritten once without the deleted recids."""
+    to_delete = tmp_path / "to_delete.txt"
+    all_records = tmp_path / "all_rdm_records.txt"
+    to_delete.write_text("aaaaa-00001\nbbbbb-00002\n")
+    all_records.write_text("uuid-1 aaaaa-00001\nuuid-2 bbbbb-00002\n")
+    monkeypatch.setitem(data_files_name, "delete_recid_list", str(to_delete))
+    monkeypatch.setitem(data_files_name, "all_rdm_records", str(all_records))
+
+    journal = DeleteJournal(StateDatabase(str(tmp_path / "state.db")))
+    journal.add("aaaaa-00001")
+    assert journal.get_all() == {"aaaaa-00001"}
+
+    assert journal.compact_files() == 2
+    assert to_delete.read_text() == "bbbbb-00002\n"
+    assert all_records.read_text() == "uuid-2 bbbbb-00002\n"
+    assert journal.get_all() == set()
+
+
+class FakeReports:
+    """Reports stub."""
+
+    def __init__(self):
+        """Description."""
+        self.events = []
+
+    def add(self, *args, **kwargs):
+        """Description."""
+
+    def event(self, kind, *args, **fields):
+        """Description."""
+        self.events.append(kind)
+
+
+class FakeResponse:
+    """Response stub."""
+
+    def __init__(self, status_code):
+        """Description."""
+        self.status_code = status_code
+
+
+class FakeRequests:
+    """Requests stub, fails the recids starting with 'x'."""
+
+    def delete_metadata(self, recid):
+        """Description."""
+        if recid.startswith("x"):
+            raise ConnectionError(recid)
+        return FakeResponse(410 if recid.startswith("g") else 204)
+
+
+def get_delete(tmp_path):
+    """Gets a Delete with stubbed requests and reports."""
+    delete = Delete.__new__(Delete)
+    delete.rdm_requests = FakeRequests()
+    delete.report = FakeReports()
+    delete.journal = DeleteJournal(StateDatabase(str(tmp_path / "state.db")))
+    return delete
+
+
+def test_delete_recids_error(tmp_path):
+    """Test that an error only fails its own recid."""
+    delete = get_delete(tmp_path)
+    delete.counters = {"total": 3, "success": 0, "error": 0}
+
+    delete._delete_recids(["aaaaa-00001", "xxxxx-00002", "ggggg-00003"])
+
+    assert delete.counters == {"total": 3, "success": 2, "error": 1}
+    assert "rdm_delete_failed" in delete.report.events
+    assert delete.journal.get_all() == {"aaaaa-00001", "ggggg-00003"}
+
+
+def test_delete_record_compaction(tmp_path, monkeypatch):
+    """Test that single deletions compact the data files every few recids."""
+    all_records = tmp_path / "all_rdm_records.txt"
+    lines = [
+        f"uuid-{index} aaaaa-{index:05}\n" for index in range(delete_compact_every)
+    ]
+    all_records.write_text("".join(lines))
+    monkeypatch.setitem(data_files_name, "delete_recid_list", str(tmp_path / "none"))
+    monkeypatch.setitem(data_files_name, "all_rdm_records", str(all_records))
+
+    delete = get_delete(tmp_path)
+    for index in range(delete_compact_every - 1):
+        delete.record(f"aaaaa-{index:05}")
+    assert delete.journal.count() == delete_compact_every - 1
+    assert len(all_records.read_text().splitlines()) == delete_compact_every
+
+    delete.record(f"aaaaa-{delete_compact_every - 1:05}")
+    assert delete.journal.count() == 0
+    assert all_records.read_text() == ""
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Group split and merge record tests."""
+
+import copy
+
+from invenio_rdm_pure.source.rdm.run.groups import RdmGroups
+
+
+class FakeRewriter:
+    """Applies the transformation to the given records."""
+
+    def __init__(self, records: list):
+        """Description."""
+        self.records = records
+
+    def run(self, query: str, transform):
+        """Description."""
+        for record in self.records:
+            transform(record)
+
+
+class FakeReports:
+    """Description."""
+
+    def add(self, *args, **kwargs):
+        """Description."""
+
+
+new_group = {"name": "New group", "uuid": "uuid-new", "externalId": "new"}
+unrelated = {
+    "recid": "aaaaa-00002",
+    "title": "Mentions old in its title",
+    "group_restrictions": ["other"],
+    "organisationalUnits": [{"externalId": "other", "name": "Other"}],
+    "extensions": {"tug:managingOrganisationalUnit_externalId": "other"},
+}
+
+
+def get_groups(records: list):
+    """Gets an RdmGroups rewriting the given records."""
+    groups = RdmGroups.__new__(RdmGroups)
+    groups.report = FakeReports()
+    groups.report_files = ["console"]
+    groups.record_rewriter = FakeRewriter(records)
+    groups.new_groups_data = [new_group]
+    return groups
+
+
+def test_split_records():
+    """Test that only the records of the old group get the new groups."""
+    record = {
+        "recid": "aaaaa-00001",
+        "group_restrictions": ["old", "other"],
+        "extensions": {"tug:managingOrganisationalUnit_externalId": "old"},
+    }
+    records = [record, copy.deepcopy(unrelated), {"recid": "aaaaa-00003"}]
+    get_groups(records)._rdm_split_modify_record("old", ["new", "new-2"])
+
+    assert record["group_restrictions"] == ["other", "new", "new-2"]
+    assert record["extensions"]["tug:managingOrganisationalUnit_externalId"] == "new"
+    assert records[1] == unrelated
+    assert records[2] == {"recid": "aaaaa-00003"}
+
+
+def test_merge_unrelated_record():
+    """Test that a record without the old groups is left unchanged."""
+    groups = get_groups([])
+    record = copy.deepcopy(unrelated)
+
+    groups._process_organisational_units(record, new_group, ["old", "old-2"])
+    groups._process_group_restrictions(record, "old", "new")
+    groups._process_managing_organisational_unit(record, "old")
+    assert record == unrelated
+
+    record["group_restrictions"].append("old")
+    groups._process_group_restrictions(record, "old", "new")
+    assert record["group_restrictions"] == ["other", "new"]
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Pure import export tests."""
+
+import json
+
+from lxml import etree
+
+from invenio_rdm_pure.source.pure import import_records
+from invenio_rdm_pure.source.pure.import_records import ImportRecords
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_import_records_streaming(tmp_path):
+    """Test that the exported datasets are copied and the new ones appended."""
+    records = ImportRecords()
+    name_space = records._create_xml()
+    exported = tmp_path / "exported.xml"
+    exported.write_bytes(
+        b'<?xml version="1.0" encoding="utf-8"?>\n'
+        b'<v1:datasets xmlns:v1="v1.dataset.pure.atira.dk">\n'
+        b'  <v1:dataset type="dataset"><v1:title>Old</v1:title></v1:dataset>\n'
+        b"</v1:datasets>\n"
+    )
+
+    output = tmp_path / "output.xml"
+    with open(output, "wb") as output_file:
+        with etree.xmlfile(output_file, encoding="utf-8") as records.xml_file:
+            root = "{%s}datasets" % name_space["dataset"]
+            with records.xml_file.element(root, nsmap=records.nsmap):
+                records._copy_exported_datasets(str(exported), name_space)
+                dataset = records._populate_xml({}, name_space)
+                assert dataset is None
+                records.full_item = {"id": "aaaaa-00001", "links": {}}
+                item = {
+                    "titles": [{"title": "New"}],
+                    "creators": [],
+                    "publication_date": "2020",
+                }
+                dataset = records._populate_xml(item, name_space)
+                records.xml_file.write(dataset)
+
+    titles = etree.parse(str(output)).findall(".//{%s}title" % name_space["dataset"])
+    assert [title.text for title in titles] == ["Old", "New"]
+
+
+class FakeResponse:
+    """RDM response."""
+
+    def __init__(self, status_code: int, hits: list = None):
+        """Description."""
+        self.status_code = status_code
+        self.content = json.dumps({"hits": {"hits": hits or []}})
+
+
+class FakeRequests:
+    """RDM requests, the second page fails."""
+
+    def get_metadata(self, params: dict):
+        """Description."""
+        if params["page"] == 2:
+            return FakeResponse(500)
+        item = {
+            "id": "aaaaa-00002",
+            "created": "2020-12-02T10:00:00",
+            "links": {},
+            "metadata": {
+                "titles": [{"title": "New"}],
+                "creators": [],
+                "publication_date": "2020",
+            },
+        }
+        return FakeResponse(200, [item])
+
+
+class FakeReports:
+    """Description."""
+
+    def __getattr__(self, name):
+        """Description."""
+        return lambda *args, **kwargs: None
+
+
+def test_import_records_failed_page(tmp_path, monkeypatch):
+    """Test that a failed RDM request keeps the export and its watermark."""
+    file_name = tmp_path / "pure_import.xml"
+    file_name.write_bytes(b"<old/>")
+    monkeypatch.setattr(import_records, "pure_import_file", str(file_name))
+    monkeypatch.setattr(import_records, "dirpath", str(tmp_path))
+
+    records = ImportRecords.__new__(ImportRecords)
+    records.rdm_requests = FakeRequests()
+    records.report = FakeReports()
+    records.state_db = StateDatabase(str(tmp_path / "state.db"))
+    watermark = {"created": "2020-12-01T10:00:00", "recid": "aaaaa-00001"}
+    records.state_db.set_value(records.watermark_key, json.dumps(watermark))
+
+    records.run_import()
+    assert file_name.read_bytes() == b"<old/>"
+    assert json.loads(records.state_db.get_value(records.watermark_key)) == watermark
+    assert not (tmp_path / "pure_import.xml.tmp").exists()
+
+
+class TodayRequests:
+    """RDM requests, a record without title, one of today and an old one."""
+
+    def get_metadata(self, params: dict):
+        """Description."""
+        if params["page"] > 1:
+            return FakeResponse(200)
+        metadata = {
+            "titles": [{"title": "New"}],
+            "creators": [],
+            "publication_date": "2020",
+        }
+        items = [
+            {"id": "aaaaa-00003", "created": "2020-12-02T11:00:00", "metadata": {}},
+            {
+                "id": "aaaaa-00002",
+                "created": "2020-12-02T10:00:00",
+                "metadata": metadata,
+            },
+            {
+                "id": "aaaaa-00001",
+                "created": "2020-12-01T10:00:00",
+                "metadata": metadata,
+            },
+        ]
+        for item in items:
+            item["links"] = {}
+        return FakeResponse(200, items)
+
+
+def test_import_records_without_watermark(tmp_path, monkeypatch):
+    """Test that without a watermark only the records of today are exported."""
+    file_name = tmp_path / "pure_import.xml"
+    monkeypatch.setattr(import_records, "pure_import_file", str(file_name))
+    monkeypatch.setattr(import_records, "dirpath", str(tmp_path))
+    monkeypatch.setattr(import_records, "current_date", lambda: "2020-12-02")
+
+    records = ImportRecords.__new__(ImportRecords)
+    records.rdm_requests = TodayRequests()
+    records.report = FakeReports()
+    records.state_db = StateDatabase(str(tmp_path / "state.db"))
+
+    records.run_import()
+    assert records.added == 1
+    assert not records.next_page
+    name_space = records._create_xml()
+    titles = etree.parse(str(file_name)).findall(".//{%s}title" % name_space["dataset"])
+    assert [title.text for title in titles] == ["New"]
+    watermark = json.loads(records.state_db.get_value(records.watermark_key))
+    assert watermark == {"created": "2020-12-02T11:00:00", "recid": "aaaaa-00003"}
+
+    records.run_import(full=True)
+    assert records.added == 2
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Stage timing tests."""
+
+import json
+
+from invenio_rdm_pure.setup import metrics_files_name
+from invenio_rdm_pure.source.metrics import Histogram, Metrics
+
+
+def test_stage_summary():
+    """Test count, sum and quantiles of a stage."""
+    metrics = Metrics()
+    for value in range(1, 101):
+        metrics.observe("rdm.post_metadata", value / 100)
+
+    summary = metrics.summary()["rdm.post_metadata"]
+    assert summary["count"] == 100
+    assert round(summary["sum"], 2) == 50.5
+    assert summary["p50"] == 0.51
+    assert summary["p99"] == 1.0
+
+
+def test_prometheus_export():
+    """Test the Prometheus text format of the stage timings."""
+    metrics = Metrics()
+    with metrics.timer("pure.get_file"):
+        pass
+
+    text = metrics.to_prometheus()
+    assert "# TYPE invenio_rdm_pure_stage_duration_seconds summary" in text
+    assert (
+        'invenio_rdm_pure_stage_duration_seconds_count{stage="pure.get_file"} 1' in text
+    )
+
+
+def test_bounded_samples():
+    """Test that the samples are bounded while count and sum stay exact."""
+    histogram = Histogram(max_samples=100)
+    for value in range(1, 10001):
+        histogram.observe(value / 10000)
+
+    assert len(histogram.samples) == 100
+    assert histogram.count == 10000
+    assert round(histogram.sum, 2) == 5000.5
+    assert 0.2 < histogram.quantile(0.5) < 0.8
+
+
+def test_export_resets(tmp_path, monkeypatch):
+    """Test that each export only covers the timings since the previous one."""
+    monkeypatch.setitem(metrics_files_name, "prometheus", str(tmp_path / "m.prom"))
+    monkeypatch.setitem(metrics_files_name, "json", str(tmp_path / "m.json"))
+    metrics = Metrics()
+
+    metrics.observe("rdm.post_metadata", 1.0)
+    metrics.observe("rdm.post_metadata", 2.0)
+    metrics.export()
+    assert metrics.summary() == {}
+
+    metrics.observe("rdm.post_metadata", 3.0)
+    metrics.export()
+    summary = json.loads((tmp_path / "m.json").read_text())["rdm.post_metadata"]
+    assert summary["count"] == 1
+    assert summary["sum"] == 3.0
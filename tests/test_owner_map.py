@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Owner map tests."""
+
+from invenio_rdm_pure.source.rdm.owner_map import OwnerMap
+
+
+def test_owner_map_indexes(tmp_path):
+    """Test the lookups by RDM user id, Pure uuid and externalId."""
+    file_name = tmp_path / "user_ids_match.txt"
+    file_name.write_text("1 uuid-1 ext-1\n2 uuid-2 ext-2\n")
+    owner_map = OwnerMap(str(file_name))
+
+    assert owner_map.get_user_id_by_external_id("ext-2") == "2"
+    assert owner_map.get_by_uuid("uuid-1") == ("1", "uuid-1", "ext-1")
+    assert owner_map.get_by_user_id(2) == ("2", "uuid-2", "ext-2")
+    assert owner_map.get_user_id_by_external_id("ext-3") is None
+
+
+def test_owner_map_add(tmp_path):
+    """Test that new matches are appended once and reloaded when modified."""
+    file_name = tmp_path / "user_ids_match.txt"
+    owner_map = OwnerMap(str(file_name), 0)
+
+    assert owner_map.add(3, "uuid-3", "ext-3")
+    assert not owner_map.add(3, "uuid-3", "ext-3")
+    assert file_name.read_text() == "3 uuid-3 ext-3\n"
+
+    # Modified by another process
+    with open(file_name, "a") as fp:
+        fp.write("4 uuid-4 ext-4\n")
+    assert owner_map.get_user_id_by_external_id("ext-4") == "4"
+
+
+def test_owner_map_add_after_other_process(tmp_path):
+    """Test that the matches appended by other processes before an add are read."""
+    file_name = tmp_path / "user_ids_match.txt"
+    file_name.write_text("1 uuid-1 ext-1\n")
+    owner_map = OwnerMap(str(file_name), 60)
+    assert owner_map.get_by_uuid("uuid-1")
+
+    # Appended by another process, not checked yet
+    with open(file_name, "a") as fp:
+        fp.write("2 uuid-2 ext-2\n")
+    assert owner_map.get_by_uuid("uuid-2") is None
+
+    assert owner_map.add(3, "uuid-3", "ext-3")
+    assert owner_map.get_by_uuid("uuid-2") == ("2", "uuid-2", "ext-2")
+    assert owner_map.get_by_uuid("uuid-3") == ("3", "uuid-3", "ext-3")
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Owners bulk synchronization tests."""
+
+import json
+
+from invenio_rdm_pure.source.rdm.run.owners import RdmOwners
+
+
+class FakeResponse:
+    """RDM response."""
+
+    def __init__(self, status_code: int, content: dict = None):
+        """Description."""
+        self.status_code = status_code
+        self.content = json.dumps(content or {})
+
+
+class FakeRequests:
+    """RDM requests, the hits are split in pages of two."""
+
+    def __init__(self, hits: list, failing_page: int = None):
+        """Description."""
+        self.hits = hits
+        self.failing_page = failing_page
+        self.pages = []
+        self.put = []
+
+    def get_metadata_by_uuids(self, uuids: list, page: int = 1):
+        """Description."""
+        self.pages.append(page)
+        if page == self.failing_page:
+            return FakeResponse(500)
+        hits = self.hits[(page - 1) * 2 : page * 2]
+        return FakeResponse(200, {"hits": {"hits": hits, "total": len(self.hits)}})
+
+    def put_metadata(self, recid: str, data: dict):
+        """Description."""
+        self.put.append((recid, list(data["_owners"])))
+        return FakeResponse(200)
+
+
+class FakeReports:
+    """Description."""
+
+    def add(self, *args, **kwargs):
+        """Description."""
+
+
+def get_owners(rdm_requests: FakeRequests):
+    """Gets an RdmOwners that only talks to the given requests."""
+    owners = RdmOwners.__new__(RdmOwners)
+    owners.rdm_requests = rdm_requests
+    owners.report = FakeReports()
+    owners.report_files = ["console"]
+    owners.global_counters = {"metadata": {"success": 0, "error": 0}}
+    owners.local_counters = {"create": 0, "in_record": 0, "to_update": 0}
+    return owners
+
+
+def hit(uuid: str, recid: str):
+    """Description."""
+    return {"metadata": {"recid": recid, "extensions": {"tug:uuid": uuid}}}
+
+
+def test_get_rdm_records_pages():
+    """Test that all the pages of the hits are read."""
+    rdm_requests = FakeRequests(
+        [
+            hit("uuid-1", "r1"),
+            hit("uuid-2", "r2"),
+            hit("uuid-1", "r0"),
+            hit("uuid-3", "r3"),
+        ]
+    )
+    rdm_records = get_owners(rdm_requests)._get_rdm_records(
+        ["uuid-1", "uuid-2", "uuid-3"]
+    )
+
+    assert rdm_requests.pages == [1, 2]
+    assert {uuid: data["recid"] for uuid, data in rdm_records.items()} == {
+        "uuid-1": "r1",
+        "uuid-2": "r2",
+        "uuid-3": "r3",
+    }
+
+
+def test_get_rdm_records_failed():
+    """Test that a failed request does not leave uuids looking missing from RDM."""
+    rdm_requests = FakeRequests(
+        [hit("uuid-1", "r1"), hit("uuid-2", "r2"), hit("uuid-3", "r3")], failing_page=2
+    )
+    assert get_owners(rdm_requests)._get_rdm_records(["uuid-1", "uuid-2"]) is None
+
+
+def test_merge_record_owners():
+    """Test that only the missing owners are added to the existing ones."""
+    rdm_requests = FakeRequests([])
+    owners = get_owners(rdm_requests)
+    data = {"recid": "r1", "_owners": [3], "_communities": {}}
+
+    owners._merge_record_owners(data, {3, 5})
+    assert rdm_requests.put == [("r1", [3, 5])]
+
+    owners._merge_record_owners(data, {3, 5})
+    assert len(rdm_requests.put) == 1
+    assert owners.local_counters["in_record"] == 1
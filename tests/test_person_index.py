@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Persons index tests."""
+
+from invenio_rdm_pure.source.pure.person_index import PersonIndex
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_person_index(tmp_path):
+    """Test the lookup of a person uuid by externalId and orcid."""
+    person_index = PersonIndex(StateDatabase(str(tmp_path / "state.db")))
+    person = {
+        "uuid": "person-uuid",
+        "externalId": "12345",
+        "orcid": "0000-0001-2345-6789",
+        "name": {"firstName": "Ada", "lastName": "Lovelace"},
+    }
+    person_index.add([person])
+
+    assert person_index.get("externalId", "12345") == (
+        "person-uuid",
+        "Ada",
+        "Lovelace",
+    )
+    assert person_index.get("orcid", "0000-0001-2345-6789")[0] == "person-uuid"
+    assert person_index.get("externalId", "99999") is None
+
+    person_index.remove("person-uuid")
+    assert person_index.count() == 0
+
+
+def test_person_index_invalidate(tmp_path):
+    """Test that the changed persons are removed, without Pure requests."""
+    person_index = PersonIndex(StateDatabase(str(tmp_path / "state.db")))
+    # Nothing to do while the index is empty
+    person_index.invalidate(["person-1"])
+
+    person_index.add([{"uuid": "person-1"}, {"uuid": "person-2"}])
+    person_index.invalidate(["person-1", "person-3"])
+    assert person_index.count() == 1
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Pipeline tests."""
+
+import threading
+
+from invenio_rdm_pure.setup import pipeline_workers, temporary_files_name
+from invenio_rdm_pure.source.pipeline import Pipeline, Stage
+from invenio_rdm_pure.source.rdm import record_pipeline
+from invenio_rdm_pure.source.rdm.add_record import RdmAddRecord
+from invenio_rdm_pure.source.rdm.record_pipeline import RecordPipeline, Transfer
+from invenio_rdm_pure.source.rdm.requests_rdm import Requests
+from invenio_rdm_pure.source.reports import Reports
+
+
+def test_pipeline():
+    """Test fan out, dropped and failed items and the bounded queues."""
+    exited = []
+    lock = threading.Lock()
+    in_memory = {"current": 0, "max": 0}
+
+    def on_exit(item, error):
+        with lock:
+            exited.append((item, bool(error)))
+            in_memory["current"] -= 1
+
+    def fetch(page):
+        with lock:
+            in_memory["current"] += 2
+            in_memory["max"] = max(in_memory["max"], in_memory["current"])
+        return [page * 10, page * 10 + 1]
+
+    def convert(item):
+        if item == 11:
+            raise ValueError(item)
+        return None if item == 20 else item
+
+    pipeline = Pipeline(
+        [
+            Stage("fetch", fetch, 2, fan_out=True),
+            Stage("convert", convert, 3),
+        ],
+        on_exit=on_exit,
+        queue_size=2,
+    )
+    pipeline.run(range(1, 50))
+
+    assert len(exited) == 98
+    assert (11, True) in exited
+    assert (20, False) in exited
+    # Backpressure: fetch waits for the next stage
+    assert in_memory["max"] <= 2 * (2 + 2 + 3 + 1)
+
+
+def test_record_pipeline_on_done(base_app):
+    """Test that only the completed records call on_done."""
+    done = []
+
+    def fetch(transfer):
+        # Applied by the fetch stage (e.g. a deletion), or dropped
+        transfer.completed = transfer.key == "applied"
+        return []
+
+    pipeline = RecordPipeline(fetch=fetch)
+    pipeline.run(
+        Transfer(uuid, on_done=lambda uuid=uuid: done.append(uuid), key=key)
+        for uuid, key in [("uuid-1", "applied"), ("uuid-2", "dropped")]
+    )
+    assert done == ["uuid-1"]
+
+
+def test_record_pipeline_shared_clients(base_app, monkeypatch):
+    """Test that the record clients are built once per enrich thread."""
+    built = []
+
+    class FakeRecord(RdmAddRecord):
+        """RdmAddRecord stub, counts the built clients."""
+
+        def __init__(self):
+            """Description."""
+            built.append(self)
+
+        def start(self, global_counters, item):
+            """Description."""
+            self.uuid = item["uuid"]
+
+        def enrich(self):
+            """Description."""
+
+        def convert(self):
+            """Description."""
+            return False
+
+    monkeypatch.setattr(record_pipeline, "RdmAddRecord", FakeRecord)
+    pipeline = RecordPipeline()
+    pipeline.run(Transfer(item={"uuid": f"uuid-{index}"}) for index in range(50))
+    assert 1 <= len(built) <= pipeline_workers["enrich"]
+
+
+def test_create_invenio_data_result():
+    """Test that create_invenio_data returns True only once transmitted."""
+    record = RdmAddRecord.__new__(RdmAddRecord)
+    record.start = lambda global_counters, item: None
+    record.enrich = lambda: None
+    record.convert = lambda: True
+    record.upload = lambda: True
+
+    record.write = lambda: False
+    assert record.create_invenio_data({}, {}) is False
+    record.write = lambda: True
+    assert record.create_invenio_data({}, {}) is True
+    record.convert = lambda: False
+    assert record.create_invenio_data({}, {}) is False
+
+
+def test_record_pipeline_failed_upload(base_app, monkeypatch):
+    """Test that a record whose files were not uploaded is not completed."""
+    done = []
+    failed = []
+
+    class FakeRecord(RdmAddRecord):
+        """RdmAddRecord stub, the files of uuid-2 fail."""
+
+        def __init__(self):
+            """Description."""
+
+        def start(self, global_counters, item):
+            """Description."""
+            self.uuid = item["uuid"]
+
+        def enrich(self):
+            """Description."""
+
+        def convert(self):
+            """Description."""
+            return True
+
+        def write(self):
+            """Description."""
+            return True
+
+        def upload(self):
+            """Description."""
+            return self.uuid != "uuid-2"
+
+    monkeypatch.setattr(record_pipeline, "RdmAddRecord", FakeRecord)
+    pipeline = RecordPipeline()
+    pipeline.run(
+        Transfer(
+            item={"uuid": uuid},
+            on_done=lambda uuid=uuid: done.append(uuid),
+            on_failed=lambda uuid=uuid: failed.append(uuid),
+        )
+        for uuid in ("uuid-1", "uuid-2")
+    )
+    assert done == ["uuid-1"]
+    assert failed == ["uuid-2"]
+
+
+def test_rdm_add_file_bound_call(tmp_path, monkeypatch):
+    """Test that rdm_add_file can be called on a Requests instance."""
+    put = []
+    (tmp_path / "file.pdf").write_bytes(b"")
+    monkeypatch.setitem(temporary_files_name, "base_path", str(tmp_path))
+
+    class FakeResponse:
+        """Description."""
+
+        status_code = 200
+
+    monkeypatch.setattr(
+        Requests,
+        "put_file",
+        lambda self, file_path_name, recid: put.append(recid) or FakeResponse(),
+    )
+    monkeypatch.setattr(Reports, "event", lambda self, *args, **fields: None)
+    assert Requests().rdm_add_file("file.pdf", "abcde-12345") is True
+    assert put == ["abcde-12345"]
+    # Removed once uploaded
+    assert not (tmp_path / "file.pdf").exists()
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Bulk record rewrite tests."""
+
+from invenio_rdm_pure.source.rdm.record_rewriter import RecordRewriter
+
+
+def test_transform_records():
+    """Test that only the records modified by the transformation are kept."""
+    records = [
+        {"recid": "aaaaa-00001", "group_restrictions": ["old"], "_communities": {}},
+        {"recid": "aaaaa-00002", "group_restrictions": ["other"], "_communities": {}},
+    ]
+
+    def _transform(record):
+        if "old" in record["group_restrictions"]:
+            record["group_restrictions"] = ["new"]
+
+    changed = RecordRewriter._transform_records(records, _transform)
+    assert changed == [{"recid": "aaaaa-00001", "group_restrictions": ["new"]}]
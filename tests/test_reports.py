@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Reports tests."""
+
+import json
+
+from invenio_rdm_pure.source import reports
+from invenio_rdm_pure.source.reports import ERROR, INFO, WARNING, Reports
+
+
+def test_event_json_line(tmp_path, monkeypatch):
+    """Test that events are written to the json-lines sink."""
+    events_file = tmp_path / "events.jsonl"
+    monkeypatch.setitem(reports.log_files_name, "events", str(events_file))
+    monkeypatch.setattr(reports, "report_human_output", False)
+    monkeypatch.setattr(Reports, "level", INFO)
+
+    Reports().event("rdm_post_metadata", status=201, uuid="abc")
+
+    line = json.loads(events_file.read_text())
+    assert line["kind"] == "rdm_post_metadata"
+    assert line["level"] == "INFO"
+    assert line["status"] == 201
+    assert line["uuid"] == "abc"
+
+
+def test_event_below_level(tmp_path, monkeypatch):
+    """Test that events below the reporting level are discarded."""
+    events_file = tmp_path / "events.jsonl"
+    monkeypatch.setitem(reports.log_files_name, "events", str(events_file))
+    monkeypatch.setattr(reports, "report_human_output", False)
+    monkeypatch.setattr(Reports, "level", INFO)
+    Reports.set_level("WARNING")
+
+    assert not Reports.is_enabled_for(INFO)
+    assert Reports.is_enabled_for(ERROR)
+
+    Reports().event("rdm_post_metadata", status=201, uuid="abc")
+    assert not events_file.exists()
+
+    Reports().event("rdm_post_metadata", WARNING, status=500, uuid="abc")
+    assert json.loads(events_file.read_text())["level"] == "WARNING"
+
+
+def test_event_human_line(tmp_path, monkeypatch, capsys):
+    """Test that the raw fields are formatted by the event template."""
+    monkeypatch.setitem(reports.log_files_name, "console", str(tmp_path / "console"))
+    monkeypatch.setattr(reports, "report_json_output", False)
+    monkeypatch.setattr(reports, "report_human_output", True)
+    monkeypatch.setattr(Reports, "level", INFO)
+
+    Reports().event("change_type", record_number=7, change_type="UPDATE")
+    Reports().event("pure_get_file", status=200, match_review="-", file_name="f" * 80)
+
+    output = capsys.readouterr().out
+    assert "\n    7 - Change type" in output
+    assert "f" * 60 in output
+    assert "f" * 61 not in output
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Retry queue tests."""
+
+from invenio_rdm_pure.source.rdm import add_record
+from invenio_rdm_pure.source.rdm.add_record import RdmAddRecord
+from invenio_rdm_pure.source.rdm.retry_queue import RetryQueue
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_retry_queue(tmp_path):
+    """Test deduplication, backoff and batched dequeue."""
+    queue = RetryQueue(StateDatabase(str(tmp_path / "state.db")))
+
+    queue.add(["uuid-1", "uuid-2", "uuid-1"])
+    assert queue.count() == (2, 2)
+
+    # Due uuids are leased once taken from the queue
+    assert queue.dequeue(1) == ["uuid-1"]
+    assert queue.dequeue(10) == ["uuid-2"]
+    assert queue.dequeue(10) == []
+
+    # A failed attempt delays the next one
+    queue.push("uuid-3", "RDM put file")
+    assert queue.count() == (3, 0)
+    assert queue.backoff(2) == 2 * queue.backoff(1)
+
+    queue.remove("uuid-1")
+    assert queue.count()[0] == 2
+
+
+def test_retry_queue_import_transfer_list(tmp_path):
+    """Test that the transfer list is renamed before being imported."""
+    queue = RetryQueue(StateDatabase(str(tmp_path / "state.db")))
+    file_name = str(tmp_path / "to_transmit.txt")
+    with open(file_name, "w") as fp:
+        fp.write("uuid-1\nuuid-2\n")
+    # Left by an interrupted run
+    with open(f"{file_name}.importing", "w") as fp:
+        fp.write("uuid-3\n")
+
+    assert queue.import_transfer_list(file_name) == 1
+    assert queue.import_transfer_list(file_name) == 2
+    assert queue.import_transfer_list(file_name) == 0
+    assert queue.count() == (3, 3)
+    assert not (tmp_path / "to_transmit.txt.importing").exists()
+
+
+def test_retry_queue_pure_fetch_failed(tmp_path, monkeypatch):
+    """Test that a failed Pure fetch counts an attempt of the leased uuid."""
+    queue = RetryQueue(StateDatabase(str(tmp_path / "state.db")))
+    queue.add(["uuid-1"])
+    assert queue.dequeue(1) == ["uuid-1"]
+
+    monkeypatch.setattr(
+        add_record, "get_pure_record_metadata_by_uuid", lambda uuid: False
+    )
+    record = RdmAddRecord.__new__(RdmAddRecord)
+    record.retry_queue = queue
+    assert record.push_record_by_uuid({}, "uuid-1") is False
+
+    attempts = queue.db.select_one(
+        "SELECT attempts, last_error FROM retry_queue WHERE uuid = 'uuid-1'"
+    )
+    assert tuple(attempts) == (1, "Pure get metadata")
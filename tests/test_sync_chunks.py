@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Initial synchronization chunks tests."""
+
+from invenio_rdm_pure.setup import sync_chunk_max_attempts
+from invenio_rdm_pure.source.rdm.sync_chunks import SyncChunks
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_sync_chunks(tmp_path):
+    """Test planning, retries with backoff and recovery of the chunks."""
+    chunks = SyncChunks(StateDatabase(str(tmp_path / "state.db")))
+
+    assert chunks.plan(250, 100) == 3
+    # Planning again only adds the missing windows (and extends the last one)
+    assert chunks.plan(350, 100) == 1
+
+    assert chunks.claim() == (0, 100, 0)
+    chunks.done(0, 100, 2.0)
+    assert chunks.claim() == (100, 100, 0)
+
+    # A failed chunk waits for its backoff
+    assert chunks.fail(100, "Timeout") == "pending"
+    assert chunks.claim() == (200, 100, 0)
+    assert chunks.next_wait() == 0
+
+    # Interrupted run: the running chunks are pending again
+    assert chunks.recover() == 1
+    assert chunks.count() == {"pending": 3, "running": 0, "done": 1, "failed": 0}
+
+    for _ in range(sync_chunk_max_attempts - 1):
+        status = chunks.fail(100, "Timeout")
+    assert status == "failed"
+    chunks.retry_failed()
+    assert chunks.count()["failed"] == 0
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Scheduled and user synchronization tests."""
+
+import datetime
+
+from invenio_rdm_pure.setup import data_files_name
+from invenio_rdm_pure.source.rdm.converter import Converter
+from invenio_rdm_pure.source.rdm.run import synchronizer as synchronizer_module
+from invenio_rdm_pure.source.rdm.run.synchronizer import Synchronizer
+from invenio_rdm_pure.source.state_db import StateDatabase
+
+
+def test_synchronization_history(tmp_path, monkeypatch):
+    """Test that the synchronized dates are read back from the history."""
+    monkeypatch.setitem(
+        data_files_name, "synchronization_history", str(tmp_path / "history.txt")
+    )
+    synchronizer = Synchronizer(StateDatabase(str(tmp_path / "state.db")))
+    yesterday = datetime.date.today() - datetime.timedelta(1)
+
+    assert synchronizer._get_synchronization_history() == []
+    synchronizer._add_synchronization_date(yesterday)
+    assert synchronizer._get_synchronization_history() == [yesterday]
+    assert yesterday not in synchronizer._get_missing_synchronization_dates(3)
+    assert datetime.date.today() in synchronizer._get_missing_synchronization_dates(3)
+
+
+def test_unchanged_research_output(tmp_path, monkeypatch):
+    """Test that a stored research output is converted again only once it changed."""
+    converted = []
+    monkeypatch.setattr(
+        Converter,
+        "convert_pure_json_to_marc21_xml",
+        lambda self, item: converted.append(item) or "<record/>",
+    )
+    monkeypatch.setattr(synchronizer_module, "marc21_records_path", str(tmp_path))
+    synchronizer = Synchronizer(StateDatabase(str(tmp_path / "state.db")))
+    research_output = {"uuid": "uuid-1", "title": {"value": "Title"}}
+
+    assert synchronizer._synchronize_research_output(research_output) == "converted"
+    assert (tmp_path / "uuid-1.xml").read_text() == "<record/>"
+    assert (
+        synchronizer._synchronize_research_output(dict(research_output)) == "unchanged"
+    )
+    research_output["title"] = {"value": "New title"}
+    assert synchronizer._synchronize_research_output(research_output) == "converted"
+    assert len(converted) == 2
+
+    # Deleted in Pure, converted again once created again
+    synchronizer._remove_record("uuid-1")
+    assert not (tmp_path / "uuid-1.xml").exists()
+    assert synchronizer._synchronize_research_output(research_output) == "converted"
+
+
+def test_store_failed(tmp_path, monkeypatch):
+    """Test that a record that could not be stored is an error, without hash."""
+    monkeypatch.setattr(
+        Converter, "convert_pure_json_to_marc21_xml", lambda self, item: "<record/>"
+    )
+    # A file where the directory should be
+    (tmp_path / "marc21").write_text("")
+    monkeypatch.setattr(
+        synchronizer_module, "marc21_records_path", str(tmp_path / "marc21")
+    )
+    synchronizer = Synchronizer(StateDatabase(str(tmp_path / "state.db")))
+    research_output = {"uuid": "uuid-1"}
+
+    assert synchronizer._synchronize_research_output(research_output) == "error"
+    assert not synchronizer.hashes.is_unchanged(
+        "uuid-1", synchronizer.hashes.digest(research_output)
+    )
+
+
+def test_scheduled_synchronization_dates(tmp_path, monkeypatch):
+    """Test that only the dates whose records were all stored are recorded."""
+    monkeypatch.setitem(
+        data_files_name, "synchronization_history", str(tmp_path / "history.txt")
+    )
+    synchronizer = Synchronizer(StateDatabase(str(tmp_path / "state.db")))
+    today = datetime.date.today()
+    failed_date = str(today - datetime.timedelta(2))
+    current_date = []
+
+    def _get_date_changes(changes_date):
+        """Description."""
+        current_date[:] = [changes_date]
+        return {"uuid-1": "UPDATE", "uuid-2": "DELETE"}
+
+    monkeypatch.setattr(synchronizer, "_get_date_changes", _get_date_changes)
+    monkeypatch.setattr(synchronizer, "_remove_record", lambda uuid: None)
+    monkeypatch.setattr(
+        synchronizer,
+        "_synchronize_uuid",
+        lambda uuid: "error" if current_date == [failed_date] else "converted",
+    )
+    synchronizer.run_scheduled_synchronization()
+
+    history = synchronizer._get_synchronization_history()
+    assert today - datetime.timedelta(1) in history
+    assert today - datetime.timedelta(2) not in history
+    assert today not in history
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Celery tasks tests (eager mode)."""
+
+import json
+
+from invenio_rdm_pure import tasks
+from invenio_rdm_pure.source.rdm import delete_record
+from invenio_rdm_pure.source.rdm.change_plan import ChangePlan
+from invenio_rdm_pure.source.rdm.database import RdmDatabase
+from invenio_rdm_pure.source.rdm.requests_rdm import Requests
+from invenio_rdm_pure.source.rdm.run.synchronizer import Synchronizer
+from invenio_rdm_pure.source.state_db import StateDatabase
+from invenio_rdm_pure.source.utils import initialize_counters
+
+
+def test_record_lease(base_app):
+    """Test that a record is processed by a single task at a time."""
+    with tasks.record_lease("uuid-1") as acquired:
+        assert acquired
+        with tasks.record_lease("uuid-1") as acquired_again:
+            assert not acquired_again
+    assert RdmDatabase().acquire_lease("record:uuid-1", 60)
+
+
+def test_aggregate_counters(base_app, monkeypatch):
+    """Test that the counters of the tasks are summed up."""
+    monkeypatch.setattr(tasks.Reports, "summary_global_counters", lambda *args: None)
+    first = {"metadata": {"success": 2, "error": 0}, "http_responses": {201: 2}}
+    second = {"metadata": {"success": 1, "error": 1}, "http_responses": {201: 1}}
+
+    global_counters = tasks.aggregate_counters.apply(args=([first, second],)).get()
+    assert global_counters["metadata"] == {"success": 3, "error": 1}
+    assert global_counters["http_responses"] == {201: 3}
+
+
+def test_sync_chunk_retries(base_app, monkeypatch):
+    """Test that a failing chunk is retried, then returned as failed."""
+    calls = []
+
+    def synchronize(self, pure_api_key, pure_api_url, size, offset):
+        calls.append(offset)
+        raise RuntimeError("No research outputs")
+
+    monkeypatch.setattr(Synchronizer, "synchronize_research_outputs", synchronize)
+    monkeypatch.setattr(tasks.SyncChunks, "backoff", staticmethod(lambda attempts: 0))
+
+    result = tasks.sync_research_output_chunk.apply(args=(100, 50)).get()
+    assert result["error"] == "No research outputs"
+    assert calls == [100] * tasks.sync_chunk_max_attempts
+
+
+class FakeLedger:
+    """Description."""
+
+    def __init__(self):
+        """Description."""
+        self.dates = ["2020-12-02", "2020-12-01"]
+
+    def import_successful_changes(self):
+        """Description."""
+
+    def missing_dates(self):
+        """Description."""
+        return list(self.dates)
+
+
+class FakeChanges:
+    """Plans 2020-12-01 in two pages, fails on 2020-12-02."""
+
+    ledger = FakeLedger()
+    pages = {"2020-12-01": [True, False], "2020-12-02": [None]}
+
+    def plan_page(self, changes_date):
+        """Description."""
+        more_pages = self.pages[changes_date].pop(0)
+        if more_pages is False:
+            self.ledger.dates.remove(changes_date)
+        return more_pages
+
+
+def test_plan_changes_in_order(base_app, monkeypatch):
+    """Test that the dates are planned from the oldest, then the plan is applied."""
+    dispatched = []
+    applied = []
+    monkeypatch.setattr(tasks, "PureChanges", FakeChanges)
+    monkeypatch.setattr(
+        tasks.process_changes_page,
+        "apply_async",
+        lambda args, **options: dispatched.append(args[0]),
+    )
+    monkeypatch.setattr(
+        tasks.apply_planned_changes,
+        "apply_async",
+        lambda **options: applied.append(True),
+    )
+
+    tasks.get_pure_changes.apply()
+    # Still being planned
+    tasks.get_pure_changes.apply()
+    assert dispatched == ["2020-12-01"]
+
+    tasks.process_changes_page.apply(args=("2020-12-01",))
+    tasks.process_changes_page.apply(args=("2020-12-01",))
+    assert dispatched == ["2020-12-01", "2020-12-01", "2020-12-02"]
+    assert not applied
+
+    # A failed date does not hold back the changes already planned
+    tasks.process_changes_page.apply(args=("2020-12-02",))
+    assert applied == [True]
+    assert RdmDatabase().acquire_lease(tasks.plan_changes_lease)
+
+
+class FakeResponse:
+    """Description."""
+
+    def __init__(self, status_code, content=b""):
+        """Description."""
+        self.status_code = status_code
+        self.content = content
+
+
+def test_get_recid_deletes_duplicates(base_app, monkeypatch):
+    """Test that the older records of a uuid are deleted."""
+    deleted = []
+    hits = [{"metadata": {"recid": recid}} for recid in ("new", "old1", "old2")]
+    content = json.dumps({"hits": {"total": 3, "hits": hits}})
+    monkeypatch.setattr(
+        Requests,
+        "get_metadata_by_query",
+        lambda self, uuid: FakeResponse(200, content),
+    )
+    monkeypatch.setattr(
+        delete_record.Delete,
+        "__init__",
+        lambda self: None,
+    )
+    monkeypatch.setattr(
+        delete_record.Delete,
+        "record",
+        lambda self, recid: deleted.append(recid) or FakeResponse(410),
+    )
+    global_counters = initialize_counters()
+
+    assert Requests().get_recid("uuid-1", global_counters) == "new"
+    assert deleted == ["old1", "old2"]
+    assert global_counters["delete"]["success"] == 2
+
+
+def test_finish_changes(base_app, monkeypatch, tmp_path):
+    """Test that only the applied changes leave the plan, the failed ones wait."""
+    plan = ChangePlan(StateDatabase(str(tmp_path / "state.db")))
+    with plan.db.transaction():
+        plan.add(
+            "2020-12-01", {"uuid-1": "UPDATE", "uuid-2": "DELETE", "uuid-3": "UPDATE"}
+        )
+    monkeypatch.setattr(tasks, "ChangePlan", lambda: plan)
+    monkeypatch.setattr(tasks.Reports, "summary_global_counters", lambda *args: None)
+
+    results = [
+        {"uuid": "uuid-1", "change_type": "UPDATE", "acquired": True, "applied": True},
+        {"uuid": "uuid-2", "change_type": "DELETE", "acquired": True, "applied": False},
+        {
+            "uuid": "uuid-3",
+            "change_type": "UPDATE",
+            "acquired": False,
+            "applied": False,
+        },
+    ]
+    for result in results:
+        result["counters"] = initialize_counters()
+    tasks.finish_changes.apply(args=(results,))
+
+    assert plan.count() == 2
+    assert plan.get_all() == [("uuid-3", "UPDATE")]
+
+
+def test_task_queues():
+    """Test that the tasks writing data/ never go to the default queue."""
+    assert tasks.state_options() == {"queue": "invenio_rdm_pure_state"}
+    assert tasks.record_options() == tasks.state_options()
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Technische Universität Graz.
+#
+# invenio-rdm-pure is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Views tests."""
+
+from flask import Flask
+
+from invenio_rdm_pure import views
+
+
+def test_pure_import_xml_conditional(tmp_path, monkeypatch):
+    """Test that the Pure import file is served with ETag and 304 responses."""
+    export = tmp_path / "pure_import.xml"
+    export.write_text("<v1:datasets/>")
+    monkeypatch.setattr(views, "export_file_name", lambda: str(export))
+
+    app = Flask("testapp")
+    app.register_blueprint(views.blueprint)
+    with app.test_client() as client:
+        response = client.get("/pure_import_xml")
+        assert response.status_code == 200
+        assert response.data == b"<v1:datasets/>"
+        etag = response.headers["ETag"]
+
+        response = client.get("/pure_import_xml", headers={"If-None-Match": etag})
+        assert response.status_code == 304